@@ -1,39 +1,260 @@
+# Primeiro import: com STARTUP_PROFILE=1 mede a importação dos demais
+from shared import startup
 import json
-import boto3
-import redis
 import os
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from shared import get_client, get_redis, LISTING_KEYS, UPDATE_LISTING_SCRIPT, UPDATE_STATS_SCRIPT, CLEAR_DEDUPE_SCRIPT
+
+# Exclusão em massa: objetos por chamada delete_objects (limite do S3),
+# chamadas simultâneas e máximo de nomes por requisição
+DELETE_BATCH_SIZE = 1000
+DELETE_WORKERS = int(os.environ.get('DELETE_WORKERS', 8))
+MAX_DELETE_NAMES = int(os.environ.get('MAX_DELETE_NAMES', 100000))
+
+# Listagens de versões simultâneas quando a exclusão recebe uma lista de
+# nomes (uma por nome)
+LIST_WORKERS = int(os.environ.get('LIST_WORKERS', 32))
+
+# Arquivos removidos do Redis por chamada dos scripts
+METADATA_BATCH_SIZE = int(os.environ.get('METADATA_BATCH_SIZE', 1000))
+
+def remove_metadata(redis_client, names):
+    """
+    Remove metadados, índices, estatísticas, marcações de deduplicação e
+    entradas da listagem em cache dos arquivos em uma única ida e volta ao
+    Redis
+    """
+    update_stats = redis_client.register_script(UPDATE_STATS_SCRIPT)
+    update_listing = redis_client.register_script(UPDATE_LISTING_SCRIPT)
+    clear_dedupe = redis_client.register_script(CLEAR_DEDUPE_SCRIPT)
+    pipe = redis_client.pipeline(transaction=False)
+    for i in range(0, len(names), METADATA_BATCH_SIZE):
+        batch = names[i:i + METADATA_BATCH_SIZE]
+
+        # Descontar os arquivos das estatísticas e dos índices secundários
+        # antes de remover os metadados
+        stats_args = []
+        for name in batch:
+            stats_args += [name, '', '']
+        update_stats(
+            keys=['file_stats', 'file_stats:histogram', 'file_index:name', 'file_index:lines'] + [f"file:{name}" for name in batch],
+            args=stats_args,
+            client=pipe
+        )
+        pipe.delete(*[f"file:{name}" for name in batch])
+        pipe.zrem('file_index', *batch)
+        
+        # Sem as marcações, um evento de criação reentregue depois da
+        # exclusão volta a consultar o S3 em vez de recriar o arquivo
+        clear_dedupe(keys=[f"dedupe:{name}" for name in batch], client=pipe)
+
+        # Remover os arquivos da listagem em cache
+        listing_args = []
+        for name in batch:
+            listing_args += [name, '']
+        update_listing(keys=LISTING_KEYS, args=listing_args, client=pipe)
+    pipe.execute()
+
+def enqueue_notification(subject, message):
+    """
+    Coloca a notificação na fila SQS (outbox); a lambda de processamento a
+    publica no SNS em lotes, fora do caminho da requisição. A exclusão já
+    foi concluída quando ela é chamada, então uma falha aqui é registrada e
+    informada na resposta, sem transformar a exclusão em erro. Retorna se a
+    notificação foi enfileirada.
+    """
+    try:
+        get_client('sqs').send_message(
+            QueueUrl=os.environ['SQS_QUEUE_URL'],
+            MessageBody=json.dumps({
+                'task': 'notify',
+                'subject': subject,
+                'message': message
+            })
+        )
+        return True
+    except Exception as e:
+        print(f"Erro ao enfileirar notificação '{subject}': {str(e)}")
+        return False
+
+def parse_bulk_request(event):
+    """
+    Lê 'names' (lista de arquivos) ou 'prefix' do corpo da requisição
+    """
+    raw_body = event.get('body')
+    if raw_body and event.get('isBase64Encoded'):
+        # APIs criadas com binaryMediaTypes entregam o corpo em base64
+        raw_body = base64.b64decode(raw_body).decode('utf-8')
+    body = json.loads(raw_body or '{}')
+    names = body.get('names')
+    prefix = body.get('prefix')
+
+    if (names is None) == (prefix is None):
+        raise ValueError("Informe 'names' ou 'prefix'")
+    if names is not None:
+        if not isinstance(names, list) or not names or not all(isinstance(name, str) and name for name in names):
+            raise ValueError("'names' deve ser uma lista de nomes de arquivos")
+        if len(names) > MAX_DELETE_NAMES:
+            raise ValueError(f"'names' aceita no máximo {MAX_DELETE_NAMES} arquivos")
+        return list(dict.fromkeys(names)), None
+    if not isinstance(prefix, str) or not prefix:
+        raise ValueError("'prefix' não pode ser vazio")
+    return None, prefix
+
+def list_versions(s3_client, bucket_name, names, prefix):
+    """
+    Lista todas as versões e marcadores de exclusão dos arquivos (o bucket
+    de dados é versionado; sem removê-los o objeto só ganha um marcador de
+    exclusão e continua ocupando espaço). Uma lista de nomes é consultada
+    nome a nome (Prefix=nome, mantendo só a chave exata) em chamadas
+    simultâneas, para não percorrer o bucket inteiro quando os nomes não
+    têm um prefixo comum.
+    """
+    def list_prefix(prefix, key=None):
+        objects = []
+        paginator = s3_client.get_paginator('list_object_versions')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for version in page.get('Versions', []) + page.get('DeleteMarkers', []):
+                if key is None or version['Key'] == key:
+                    objects.append({'Key': version['Key'], 'VersionId': version['VersionId']})
+        return objects
+
+    if names is None:
+        return list_prefix(prefix)
+
+    objects = []
+    with ThreadPoolExecutor(max_workers=max(1, min(LIST_WORKERS, len(names)))) as executor:
+        for name_objects in executor.map(lambda name: list_prefix(name, key=name), names):
+            objects.extend(name_objects)
+    return objects
+
+def delete_versions(s3_client, bucket_name, objects):
+    """
+    Exclui as versões em lotes de até 1000 com chamadas simultâneas.
+    Retorna os erros por arquivo.
+    """
+    def delete_batch(batch):
+        try:
+            response = s3_client.delete_objects(
+                Bucket=bucket_name,
+                Delete={'Objects': batch, 'Quiet': True}
+            )
+            return [(error['Key'], error.get('Message', error.get('Code'))) for error in response.get('Errors', [])]
+        except Exception as e:
+            return [(item['Key'], str(e)) for item in batch]
+
+    batches = [objects[i:i + DELETE_BATCH_SIZE] for i in range(0, len(objects), DELETE_BATCH_SIZE)]
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(DELETE_WORKERS, len(batches)))) as executor:
+        for batch_errors in executor.map(delete_batch, batches):
+            errors.update(batch_errors)
+    return errors
+
+def delete_file(s3_client, bucket_name, file_name):
+    """
+    Exclui todas as versões e marcadores de exclusão de um arquivo. Um
+    delete_object sem VersionId só criaria um marcador de exclusão, e um
+    evento de criação reentregue (que traz o VersionId antigo) voltaria a
+    contar o arquivo.
+    """
+    objects = list_versions(s3_client, bucket_name, [file_name], None)
+    errors = delete_versions(s3_client, bucket_name, objects) if objects else {}
+    if errors:
+        raise Exception(f"Falha ao excluir {file_name}: {errors[file_name]}")
+
+def bulk_handler(event, context):
+    """
+    POST /files/delete: exclui vários arquivos, com todas as versões, a
+    partir de uma lista de nomes ou de um prefixo
+    """
+    bucket_name = os.environ['DATA_BUCKET_NAME']
+    
+    try:
+        try:
+            names, prefix = parse_bulk_request(event)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Credentials': True
+                },
+                'body': json.dumps({'error': str(e)})
+            }
+        
+        # Excluir todas as versões do S3
+        s3_client = get_client('s3')
+        objects = list_versions(s3_client, bucket_name, names, prefix)
+        errors = delete_versions(s3_client, bucket_name, objects) if objects else {}
+        
+        # Nomes pedidos que não existem mais no S3 também são limpos do Redis
+        targets = names if names is not None else list(dict.fromkeys(item['Key'] for item in objects))
+        deleted = [name for name in targets if name not in errors]
+        
+        notified = False
+        if deleted:
+            remove_metadata(get_redis(), deleted)
+            
+            # Uma única notificação com o resumo
+            notified = enqueue_notification(
+                'Arquivos Deletados',
+                f"{len(deleted)} arquivo(s) deletado(s) do bucket {bucket_name}" + (f" ({len(errors)} falha(s))" if errors else "")
+            )
+        
+        return {
+            'statusCode': 207 if errors else 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Credentials': True
+            },
+            'body': json.dumps({
+                'deleted': len(deleted),
+                'failed': [{'name': name, 'error': error} for name, error in errors.items()],
+                'notified': notified
+            })
+        }
+        
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Credentials': True
+            },
+            'body': json.dumps({'error': str(e)})
+        }
 
 def handler(event, context):
+    # Exclusão em massa
+    if event.get('httpMethod') == 'POST':
+        return bulk_handler(event, context)
+    
     # Configurações
-    redis_host = os.environ['REDIS_HOST']
-    redis_port = 6379
     bucket_name = os.environ['DATA_BUCKET_NAME']
     
     try:
         # Obter nome do arquivo dos parâmetros da rota
         file_name = event['pathParameters']['filename']
         
-        # Deletar do S3
-        s3_client = boto3.client('s3')
-        s3_client.delete_object(
-            Bucket=bucket_name,
-            Key=file_name
-        )
-        
-        # Remover metadados do Redis
-        redis_client = redis.Redis(host=redis_host, port=redis_port)
-        redis_client.delete(f"file:{file_name}")
+        s3_client = get_client('s3')
+        redis_client = get_redis()
         
-        # Invalidar cache da listagem
-        redis_client.delete('file_metadata')
+        # Deletar do S3 primeiro: se falhar, os metadados continuam
+        # descrevendo o arquivo que ainda existe
+        delete_file(s3_client, bucket_name, file_name)
         
-        # Enviar notificação SNS
-        sns_client = boto3.client('sns')
-        sns_client.publish(
-            TopicArn=os.environ['SNS_TOPIC_ARN'],
-            Message=f"Arquivo {file_name} foi deletado do bucket {bucket_name}",
-            Subject='Arquivo Deletado'
-        )
+        # Remover metadados e entrada do índice no Redis enquanto a
+        # notificação é enfileirada (publicada de forma assíncrona)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            redis_delete = executor.submit(remove_metadata, redis_client, [file_name])
+            notification = executor.submit(
+                enqueue_notification,
+                'Arquivo Deletado',
+                f"Arquivo {file_name} foi deletado do bucket {bucket_name}"
+            )
+            redis_delete.result()
+            notified = notification.result()
         
         return {
             'statusCode': 200,
@@ -42,7 +263,8 @@ def handler(event, context):
                 'Access-Control-Allow-Credentials': True
             },
             'body': json.dumps({
-                'message': f'Arquivo {file_name} deletado com sucesso'
+                'message': f'Arquivo {file_name} deletado com sucesso',
+                'notified': notified
             })
         }
         
@@ -54,4 +276,7 @@ def handler(event, context):
                 'Access-Control-Allow-Credentials': True
             },
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+# Fim da inicialização do container
+startup.report('lambda_file_delete')
@@ -1,63 +1,415 @@
+# Primeiro import: com STARTUP_PROFILE=1 mede a importação dos demais
+from shared import startup
 import json
-import boto3
-import redis
 import os
 import random
 import uuid
+import hashlib
+import base64
+import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from shared import get_client, get_redis, LISTING_KEYS, sign_line_count, UPDATE_LISTING_SCRIPT, UPDATE_STATS_SCRIPT
 
-def generate_random_content(num_lines):
-    content = []
-    for i in range(num_lines):
-        line = f"Linha {i+1}: " + ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=20))
-        content.append(line)
-    return '\n'.join(content)
+LETTERS = b'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# Tabela que converte cada byte aleatório em uma letra de A a Z. Só os
+# bytes abaixo de 234 (9 * 26) são usados, cada letra com 9 valores; os
+# demais são descartados (amostragem por rejeição), pois 256 não é múltiplo
+# de 26 e o resto deixaria as primeiras 22 letras mais frequentes.
+LETTER_LIMIT = len(LETTERS) * (256 // len(LETTERS))
+LETTER_TABLE = bytes(LETTERS[i % len(LETTERS)] for i in range(256))
+REJECTED_BYTES = bytes(range(LETTER_LIMIT, 256))
+
+LINE_PREFIX = b'Linha '
+LINE_LENGTH = 20
+
+# Limites do modo em massa (parâmetros 'count', 'lines' e 'line_length' da requisição)
+MAX_COUNT = int(os.environ.get('MAX_COUNT', 1000))
+MAX_LINES = int(os.environ.get('MAX_LINES', 10_000_000))
+MAX_LINE_LENGTH = int(os.environ.get('MAX_LINE_LENGTH', 1000))
+
+# Limite do volume total de uma requisição (count * lines * largura da
+# linha): o trabalho por invocação precisa caber no timeout da função, e os
+# metadados só são gravados depois de todos os uploads
+MAX_TOTAL_BYTES = int(os.environ.get('MAX_TOTAL_BYTES', 256 * 1024 * 1024))
+
+# Linhas geradas por bloco (limitadas a BLOCK_SIZE bytes) e tamanho de cada
+# parte do upload multipart
+BLOCK_LINES = int(os.environ.get('BLOCK_LINES', 65536))
+BLOCK_SIZE = int(os.environ.get('BLOCK_SIZE', 2 * 1024 * 1024))
+PART_SIZE = int(os.environ.get('PART_SIZE', 8 * 1024 * 1024))
+
+# Uploads simultâneos ao gerar vários arquivos por requisição, limitados
+# pela memória: cada upload mantém a parte em montagem e sua cópia enviada
+# (2 * PART_SIZE) mais um bloco, os bytes aleatórios, as letras filtradas
+# e seu recorte (4 * BLOCK_SIZE). Os uploads usam no máximo MEMORY_BUDGET da memória da
+# função; o restante fica para o runtime e os clientes.
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 8))
+MEMORY_BUDGET = float(os.environ.get('MEMORY_BUDGET', 0.5))
+WORKER_MEMORY = 2 * PART_SIZE + 4 * BLOCK_SIZE
+FUNCTION_MEMORY = int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', 128)) * 1024 * 1024
+
+def digit_column(first, count, place):
+    """
+    Retorna os dígitos da casa `place` (1, 10, 100...) dos números
+    first..first+count-1, um byte por número
+    """
+    if place <= 1000:
+        # O dígito se repete em ciclos de 10 * place números
+        cycle = b''.join(bytes([48 + digit]) * place for digit in range(10))
+        offset = first % len(cycle)
+        repeats = (offset + count) // len(cycle) + 1
+        return (cycle * repeats)[offset:offset + count]
+
+    # Casas altas mudam poucas vezes dentro de um bloco
+    runs = []
+    number, end = first, first + count
+    while number < end:
+        run_end = min(end, (number // place + 1) * place)
+        runs.append(bytes([48 + (number // place) % 10]) * (run_end - number))
+        number = run_end
+    return b''.join(runs)
+
+def random_letters(size, random_bytes=os.urandom):
+    """
+    Retorna size letras de A a Z uniformemente distribuídas a partir de
+    random_bytes(n), descartando os bytes fora de LETTER_TABLE. Cerca de 9%
+    dos bytes são descartados, então cada sorteio pede um pouco mais que
+    size e raramente é preciso completar.
+    """
+    letters = b''
+    while len(letters) < size:
+        missing = size - len(letters)
+        letters += random_bytes(missing + missing // 8 + 64).translate(LETTER_TABLE, REJECTED_BYTES)
+    return letters[:size]
+
+def generate_block(start, count, line_length=LINE_LENGTH, random_bytes=os.urandom):
+    """
+    Gera as linhas start+1..start+count no formato 'Linha N: XXXX\\n'.
+    Todas as linhas do bloco têm a mesma largura, então cada coluna é
+    preenchida de uma vez com atribuição por fatias, sem laço por linha.
+    Os números do bloco devem ter a mesma quantidade de dígitos.
+    As letras vêm de random_letters com random_bytes.
+    """
+    first = start + 1
+    digits = len(str(first))
+    width = len(LINE_PREFIX) + digits + 2 + line_length + 1
+    block = bytearray(width * count)
+
+    for position, char in enumerate(LINE_PREFIX):
+        block[position::width] = bytes([char]) * count
+
+    for index in range(digits):
+        place = 10 ** (digits - 1 - index)
+        block[len(LINE_PREFIX) + index::width] = digit_column(first, count, place)
+
+    separator = len(LINE_PREFIX) + digits
+    block[separator::width] = b':' * count
+    block[separator + 1::width] = b' ' * count
+
+    payload = random_letters(count * line_length, random_bytes)
+    for column in range(line_length):
+        block[separator + 2 + column::width] = payload[column::line_length]
+
+    block[width - 1::width] = b'\n' * count
+    return block
+
+def line_width(num_lines, line_length=LINE_LENGTH):
+    """
+    Largura da maior linha de um arquivo com num_lines linhas
+    """
+    return len(LINE_PREFIX) + len(str(num_lines)) + 2 + line_length + 1
+
+def iter_content_blocks(num_lines, line_length=LINE_LENGTH, block_lines=BLOCK_LINES, seed=None):
+    """
+    Gera o conteúdo do arquivo em blocos de até block_lines linhas (e até
+    BLOCK_SIZE bytes), sem quebra de linha após a última. Com uma semente,
+    o mesmo conteúdo pode ser gerado de novo.
+    """
+    random_bytes = random.Random(seed).randbytes if seed is not None else os.urandom
+    block_lines = max(1, min(block_lines, BLOCK_SIZE // line_width(num_lines, line_length)))
+    start = 0
+    while start < num_lines:
+        # Os blocos não atravessam a mudança de quantidade de dígitos
+        next_width = 10 ** len(str(start + 1))
+        count = min(block_lines, num_lines - start, next_width - (start + 1))
+        block = generate_block(start, count, line_length, random_bytes)
+        start += count
+        if start == num_lines:
+            del block[-1]
+        yield block
+
+def generate_random_content(num_lines, line_length=LINE_LENGTH):
+    return b''.join(iter_content_blocks(num_lines, line_length))
+
+def iter_parts(blocks, part_size=PART_SIZE):
+    """
+    Agrupa os blocos em partes do upload multipart de ao menos part_size
+    bytes (a última pode ser menor); um conteúdo vazio vira uma parte vazia
+    """
+    buffer = bytearray()
+    empty = True
+    for block in blocks:
+        buffer += block
+        if len(buffer) >= part_size:
+            yield bytes(buffer)
+            buffer.clear()
+            empty = False
+    if buffer or empty:
+        yield bytes(buffer)
+
+def multipart_checksums(parts):
+    """
+    Tamanho, SHA-256 e ETag do objeto que o upload multipart das partes
+    criaria; o S3 calcula o ETag como o MD5 dos MD5 das partes seguido do
+    número de partes
+    """
+    hasher = hashlib.sha256()
+    part_digests = []
+    size = 0
+    for part in parts:
+        hasher.update(part)
+        part_digests.append(hashlib.md5(part).digest())
+        size += len(part)
+    etag = f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+    return size, hasher.hexdigest(), etag
+
+def content_metadata(file_name, num_lines, size, etag, content_sha256):
+    """
+    Metadados do objeto: a contagem de linhas e o checksum do conteúdo,
+    assinados para que o processamento possa usá-los sem ler o objeto
+    """
+    metadata = {'line-count': str(num_lines), 'content-sha256': content_sha256}
+    signature = sign_line_count(file_name, num_lines, size, etag, content_sha256)
+    if signature:
+        metadata['line-count-signature'] = signature
+    return metadata
+
+def upload_streaming(s3_client, bucket_name, file_name, blocks, metadata):
+    """
+    Envia os blocos para o S3 com upload multipart, uma parte de cada vez,
+    mantendo em memória no máximo uma parte. Retorna o tamanho e o ETag do
+    objeto.
+    """
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=bucket_name,
+        Key=file_name,
+        Metadata=metadata
+    )['UploadId']
+
+    parts = []
+    size = 0
+
+    try:
+        for part in iter_parts(blocks):
+            response = s3_client.upload_part(
+                Bucket=bucket_name,
+                Key=file_name,
+                UploadId=upload_id,
+                PartNumber=len(parts) + 1,
+                Body=part
+            )
+            parts.append({'PartNumber': len(parts) + 1, 'ETag': response['ETag']})
+            size += len(part)
+
+        response = s3_client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=file_name,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+        return size, response['ETag'].strip('"')
+
+    except Exception:
+        s3_client.abort_multipart_upload(
+            Bucket=bucket_name,
+            Key=file_name,
+            UploadId=upload_id
+        )
+        raise
+
+def parse_params(event):
+    """
+    Lê 'count', 'lines' e 'line_length' do corpo da requisição. Sem 'count'
+    é gerado um único arquivo; sem 'lines', cada arquivo recebe um número
+    aleatório de linhas.
+    """
+    raw_body = event.get('body') if event else None
+    if raw_body and event.get('isBase64Encoded'):
+        # APIs criadas com binaryMediaTypes entregam o corpo em base64
+        raw_body = base64.b64decode(raw_body).decode('utf-8')
+    body = json.loads(raw_body or '{}')
+    count = int(body['count']) if 'count' in body else None
+    num_lines = int(body['lines']) if 'lines' in body else None
+    line_length = int(body.get('line_length', LINE_LENGTH))
+
+    if count is not None and not 0 < count <= MAX_COUNT:
+        raise ValueError(f"'count' deve estar entre 1 e {MAX_COUNT}")
+    if num_lines is not None and not 0 < num_lines <= MAX_LINES:
+        raise ValueError(f"'lines' deve estar entre 1 e {MAX_LINES}")
+    if not 0 < line_length <= MAX_LINE_LENGTH:
+        raise ValueError(f"'line_length' deve estar entre 1 e {MAX_LINE_LENGTH}")
+
+    # Sem 'lines', cada arquivo tem no máximo 99 linhas (ver create_file)
+    max_lines = num_lines or 99
+    total_bytes = (count or 1) * max_lines * line_width(max_lines, line_length)
+    if total_bytes > MAX_TOTAL_BYTES:
+        raise ValueError(
+            f"A requisição geraria cerca de {total_bytes // (1024 * 1024)} MiB; "
+            f"o limite é {MAX_TOTAL_BYTES // (1024 * 1024)} MiB (reduza 'count', 'lines' ou 'line_length')"
+        )
+    return count, num_lines, line_length
+
+def create_file(s3_client, bucket_name, num_lines, line_length):
+    """
+    Gera um arquivo e o envia para o S3
+    """
+    if num_lines is None:
+        num_lines = random.randint(10, 99)
+
+    # Nome único para o arquivo
+    created_ts = time.time()
+    timestamp = datetime.fromtimestamp(created_ts).strftime('%Y%m%d_%H%M%S')
+    file_name = f"file_{timestamp}_{str(uuid.uuid4())[:8]}.txt"
+
+    # Contagem e checksum assinados nos metadados: o processamento só os
+    # usa sem ler o objeto se a assinatura conferir com o HEAD
+    if num_lines * line_width(num_lines, line_length) <= PART_SIZE:
+        # Estimativa do tamanho pela largura da maior linha: o arquivo cabe
+        # em uma parte e é enviado com um único PUT, cujo ETag é o MD5
+        body = b''.join(iter_content_blocks(num_lines, line_length))
+        size = len(body)
+        metadata = content_metadata(
+            file_name, num_lines, size,
+            hashlib.md5(body).hexdigest(), hashlib.sha256(body).hexdigest()
+        )
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=file_name,
+            Body=body,
+            Metadata=metadata
+        )
+    else:
+        # Arquivos grandes são gerados e enviados parte a parte. Os
+        # metadados são definidos ao iniciar o upload, então o conteúdo é
+        # gerado a partir de uma semente duas vezes: uma para calcular os
+        # checksums e outra para o envio.
+        seed = int.from_bytes(os.urandom(8), 'big')
+        size, content_sha256, etag = multipart_checksums(
+            iter_parts(iter_content_blocks(num_lines, line_length, seed=seed))
+        )
+        metadata = content_metadata(file_name, num_lines, size, etag, content_sha256)
+        _, uploaded_etag = upload_streaming(
+            s3_client, bucket_name, file_name,
+            iter_content_blocks(num_lines, line_length, seed=seed), metadata
+        )
+        if uploaded_etag != etag:
+            print(f"ETag de {file_name} ({uploaded_etag}) difere do assinado ({etag})")
+
+    return {
+        'name': file_name,
+        'lines': num_lines,
+        'size': size,
+        'created_at': timestamp,
+        'created_ts': created_ts
+    }
 
 def handler(event, context):
     # Configurações
-    redis_host = os.environ['REDIS_HOST']
-    redis_port = 6379
     bucket_name = os.environ['DATA_BUCKET_NAME']
     
     try:
-        # Gerar arquivo com conteúdo aleatório
-        num_lines = random.randint(10, 99)
-        content = generate_random_content(num_lines)
+        try:
+            count, num_lines, line_length = parse_params(event)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Credentials': True
+                },
+                'body': json.dumps({'error': str(e)})
+            }
         
-        # Nome único para o arquivo
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_name = f"file_{timestamp}_{str(uuid.uuid4())[:8]}.txt"
+        # Gerar e enviar os arquivos em paralelo
+        total = count or 1
+        workers = max(1, min(MAX_WORKERS, total, int(FUNCTION_MEMORY * MEMORY_BUDGET) // WORKER_MEMORY))
+        s3_client = get_client('s3')
+        files = []
+        failed = []
         
-        # Upload para S3
-        s3_client = boto3.client('s3')
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=file_name,
-            Body=content.encode('utf-8')
+        def safe_create(_):
+            try:
+                return create_file(s3_client, bucket_name, num_lines, line_length), None
+            except Exception as e:
+                return None, str(e)
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for result, error in executor.map(safe_create, range(total)):
+                if error:
+                    failed.append({'error': error})
+                else:
+                    files.append(result)
+        
+        if not files:
+            raise Exception(failed[0]['error'])
+        
+        # Salvar metadados no Redis em uma única ida e volta
+        redis_client = get_redis()
+        pipe = redis_client.pipeline(transaction=False)
+        
+        # Linhas, tamanho, estatísticas agregadas e índices secundários
+        update_stats = redis_client.register_script(UPDATE_STATS_SCRIPT)
+        stats_args = []
+        for file in files:
+            stats_args += [file['name'], file['lines'], file['size']]
+        update_stats(
+            keys=['file_stats', 'file_stats:histogram', 'file_index:name', 'file_index:lines'] + [f"file:{file['name']}" for file in files],
+            args=stats_args,
+            client=pipe
         )
+        for file in files:
+            pipe.hset(f"file:{file['name']}", 'created_at', file['created_at'])
         
-        # Salvar metadados no Redis
-        redis_client = redis.Redis(host=redis_host, port=redis_port)
-        file_metadata = {
-            'lines': num_lines,
-            'created_at': timestamp
-        }
+        # Índice de arquivos por data de criação
+        pipe.zadd('file_index', {file['name']: file['created_ts'] for file in files})
         
-        redis_client.hmset(f"file:{file_name}", file_metadata)
+        # Atualizar a listagem em cache
+        update_listing = redis_client.register_script(UPDATE_LISTING_SCRIPT)
+        entries = []
+        for file in files:
+            entries += [file['name'], json.dumps({
+                'name': file['name'],
+                'lines': file['lines'],
+                'size': file['size']
+            })]
+        update_listing(keys=LISTING_KEYS, args=entries, client=pipe)
+        pipe.execute()
         
-        # Invalidar cache da listagem
-        redis_client.delete('file_metadata')
+        # Sem 'count', mantém a resposta de um único arquivo
+        if count is not None:
+            body = {
+                'files': [
+                    {'name': file['name'], 'lines': file['lines'], 'size': file['size']}
+                    for file in files
+                ],
+                'failed': failed
+            }
+        else:
+            body = {
+                'name': files[0]['name'],
+                'lines': files[0]['lines'],
+                'size': files[0]['size']
+            }
         
         return {
-            'statusCode': 200,
+            'statusCode': 207 if failed else 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Credentials': True
             },
-            'body': json.dumps({
-                'name': file_name,
-                'lines': num_lines
-            })
+            'body': json.dumps(body)
         }
         
     except Exception as e:
@@ -68,4 +420,7 @@ def handler(event, context):
                 'Access-Control-Allow-Credentials': True
             },
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+# Fim da inicialização do container
+startup.report('lambda_file_generate')
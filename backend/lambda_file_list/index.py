@@ -1,58 +1,714 @@
+# Primeiro import: com STARTUP_PROFILE=1 mede a importação dos demais
+from shared import startup
 import json
-import boto3
-import redis
 import os
+import math
+import time
+import random
+import base64
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from shared import get_client, get_redis, LISTING_KEYS
 
-def handler(event, context):
-    # Configurações do Redis
-    redis_host = os.environ['REDIS_HOST']
-    redis_port = 6379
+# Quantidade de HGETALL enviados por pipeline ao reconstruir a listagem
+METADATA_BATCH_SIZE = int(os.environ.get('METADATA_BATCH_SIZE', 1000))
+
+# Tamanho padrão e máximo das páginas da listagem paginada
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 1000))
+
+# Validade da listagem em cache. As escritas a mantêm atualizada; o TTL só
+# limita por quanto tempo uma divergência passaria despercebida.
+LISTING_TTL = int(os.environ.get('LISTING_TTL', 3600))
+
+# Cópia da última listagem reconstruída, servida como 'stale' enquanto
+# outra invocação reconstrói o cache
+STALE_TTL = int(os.environ.get('STALE_TTL', 3600))
+
+# Trava que garante uma única reconstrução por vez e tempo máximo que uma
+# invocação sem cópia antiga espera pela reconstrução em andamento
+REBUILD_LOCK_TTL = int(os.environ.get('REBUILD_LOCK_TTL', 30))
+REBUILD_WAIT_TIMEOUT = float(os.environ.get('REBUILD_WAIT_TIMEOUT', 5))
+
+# Renovação antecipada probabilística (XFetch): valores maiores renovam
+# mais cedo
+EARLY_REFRESH_BETA = float(os.environ.get('EARLY_REFRESH_BETA', 1.0))
+
+# Cache em memória (L1) do container: limite em bytes e intervalo em que a
+# geração da listagem no Redis é considerada atual sem nova consulta
+L1_MAX_BYTES = int(os.environ.get('L1_MAX_BYTES', 16 * 1024 * 1024))
+L1_TTL = float(os.environ.get('L1_TTL', 1))
+
+# Expor os contadores do L1 no cabeçalho X-L1-Stats (depuração); por padrão
+# eles não saem do container
+L1_DEBUG_HEADERS = os.environ.get('L1_DEBUG_HEADERS', 'false').lower() == 'true'
+
+# Máximo de entradas examinadas por página de uma consulta com filtros; a
+# página pode vir incompleta (com cursor) quando os filtros são pouco
+# seletivos em conjunto
+QUERY_SCAN_BUDGET = int(os.environ.get('QUERY_SCAN_BUDGET', 5000))
+
+# Parâmetros de filtro da listagem paginada
+FILTER_PARAMS = ('prefix', 'created_from', 'created_to', 'min_lines', 'max_lines')
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Consulta com filtros por prefixo do nome, data de criação e linhas, sobre
+# os índices file_index (pontuação = criação), file_index:name (ordem
+# lexicográfica) e file_index:lines (pontuação = linhas). O índice com
+# menos candidatos, estimado em O(log N), é percorrido por posição a partir
+# do cursor e os demais filtros são verificados com ZSCORE, então o custo
+# depende do tamanho da página e do limite de entradas examinadas, não do
+# total de arquivos. Retorna o índice percorrido, 1 se ele acabou, a
+# pontuação e o nome da última entrada examinada e os nomes encontrados.
+QUERY_SCRIPT = """
+local prefix = ARGV[1]
+local created_min, created_max = ARGV[2], ARGV[3]
+local lines_min, lines_max = ARGV[4], ARGV[5]
+local limit, budget = tonumber(ARGV[6]), tonumber(ARGV[7])
+local driver, after_score, after_name = ARGV[8], ARGV[9], ARGV[10]
+
+local function bound(value)
+    if value == '-inf' then return -math.huge end
+    if value == '+inf' then return math.huge end
+    return tonumber(value)
+end
+
+local function score_range(key, min, max)
+    local first = 0
+    if min ~= '-inf' then
+        first = redis.call('ZCOUNT', key, '-inf', '(' .. min)
+    end
+    return first, redis.call('ZCOUNT', key, '-inf', max) - 1
+end
+
+local function lex_range(key)
+    return redis.call('ZLEXCOUNT', key, '-', '(' .. prefix),
+        redis.call('ZLEXCOUNT', key, '-', '[' .. prefix .. '\\255') - 1
+end
+
+local has_prefix = prefix ~= ''
+local has_created = created_min ~= '-inf' or created_max ~= '+inf'
+local has_lines = lines_min ~= '-inf' or lines_max ~= '+inf'
+
+-- Escolher o índice com menos candidatos
+if driver == '' then
+    driver = 'created'
+    local best = redis.call('ZCOUNT', KEYS[1], created_min, created_max)
+    if has_lines then
+        local count = redis.call('ZCOUNT', KEYS[3], lines_min, lines_max)
+        if count < best then driver, best = 'lines', count end
+    end
+    if has_prefix then
+        local count = redis.call('ZLEXCOUNT', KEYS[2], '[' .. prefix, '[' .. prefix .. '\\255')
+        if count < best then driver, best = 'name', count end
+    end
+end
+
+local key, first, last
+if driver == 'name' then
+    key = KEYS[2]
+    first, last = lex_range(key)
+elseif driver == 'lines' then
+    key = KEYS[3]
+    first, last = score_range(key, lines_min, lines_max)
+else
+    key = KEYS[1]
+    first, last = score_range(key, created_min, created_max)
+end
+
+-- Continuar após a última entrada da página anterior
+local skip_ties = false
+if after_name ~= '' then
+    local rank = redis.call('ZRANK', key, after_name)
+    if rank then
+        first = rank + 1
+    elseif driver == 'name' then
+        first = redis.call('ZLEXCOUNT', key, '-', '[' .. after_name)
+    else
+        -- A entrada foi removida: recomeçar na sua pontuação, pulando as
+        -- de mesma pontuação e nome menor ou igual
+        first = redis.call('ZCOUNT', key, '-inf', '(' .. after_score)
+        skip_ties = true
+    end
+end
+
+local result = {driver, 1, after_score, after_name}
+local found, scanned, position = 0, 0, first
+local min_created, max_created = bound(created_min), bound(created_max)
+local min_lines, max_lines = bound(lines_min), bound(lines_max)
+while position <= last and found < limit and scanned < budget do
+    local stop = math.min(last, position + math.min(limit, budget - scanned) - 1)
+    local chunk = redis.call('ZRANGE', key, position, stop, 'WITHSCORES')
+    if #chunk == 0 then break end
+    for i = 1, #chunk, 2 do
+        local name, score = chunk[i], chunk[i + 1]
+        position = position + 1
+        scanned = scanned + 1
+        result[3], result[4] = score, name
+        local match = true
+        if skip_ties and tonumber(score) == tonumber(after_score) and name <= after_name then
+            match = false
+        end
+        if match and has_prefix and driver ~= 'name' then
+            match = string.sub(name, 1, #prefix) == prefix
+        end
+        if match and has_created and driver ~= 'created' then
+            local created = tonumber(redis.call('ZSCORE', KEYS[1], name))
+            match = created ~= nil and created >= min_created and created <= max_created
+        end
+        if match and has_lines and driver ~= 'lines' then
+            local lines = tonumber(redis.call('ZSCORE', KEYS[3], name))
+            match = lines ~= nil and lines >= min_lines and lines <= max_lines
+        end
+        if match then
+            found = found + 1
+            result[#result + 1] = name
+            if found == limit then break end
+        end
+    end
+end
+if position <= last then
+    result[2] = 0
+end
+return result
+"""
+
+# Publica a listagem reconstruída (montada em uma chave temporária). As
+# escritas feitas durante a reconstrução (versões após ARGV[1]) podem não
+# estar na listagem lida, então as suas entradas são reaplicadas a partir do
+# registro de alterações (ver UPDATE_LISTING_SCRIPT); só se o registro já
+# tiver descartado alguma delas a listagem é descartada. A publicação avança
+# a versão, para que cada conteúdo da listagem tenha uma versão (e um ETag)
+# próprio. Retorna a nova versão (0 se descartada) e as entradas reaplicadas.
+STORE_LISTING_SCRIPT = """
+local started = tonumber(ARGV[1])
+local patched = 0
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= started then
+    if started < tonumber(redis.call('GET', KEYS[5]) or '0') then
+        redis.call('DEL', KEYS[6])
+        return {0, 0}
+    end
+    local changed = redis.call('ZRANGEBYSCORE', KEYS[4], '(' .. started, '+inf')
+    for _, name in ipairs(changed) do
+        local entry = redis.call('HGET', KEYS[3], name)
+        if entry and entry ~= '' then
+            redis.call('HSET', KEYS[6], name, entry)
+        else
+            redis.call('HDEL', KEYS[6], name)
+        end
+    end
+    patched = #changed
+end
+local version = redis.call('INCR', KEYS[2])
+redis.call('HSET', KEYS[6], '', version)
+redis.call('RENAME', KEYS[6], KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return {version, patched}
+"""
+
+class LocalCache:
+    """
+    Cache LRU em memória, limitado pelo tamanho em bytes dos valores, que
+    sobrevive entre invocações de um mesmo container. Cada entrada guarda a
+    geração da listagem (file_metadata:version) em que foi lida e só é
+    válida enquanto essa geração for a atual.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.generation = None
+        self.generation_checked_at = 0
+
+    def current_generation(self, redis_client):
+        """
+        Geração atual da listagem, consultada no Redis no máximo uma vez a
+        cada L1_TTL segundos
+        """
+        now = time.monotonic()
+        if self.generation is None or now - self.generation_checked_at >= L1_TTL:
+            self.generation = redis_client.get('file_metadata:version') or b'0'
+            self.generation_checked_at = now
+        return self.generation
+
+    def set_generation(self, generation):
+        """
+        Registra uma geração conhecida por esta invocação (ex.: a publicada
+        pela reconstrução) sem consultar o Redis
+        """
+        self.generation = generation
+        self.generation_checked_at = time.monotonic()
+
+    def get(self, key, generation):
+        entry = self.entries.get(key)
+        if entry is None or entry[2] != generation:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, generation, size):
+        if size > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self.entries[key] = (value, size, generation)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size, _) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def stats(self):
+        return f"hits={self.hits};misses={self.misses};bytes={self.size}"
+
+# Criado uma vez por container
+local_cache = LocalCache(L1_MAX_BYTES)
+
+def encode_cursor(score, name):
+    return base64.urlsafe_b64encode(json.dumps([score, name]).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        score, name = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(score), str(name)
+    except (TypeError, ValueError):
+        raise ValueError("'cursor' inválido")
+
+def read_page(redis_client, cursor, limit):
+    """
+    Lê uma página do índice file_index (ordem de criação) a partir do
+    cursor, sem consultar o S3. O cursor guarda a pontuação e o nome da
+    última entrada entregue, então inserções e remoções entre páginas não
+    causam repetições nem saltos.
+    Retorna as entradas da página e o cursor da próxima (None no fim).
+    """
+    after = decode_cursor(cursor) if cursor else None
+    min_score = after[0] if after else '-inf'
+
+    entries = []
+    offset = 0
+    while len(entries) <= limit:
+        chunk = redis_client.zrangebyscore(
+            'file_index', min_score, '+inf',
+            start=offset, num=limit + 1, withscores=True
+        )
+        for member, score in chunk:
+            name = member.decode('utf-8')
+            # Entradas com a mesma pontuação do cursor são ordenadas pelo nome
+            if after and score == after[0] and name <= after[1]:
+                continue
+            entries.append((name, score))
+        if len(chunk) <= limit:
+            break
+        offset += len(chunk)
+
+    page = entries[:limit]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(entries) > limit else None
+    return load_entries(redis_client, [name for name, _ in page]), next_cursor
+
+def load_entries(redis_client, names):
+    """
+    Metadados de uma página: primeiro do cache local, o restante do Redis
+    em uma única ida e volta
+    """
+    generation = local_cache.current_generation(redis_client)
+    files = [local_cache.get(f"file:{name}", generation) for name in names]
+    missing = [index for index, file in enumerate(files) if file is None]
+
+    if missing:
+        pipe = redis_client.pipeline(transaction=False)
+        for index in missing:
+            pipe.hgetall(f"file:{names[index]}")
+
+        for index, metadata in zip(missing, pipe.execute()):
+            name = names[index]
+            files[index] = {
+                'name': name,
+                'lines': int(metadata[b'lines']) if b'lines' in metadata else None,
+                'size': int(metadata[b'size']) if b'size' in metadata else None
+            }
+            local_cache.put(f"file:{name}", files[index], generation, len(name) + 64)
+    return files
+
+def parse_timestamp(value, end_of_day=False):
+    """
+    Converte uma data ISO 8601 (ou epoch) em epoch. Datas sem hora no fim
+    de um intervalo incluem o dia inteiro.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Data inválida: '{value}'")
+    if end_of_day and len(value) == 10:
+        moment += timedelta(days=1, microseconds=-1)
+    return moment.timestamp()
+
+def parse_filters(params):
+    """
+    Lê os filtros 'prefix', 'created_from', 'created_to', 'min_lines' e
+    'max_lines'. Retorna None se nenhum foi informado.
+    """
+    if not any(params.get(name) for name in FILTER_PARAMS):
+        return None
+    try:
+        return {
+            'prefix': params.get('prefix') or '',
+            'created_from': repr(parse_timestamp(params['created_from'])) if params.get('created_from') else '-inf',
+            'created_to': repr(parse_timestamp(params['created_to'], end_of_day=True)) if params.get('created_to') else '+inf',
+            'min_lines': str(int(params['min_lines'])) if params.get('min_lines') else '-inf',
+            'max_lines': str(int(params['max_lines'])) if params.get('max_lines') else '+inf'
+        }
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Filtro inválido: {str(e)}")
+
+def query_page(redis_client, filters, cursor, limit):
+    """
+    Lê uma página dos arquivos que atendem aos filtros, com a interseção
+    calculada no Redis pelo QUERY_SCRIPT. O cursor guarda o índice
+    percorrido e a última entrada examinada.
+    Retorna as entradas da página e o cursor da próxima (None no fim).
+    """
+    driver, score, name = '', '', ''
+    if cursor:
+        try:
+            driver, score, name = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (TypeError, ValueError):
+            raise ValueError("'cursor' inválido")
+        if driver not in ('created', 'name', 'lines'):
+            raise ValueError("'cursor' inválido")
+
+    query = redis_client.register_script(QUERY_SCRIPT)
+    result = query(
+        keys=['file_index', 'file_index:name', 'file_index:lines'],
+        args=[
+            filters['prefix'],
+            filters['created_from'], filters['created_to'],
+            filters['min_lines'], filters['max_lines'],
+            limit, max(QUERY_SCAN_BUDGET, limit),
+            driver, score, name
+        ]
+    )
+
+    driver, done, score, name = [value.decode('utf-8') if isinstance(value, bytes) else value for value in result[:4]]
+    next_cursor = None
+    if not done:
+        next_cursor = base64.urlsafe_b64encode(json.dumps([driver, score, name]).encode('utf-8')).decode('ascii')
+    return load_entries(redis_client, [member.decode('utf-8') for member in result[4:]]), next_cursor
+
+def build_listing(s3_client, redis_client, bucket_name):
+    """
+    Reconstrói a listagem percorrendo todas as páginas do bucket e buscando
+    os metadados no Redis em pipelines. Objetos sem metadados (ainda não
+    processados) aparecem com 'lines' nulo.
+    """
+    files = []
+    missing = 0
+    paginator = s3_client.get_paginator('list_objects_v2')
+    
+    for page in paginator.paginate(Bucket=bucket_name):
+        items = page.get('Contents', [])
+        for i in range(0, len(items), METADATA_BATCH_SIZE):
+            batch = items[i:i + METADATA_BATCH_SIZE]
+            
+            # Recuperar metadados do próprio Redis em uma única ida e volta
+            pipe = redis_client.pipeline(transaction=False)
+            for item in batch:
+                pipe.hgetall(f"file:{item['Key']}")
+                
+                # Manter o índice paginado completo com objetos anteriores a ele
+                pipe.zadd('file_index', {item['Key']: item['LastModified'].timestamp()}, nx=True)
+                pipe.zadd('file_index:name', {item['Key']: 0}, nx=True)
+            
+            for item, metadata in zip(batch, pipe.execute()[::3]):
+                if not metadata:
+                    missing += 1
+                files.append({
+                    'name': item['Key'],
+                    'lines': int(metadata[b'lines']) if b'lines' in metadata else None,
+                    'size': item['Size']
+                })
+    
+    if missing:
+        print(f"{missing} objeto(s) sem metadados no Redis")
     
+    return files
+
+def read_cached_listing(redis_client):
+    """
+    Lê a listagem em cache (hash file_metadata:entries com uma entrada JSON por
+    arquivo e a versão no campo vazio). Retorna o corpo JSON, ou None se o
+    cache não existir ou não estiver na versão atual, a versão atual, o TTL
+    restante em milissegundos e a duração da última reconstrução.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hgetall('file_metadata:entries')
+    pipe.get('file_metadata:version')
+    pipe.pttl('file_metadata:entries')
+    pipe.get('file_metadata:rebuild_time')
+    cached, version, ttl, rebuild_time = pipe.execute()
+    version = version or b'0'
+    rebuild_time = float(rebuild_time or 0)
+
+    if not cached or cached.pop(b'', None) != version:
+        return None, version, ttl, rebuild_time
+
+    # As entradas já estão serializadas; basta ordená-las pelo nome
+    body = '[' + ', '.join(cached[name].decode('utf-8') for name in sorted(cached)) + ']'
+    return body, version, ttl, rebuild_time
+
+def should_refresh_early(ttl, rebuild_time):
+    """
+    XFetch: a chance de renovar antes do vencimento cresce à medida que o
+    TTL se aproxima do fim, proporcionalmente ao custo da reconstrução
+    """
+    if ttl <= 0 or not rebuild_time:
+        return False
+    return -rebuild_time * EARLY_REFRESH_BETA * math.log(1 - random.random()) * 1000 >= ttl
+
+def acquire_rebuild_lock(redis_client):
+    """
+    Tenta obter a trava de reconstrução; retorna o token ou None
+    """
+    import uuid
+    token = uuid.uuid4().hex
+    if redis_client.set('file_metadata:lock', token, nx=True, ex=REBUILD_LOCK_TTL):
+        return token
+    return None
+
+def release_rebuild_lock(redis_client, token):
+    release = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+    release(keys=['file_metadata:lock'], args=[token])
+
+def wait_for_rebuild(redis_client, version):
+    """
+    Aguarda a reconstrução em andamento por outra invocação. Se ela
+    terminar sem publicar a listagem, a trava fica livre e uma das
+    invocações em espera a obtém e reconstrói; as demais continuam
+    esperando.
+    Retorna a listagem publicada e a sua versão, ou o token da trava obtida
+    (ambos None se o tempo de espera acabou).
+    """
+    deadline = time.monotonic() + REBUILD_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        cached_data, version, _, _ = read_cached_listing(redis_client)
+        if cached_data:
+            return cached_data, version, None
+        token = acquire_rebuild_lock(redis_client)
+        if token:
+            return None, version, token
+    return None, version, None
+
+def request_header(event, name):
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def listing_etag(version):
+    """
+    ETag fraco derivado da versão da listagem. O API Gateway comprime as
+    respostas (minimumCompressionSize) sem alterar o ETag, e um validador
+    forte precisaria ser diferente para cada codificação do conteúdo.
+    """
+    if isinstance(version, bytes):
+        version = version.decode('ascii')
+    return f'W/"{version}"'
+
+def is_not_modified(event, etag):
+    """
+    Comparação fraca do If-None-Match (ignora o prefixo W/)
+    """
+    if_none_match = request_header(event, 'if-none-match')
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return if_none_match.strip() == '*' or etag.replace('W/', '', 1) in [tag.replace('W/', '', 1) for tag in tags]
+
+def not_modified_response(etag):
+    return {
+        'statusCode': 304,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Credentials': True,
+            'Access-Control-Expose-Headers': 'ETag',
+            'ETag': etag
+        },
+        'body': ''
+    }
+
+def listing_response(event, body, etag=None, cache_status=None):
+    """
+    Resposta da listagem com ETag. A compressão fica com o API Gateway
+    (minimumCompressionSize), que comprime conforme o Accept-Encoding.
+    """
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Credentials': True,
+        'Access-Control-Expose-Headers': 'ETag',
+        'Content-Type': 'application/json'
+    }
+    if L1_DEBUG_HEADERS:
+        headers['X-L1-Stats'] = local_cache.stats()
+    if etag:
+        headers['ETag'] = etag
+    if cache_status:
+        headers['X-Cache'] = cache_status
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': body
+    }
+
+def store_listing(redis_client, files, version, body, rebuild_time):
+    """
+    Grava a listagem reconstruída no cache, com as escritas feitas durante
+    a reconstrução reaplicadas, e guarda sempre a cópia 'stale'.
+    Retorna a nova versão da listagem (None se ela não foi publicada) e a
+    quantidade de entradas reaplicadas.
+    """
+    import uuid
+    building_key = f"file_metadata:building:{uuid.uuid4().hex}"
+    pipe = redis_client.pipeline(transaction=False)
+    for i in range(0, len(files), METADATA_BATCH_SIZE):
+        pipe.hset(building_key, mapping={
+            file['name']: json.dumps(file)
+            for file in files[i:i + METADATA_BATCH_SIZE]
+        })
+    pipe.expire(building_key, LISTING_TTL)
+    store = redis_client.register_script(STORE_LISTING_SCRIPT)
+    store(
+        keys=LISTING_KEYS + [building_key],
+        args=[version, LISTING_TTL],
+        client=pipe
+    )
+    pipe.set('file_metadata:stale', body, ex=STALE_TTL)
+    pipe.set('file_metadata:rebuild_time', rebuild_time)
+    version, patched = pipe.execute()[-3]
+    return version or None, patched
+
+def handler(event, context):
     try:
         # Conexão com Redis
-        redis_client = redis.Redis(host=redis_host, port=redis_port)
+        redis_client = get_redis()
         
-        # Tentar recuperar do cache primeiro
-        cached_data = redis_client.get('file_metadata')
-        if cached_data:
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Credentials': True
-                },
-                'body': cached_data.decode('utf-8')
-            }
+        # Geração atual da listagem, usada pelo cache local e pelo ETag
+        generation = local_cache.current_generation(redis_client)
+        if is_not_modified(event, listing_etag(generation)):
+            return not_modified_response(listing_etag(generation))
+        
+        # Listagem paginada servida do índice no Redis
+        params = event.get('queryStringParameters') or {}
+        if any(name in params for name in ('limit', 'cursor') + FILTER_PARAMS):
+            try:
+                filters = parse_filters(params)
+                limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+                if not 0 < limit <= MAX_PAGE_SIZE:
+                    raise ValueError(f"'limit' deve estar entre 1 e {MAX_PAGE_SIZE}")
+                if filters:
+                    # Consulta com filtros sobre os índices secundários
+                    files, next_cursor = query_page(redis_client, filters, params.get('cursor'), limit)
+                else:
+                    files, next_cursor = read_page(redis_client, params.get('cursor'), limit)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Credentials': True
+                    },
+                    'body': json.dumps({'error': str(e)})
+                }
+            
+            body = json.dumps({
+                'files': files,
+                'next_cursor': next_cursor
+            })
+            return listing_response(event, body, listing_etag(generation))
         
-        # Se não estiver em cache, buscar do S3
-        s3_client = boto3.client('s3')
-        bucket_name = os.environ['DATA_BUCKET_NAME']
+        # Cache local do container, válido enquanto a geração não mudar
+        local_data = local_cache.get('listing', generation)
+        if local_data:
+            return listing_response(event, local_data, listing_etag(generation), 'L1')
         
-        response = s3_client.list_objects_v2(Bucket=bucket_name)
+        # Tentar recuperar do cache primeiro
+        cached_data, version, ttl, rebuild_time = read_cached_listing(redis_client)
+        if cached_data and not should_refresh_early(ttl, rebuild_time):
+            local_cache.put('listing', cached_data, version, len(cached_data))
+            return listing_response(event, cached_data, listing_etag(version), 'HIT')
         
-        files = []
-        for item in response.get('Contents', []):
-            # Recuperar metadados do próprio Redis
-            metadata = redis_client.hgetall(f"file:{item['Key']}")
+        # Apenas uma invocação reconstrói; as demais servem o valor anterior
+        token = acquire_rebuild_lock(redis_client)
+        if not token:
+            if cached_data:
+                return listing_response(event, cached_data, listing_etag(version), 'HIT')
             
-            if metadata:
-                files.append({
-                    'name': item['Key'],
-                    'lines': int(metadata.get(b'lines', 0)),
-                    'size': item['Size']
-                })
+            stale_data = redis_client.get('file_metadata:stale')
+            if stale_data:
+                return listing_response(event, stale_data.decode('utf-8'), cache_status='STALE')
+            
+            cached_data, version, token = wait_for_rebuild(redis_client, version)
+            if cached_data:
+                return listing_response(event, cached_data, listing_etag(version), 'HIT')
+            if not token:
+                # Reconstruir sem a trava traria de volta a corrida de
+                # reconstruções; o cliente tenta de novo em seguida
+                return {
+                    'statusCode': 503,
+                    'headers': {
+                        'Access-Control-Allow-Origin': '*',
+                        'Access-Control-Allow-Credentials': True,
+                        'Retry-After': '1'
+                    },
+                    'body': json.dumps({'error': 'Listagem em reconstrução, tente novamente'})
+                }
         
-        # Atualizar cache
-        redis_client.setex('file_metadata', 300, json.dumps(files))  # Cache por 5 minutos
+        try:
+            # Se não estiver em cache, buscar do S3
+            s3_client = get_client('s3')
+            bucket_name = os.environ['DATA_BUCKET_NAME']
+            
+            started = time.monotonic()
+            files = build_listing(s3_client, redis_client, bucket_name)
+            body = json.dumps(files)
+            
+            # Atualizar cache (mantido incrementalmente pelas escritas)
+            version, patched = store_listing(redis_client, files, version, body, time.monotonic() - started)
+        finally:
+            if token:
+                release_rebuild_lock(redis_client, token)
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps(files)
-        }
+        if version is None:
+            # Listagem não publicada: o registro de alterações não cobre mais
+            # todas as escritas feitas durante a reconstrução
+            return listing_response(event, body, cache_status='MISS')
+        
+        version = str(version).encode('ascii')
+        if patched:
+            # A listagem publicada inclui escritas feitas durante a
+            # reconstrução; o corpo servido com o ETag deve ser o publicado
+            cached_data, cached_version, _, _ = read_cached_listing(redis_client)
+            if not cached_data:
+                return listing_response(event, body, cache_status='MISS')
+            body, version = cached_data, cached_version
+        local_cache.set_generation(version)
+        local_cache.put('listing', body, version, len(body))
+        return listing_response(event, body, listing_etag(version), 'MISS')
         
     except Exception as e:
         return {
@@ -62,4 +718,7 @@ def handler(event, context):
                 'Access-Control-Allow-Credentials': True
             },
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+# Fim da inicialização do container
+startup.report('lambda_file_list')
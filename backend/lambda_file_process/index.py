@@ -1,49 +1,747 @@
+# Primeiro import: com STARTUP_PROFILE=1 mede a importação dos demais
+from shared import startup
 import json
-import boto3
-import redis
 import os
+import random
+import hashlib
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
+from shared import get_client, get_redis, LISTING_KEYS, verify_line_count, UPDATE_LISTING_SCRIPT, UPDATE_STATS_SCRIPT
 
-def count_lines(content):
-    return len(content.split('\n'))
+# Tamanho do bloco lido do S3 a cada iteração (1 MiB por padrão)
+READ_CHUNK_SIZE = int(os.environ.get('READ_CHUNK_SIZE', 1024 * 1024))
 
-def handler(event, context):
-    # Configurações
-    redis_host = os.environ['REDIS_HOST']
-    redis_port = 6379
-    
+# Número máximo de downloads simultâneos por invocação
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 8))
+
+# Objetos acima deste tamanho são lidos em intervalos de bytes paralelos
+LARGE_OBJECT_THRESHOLD = int(os.environ.get('LARGE_OBJECT_THRESHOLD', 64 * 1024 * 1024))
+RANGE_PART_SIZE = int(os.environ.get('RANGE_PART_SIZE', 16 * 1024 * 1024))
+RANGE_CONCURRENCY = int(os.environ.get('RANGE_CONCURRENCY', 8))
+
+# Objetos grandes são divididos em tarefas de intervalo enviadas para a
+# fila do fan-out (FANOUT_QUEUE_URL), consumida uma tarefa por invocação.
+# As partes têm FANOUT_PART_SIZE bytes, limitadas ao que a vazão de leitura
+# estimada (FANOUT_THROUGHPUT, bytes/s) conta em FANOUT_TIME_BUDGET do
+# timeout da função (definido pelo deploy): com 900 s, partes de 256 MiB;
+# com o timeout padrão da Lambda (3 s), menos de 50 MiB. Só vale dividir
+# objetos de ao menos duas partes.
+FUNCTION_TIMEOUT = int(os.environ.get('FUNCTION_TIMEOUT', 3))
+FANOUT_THROUGHPUT = int(os.environ.get('FANOUT_THROUGHPUT', 32 * 1024 * 1024))
+FANOUT_TIME_BUDGET = float(os.environ.get('FANOUT_TIME_BUDGET', 0.5))
+FANOUT_PART_SIZE = int(os.environ.get(
+    'FANOUT_PART_SIZE',
+    max(READ_CHUNK_SIZE, min(256 * 1024 * 1024, int(FANOUT_THROUGHPUT * FUNCTION_TIMEOUT * FANOUT_TIME_BUDGET)))
+))
+FANOUT_THRESHOLD = max(
+    int(os.environ.get('FANOUT_THRESHOLD', 1024 * 1024 * 1024)),
+    2 * FANOUT_PART_SIZE
+)
+JOB_TTL = int(os.environ.get('JOB_TTL', 86400))
+
+# Validade das marcações de objetos já contados (0 desativa a deduplicação)
+DEDUPE_TTL = int(os.environ.get('DEDUPE_TTL', 7 * 86400))
+
+# Notificações por chamada publish_batch (limite do SNS)
+SNS_BATCH_SIZE = 10
+
+# Usar a contagem gravada nos metadados do objeto (x-amz-meta-line-count)
+# com um HEAD, sem baixar o conteúdo, quando ela vem assinada pela geração
+# junto com o tamanho, o ETag e o checksum do objeto
+# (x-amz-meta-line-count-signature, ver shared.signing). Objetos sem
+# assinatura válida são sempre contados, e uma fração dos assinados também,
+# para verificar os metadados.
+TRUST_LINE_COUNT_METADATA = os.environ.get('TRUST_LINE_COUNT_METADATA', 'true').lower() == 'true'
+VERIFY_SAMPLE_RATE = float(os.environ.get('VERIFY_SAMPLE_RATE', 0.01))
+
+NEWLINE = ord('\n')
+
+# Soma atomicamente o resultado de uma tarefa ao job. Os índices das partes
+# já somadas ficam no conjunto KEYS[2], e uma parte reentregue pelo SQS não
+# é somada de novo: se o job já estiver completo, a contagem é devolvida
+# com remaining = 0 para que a finalização (que pode ter falhado) seja
+# refeita; senão, é ignorada com remaining = -1, como jobs expirados.
+MERGE_PART_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1, 0}
+end
+if redis.call('SADD', KEYS[2], ARGV[1]) == 0 then
+    local job = redis.call('HMGET', KEYS[1], 'remaining', 'lines')
+    if tonumber(job[1]) == 0 then
+        return {0, tonumber(job[2])}
+    end
+    return {-1, 0}
+end
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+local lines = redis.call('HINCRBY', KEYS[1], 'lines', ARGV[2])
+local remaining = redis.call('HINCRBY', KEYS[1], 'remaining', -1)
+return {remaining, lines}
+"""
+
+def count_newlines(body, chunk_size=READ_CHUNK_SIZE, hasher=None):
+    """
+    Conta os bytes '\\n' de um StreamingBody lendo blocos de tamanho fixo,
+    sem decodificar nem manter o arquivo em memória. Quando o stream suporta
+    readinto, o mesmo buffer é reaproveitado entre as leituras. Se um hasher
+    for informado, ele também recebe o conteúdo lido.
+    Retorna a contagem e o último byte lido (None se o stream estiver vazio).
+    """
+    readinto = getattr(body, 'readinto', None)
+    buffer = bytearray(chunk_size) if readinto is not None else None
+    newlines = 0
+    last_byte = None
+
+    while True:
+        if buffer is not None:
+            size = readinto(buffer)
+            chunk = buffer
+        else:
+            chunk = body.read(chunk_size)
+            size = len(chunk)
+        if not size:
+            break
+        newlines += chunk.count(b'\n', 0, size)
+        last_byte = chunk[size - 1]
+        if hasher is not None:
+            hasher.update(memoryview(chunk)[:size])
+
+    return newlines, last_byte
+
+def count_lines(body, chunk_size=READ_CHUNK_SIZE, hasher=None):
+    """
+    Conta as linhas de um StreamingBody; uma última linha sem '\\n' final
+    também é contada
+    """
+    newlines, last_byte = count_newlines(body, chunk_size, hasher)
+    if last_byte is not None and last_byte != NEWLINE:
+        newlines += 1
+    return newlines
+
+def split_ranges(start, end, part_size):
+    """
+    Divide o intervalo inclusivo de bytes [start, end] em partes de até
+    part_size bytes
+    """
+    return [
+        (part_start, min(part_start + part_size, end + 1) - 1)
+        for part_start in range(start, end + 1, part_size)
+    ]
+
+def count_range(s3_client, bucket_name, file_name, byte_range, **get_args):
+    """
+    Conta os '\\n' de um intervalo de bytes do objeto
+    """
+    start, end = byte_range
+    response = s3_client.get_object(
+        Bucket=bucket_name,
+        Key=file_name,
+        Range=f"bytes={start}-{end}",
+        **get_args
+    )
+    body = response['Body']
     try:
-        # Obter informações do evento S3
-        bucket_name = event['Records'][0]['s3']['bucket']['name']
-        file_name = event['Records'][0]['s3']['object']['key']
-        
-        # Ler arquivo do S3
-        s3_client = boto3.client('s3')
+        newlines, last_byte = count_newlines(body)
+    finally:
+        body.close()
+    return newlines, last_byte, response['LastModified']
+
+def count_newlines_ranged(s3_client, bucket_name, file_name, start, end,
+                          part_size=RANGE_PART_SIZE, concurrency=RANGE_CONCURRENCY, **get_args):
+    """
+    Conta os '\\n' do intervalo [start, end] com GETs de intervalos de bytes
+    simultâneos. Como as partes são disjuntas, o total é a soma das partes.
+    Retorna a contagem, o último byte do intervalo e o LastModified do objeto.
+    """
+    ranges = split_ranges(start, end, part_size)
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(ranges)))) as executor:
+        results = list(executor.map(
+            lambda byte_range: count_range(s3_client, bucket_name, file_name, byte_range, **get_args),
+            ranges
+        ))
+
+    _, last_byte, last_modified = results[-1]
+    return sum(newlines for newlines, _, _ in results), last_byte, last_modified
+
+def count_lines_ranged(s3_client, bucket_name, file_name, size,
+                       part_size=RANGE_PART_SIZE, concurrency=RANGE_CONCURRENCY, **get_args):
+    """
+    Conta as linhas de um objeto grande com GETs de intervalos de bytes
+    simultâneos; só o último byte do objeto decide se há uma linha final
+    sem quebra.
+    Retorna o número de linhas e o LastModified do objeto.
+    """
+    num_lines, last_byte, last_modified = count_newlines_ranged(
+        s3_client, bucket_name, file_name, 0, size - 1,
+        part_size=part_size, concurrency=concurrency, **get_args
+    )
+    if last_byte is not None and last_byte != NEWLINE:
+        num_lines += 1
+    return num_lines, last_modified
+
+def dispatch_fanout(sqs_client, redis_client, bucket_name, file_name, size, get_args, identity=None):
+    """
+    Divide o objeto em tarefas de intervalo e as envia em lote para a fila
+    do fan-out. Cada invocação que processa uma tarefa soma seu resultado
+    parcial no Redis; a última a terminar grava os metadados do arquivo.
+    """
+    import uuid
+    job_id = uuid.uuid4().hex
+    ranges = split_ranges(0, size - 1, FANOUT_PART_SIZE)
+
+    # Registrar o job antes de publicar as tarefas
+    pipe = redis_client.pipeline()
+    pipe.hmset(f"job:{job_id}", {
+        'bucket': bucket_name,
+        'file': file_name,
+        'parts': len(ranges),
+        'remaining': len(ranges),
+        'lines': 0
+    })
+    pipe.expire(f"job:{job_id}", JOB_TTL)
+    pipe.execute()
+
+    tasks = [
+        {
+            'task': 'count_range',
+            'job_id': job_id,
+            'bucket': bucket_name,
+            'file': file_name,
+            'part': part,
+            'start': start,
+            'end': end,
+            'last': part == len(ranges) - 1,
+            'size': size,
+            'get_args': get_args,
+            'identity': identity
+        }
+        for part, (start, end) in enumerate(ranges)
+    ]
+
+    # SQS aceita no máximo 10 mensagens por lote
+    for i in range(0, len(tasks), 10):
+        response = sqs_client.send_message_batch(
+            QueueUrl=os.environ['FANOUT_QUEUE_URL'],
+            Entries=[
+                {'Id': str(task['part']), 'MessageBody': json.dumps(task)}
+                for task in tasks[i:i + 10]
+            ]
+        )
+        if response.get('Failed'):
+            raise Exception(f"Falha ao enviar tarefas do job {job_id}: {response['Failed']}")
+
+    return {'job_id': job_id, 'parts': len(ranges)}
+
+def process_task(s3_client, task):
+    """
+    Conta as linhas do intervalo de bytes de uma tarefa do fan-out
+    """
+    newlines, last_byte, last_modified = count_newlines_ranged(
+        s3_client, task['bucket'], task['file'], task['start'], task['end'],
+        **task['get_args']
+    )
+    if task['last'] and last_byte is not None and last_byte != NEWLINE:
+        newlines += 1
+
+    return {
+        'job_id': task['job_id'],
+        'part': task['part'],
+        'bucket': task['bucket'],
+        'file': task['file'],
+        'lines': newlines,
+        'size': task['size'],
+        'processed_at': last_modified.strftime('%Y-%m-%d %H:%M:%S'),
+        'modified_at': last_modified.timestamp(),
+        'identity': task.get('identity')
+    }
+
+def object_identity(record):
+    """
+    Retorna a identidade do conteúdo de um registro S3 (bucket, chave,
+    versão, ETag e tamanho), ou None se o evento não trouxer o ETag
+    """
+    s3_object = record['s3']['object']
+    if not s3_object.get('eTag'):
+        return None
+    return {
+        'bucket': record['s3']['bucket']['name'],
+        'key': unquote_plus(s3_object['key']),
+        'version_id': s3_object.get('versionId') or 'null',
+        'etag': s3_object['eTag'].strip('"'),
+        'size': s3_object.get('size')
+    }
+
+def dedupe_keys(identity):
+    """
+    Chaves de deduplicação: uma para o objeto exato (bucket, chave, versão,
+    ETag) e um índice por ETag que reaproveita a contagem de conteúdo
+    idêntico enviado com outra chave
+    """
+    return (
+        f"processed:{identity['bucket']}:{identity['version_id']}:{identity['etag']}:{identity['key']}",
+        f"etag:{identity['etag']}:{identity['size']}"
+    )
+
+def lookup_processed(redis_client, records):
+    """
+    Consulta em uma única ida ao Redis quais registros já foram contados.
+    Retorna os registros pendentes e os resultados reaproveitados, que
+    dispensam qualquer acesso ao S3.
+    """
+    candidates = []
+    if DEDUPE_TTL:
+        for item in records:
+            identity = object_identity(item[1])
+            if identity:
+                candidates.append((item, identity))
+    if not candidates:
+        return records, []
+
+    pipe = redis_client.pipeline(transaction=False)
+    for _, identity in candidates:
+        for key in dedupe_keys(identity):
+            pipe.get(key)
+    values = pipe.execute()
+
+    reused = {}
+    for index, (item, identity) in enumerate(candidates):
+        exact, same_content = values[2 * index], values[2 * index + 1]
+        if exact or same_content:
+            cached = json.loads(exact or same_content)
+            reused[id(item)] = {
+                'bucket': identity['bucket'],
+                'file': identity['key'],
+                'lines': cached['lines'],
+                'size': identity['size'],
+                'processed_at': cached['processed_at'] if exact else datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'modified_at': time.time(),
+                'identity': identity,
+                'deduplicated': True
+            }
+
+    pending = [item for item in records if id(item) not in reused]
+    return pending, list(reused.values())
+
+def parse_sqs_body(record):
+    """
+    Decodifica o corpo de uma mensagem SQS, abrindo o envelope SNS quando
+    houver. Mensagens que não são JSON (ex.: notificações em texto do
+    tópico) retornam um dicionário vazio.
+    """
+    try:
+        body = json.loads(record['body'])
+        if isinstance(body, dict) and body.get('Type') == 'Notification':
+            body = json.loads(body['Message'])
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+def extract_s3_records(event):
+    """
+    Retorna os registros S3 de um evento, incluindo os encapsulados em
+    mensagens SNS e/ou SQS
+    """
+    records = []
+    for record in event.get('Records', []):
+        if 's3' in record:
+            records.append(record)
+        elif 'Sns' in record:
+            try:
+                records.extend(extract_s3_records(json.loads(record['Sns']['Message'])))
+            except ValueError:
+                continue
+        elif record.get('eventSource') == 'aws:sqs':
+            records.extend(extract_s3_records(parse_sqs_body(record)))
+    return records
+
+def extract_work_items(event):
+    """
+    Separa o evento em itens de trabalho (messageId, registro S3),
+    (messageId, tarefa de intervalo) e (messageId, notificação). O messageId
+    só existe para itens recebidos via SQS e identifica a mensagem a ser
+    reprocessada em caso de falha.
+    """
+    records = []
+    tasks = []
+    notifications = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:sqs':
+            body = parse_sqs_body(record)
+            if body.get('task') == 'count_range':
+                tasks.append((record['messageId'], body))
+            elif body.get('task') == 'notify':
+                notifications.append((record['messageId'], body))
+            else:
+                records.extend(
+                    (record['messageId'], s3_record)
+                    for s3_record in extract_s3_records(body)
+                )
+        else:
+            records.extend((None, s3_record) for s3_record in extract_s3_records({'Records': [record]}))
+    return records, tasks, notifications
+
+def publish_notifications(sns_client, notifications):
+    """
+    Publica as notificações (messageId, {'subject', 'message'}) no SNS em
+    lotes de até 10 com publish_batch. Retorna as falhas.
+    """
+    failed = []
+    for i in range(0, len(notifications), SNS_BATCH_SIZE):
+        batch = notifications[i:i + SNS_BATCH_SIZE]
+        try:
+            response = sns_client.publish_batch(
+                TopicArn=os.environ['SNS_TOPIC_ARN'],
+                PublishBatchRequestEntries=[
+                    {
+                        'Id': str(index),
+                        'Message': notification['message'],
+                        'Subject': notification['subject']
+                    }
+                    for index, (_, notification) in enumerate(batch)
+                ]
+            )
+            errors = [(int(item['Id']), item.get('Message', item['Code'])) for item in response.get('Failed', [])]
+        except Exception as e:
+            errors = [(index, str(e)) for index in range(len(batch))]
+
+        for index, error in errors:
+            message_id, notification = batch[index]
+            failed.append({
+                'notification': notification['subject'],
+                'messageId': message_id,
+                'error': error
+            })
+    return failed
+
+def process_record(s3_client, sqs_client, redis_client, record):
+    """
+    Conta as linhas do objeto referenciado por um registro S3, ou distribui
+    a contagem entre outras invocações se o objeto for grande demais
+    """
+    bucket_name = record['s3']['bucket']['name']
+    file_name = unquote_plus(record['s3']['object']['key'])
+    size = record['s3']['object'].get('size')
+
+    # Ler a versão notificada, quando o bucket é versionado
+    get_args = {}
+    if record['s3']['object'].get('versionId'):
+        get_args['VersionId'] = record['s3']['object']['versionId']
+
+    # Objetos gerados pela aplicação trazem a contagem assinada nos metadados
+    head = None
+    metadata_lines = None
+    if TRUST_LINE_COUNT_METADATA:
+        head = s3_client.head_object(Bucket=bucket_name, Key=file_name, **get_args)
+        size = head['ContentLength']
+        metadata = head.get('Metadata', {})
+        try:
+            metadata_lines = int(metadata['line-count'])
+        except (KeyError, ValueError):
+            metadata_lines = None
+
+        # A assinatura cobre o tamanho e o ETag que o S3 devolve no HEAD:
+        # um objeto regravado com os metadados de outro não confere
+        signed = metadata_lines is not None and verify_line_count(
+            file_name, metadata_lines, size, head['ETag'].strip('"'),
+            metadata.get('content-sha256'), metadata.get('line-count-signature')
+        )
+        if signed and random.random() >= VERIFY_SAMPLE_RATE:
+            return {
+                'bucket': bucket_name,
+                'file': file_name,
+                'lines': metadata_lines,
+                'size': size,
+                'processed_at': head['LastModified'].strftime('%Y-%m-%d %H:%M:%S'),
+                'modified_at': head['LastModified'].timestamp(),
+                'identity': object_identity(record),
+                'head_only': True
+            }
+
+    # Sem versão, os GETs por intervalo são amarrados ao ETag atual para
+    # não misturar partes de conteúdos diferentes
+    needs_etag = 'VersionId' not in get_args and (size is None or size > LARGE_OBJECT_THRESHOLD)
+    if head is None and (size is None or needs_etag):
+        head = s3_client.head_object(Bucket=bucket_name, Key=file_name, **get_args)
+        size = head['ContentLength']
+    if needs_etag and size > LARGE_OBJECT_THRESHOLD:
+        get_args['IfMatch'] = head['ETag']
+
+    if size > FANOUT_THRESHOLD and os.environ.get('FANOUT_QUEUE_URL'):
+        # Objetos enormes: tarefas distribuídas pela fila do fan-out
+        job = dispatch_fanout(
+            sqs_client, redis_client, bucket_name, file_name, size, get_args,
+            identity=object_identity(record)
+        )
+        return {
+            'bucket': bucket_name,
+            'file': file_name,
+            'job': job
+        }
+    elif size > LARGE_OBJECT_THRESHOLD:
+        # Objetos grandes: intervalos de bytes em paralelo
+        num_lines, last_modified = count_lines_ranged(
+            s3_client, bucket_name, file_name, size, **get_args
+        )
+    else:
+        # Ler arquivo do S3 em streaming
         response = s3_client.get_object(
             Bucket=bucket_name,
-            Key=file_name
+            Key=file_name,
+            **get_args
         )
-        content = response['Body'].read().decode('utf-8')
-        
-        # Contar linhas
-        num_lines = count_lines(content)
-        
-        # Salvar metadados no Redis
-        redis_client = redis.Redis(host=redis_host, port=redis_port)
-        file_metadata = {
-            'lines': num_lines,
-            'processed_at': response['LastModified'].strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        redis_client.hmset(f"file:{file_name}", file_metadata)
+
+        # Contar linhas sem carregar o arquivo inteiro em memória
+        body = response['Body']
+        hasher = hashlib.sha256() if metadata_lines is not None else None
+        try:
+            num_lines = count_lines(body, hasher=hasher)
+        finally:
+            body.close()
+        last_modified = response['LastModified']
+
+        expected_checksum = head.get('Metadata', {}).get('content-sha256') if hasher else None
+        if expected_checksum and expected_checksum != hasher.hexdigest():
+            print(f"Checksum dos metadados de {file_name} não confere com o conteúdo")
+
+    if metadata_lines is not None and metadata_lines != num_lines:
+        print(f"Contagem dos metadados de {file_name} ({metadata_lines}) difere da real ({num_lines})")
+
+    return {
+        'bucket': bucket_name,
+        'file': file_name,
+        'lines': num_lines,
+        'size': size,
+        'processed_at': last_modified.strftime('%Y-%m-%d %H:%M:%S'),
+        'modified_at': last_modified.timestamp(),
+        'identity': object_identity(record)
+    }
+
+def process_event(event):
+    """
+    Processa todos os registros S3 e tarefas de fan-out de um evento e
+    retorna os arquivos processados, os distribuídos e as falhas
+    """
+    # Obter todos os registros S3, tarefas de fan-out e notificações do evento
+    records, tasks, notifications = extract_work_items(event)
+
+    # Clientes reutilizados entre invocações; o pool de conexões do S3
+    # (AWS_MAX_POOL_CONNECTIONS) deve comportar MAX_WORKERS * RANGE_CONCURRENCY.
+    # Lotes só com notificações não usam S3 nem SQS.
+    s3_client = get_client('s3') if records or tasks else None
+    sqs_client = get_client('sqs') if records else None
+    redis_client = get_redis()
+    processed = []
+    dispatched = []
+    completed_parts = []
+    failed = []
+
+    # Objetos já contados (reentregas, reprocessamentos ou conteúdo idêntico
+    # com outra chave) não passam pelo S3
+    records, deduplicated = lookup_processed(redis_client, records)
+    processed.extend(deduplicated)
+
+    def safe_process(item):
+        message_id, record = item
+        try:
+            return process_record(s3_client, sqs_client, redis_client, record), None
+        except Exception as e:
+            failure = {
+                'bucket': record['s3']['bucket']['name'],
+                'file': unquote_plus(record['s3']['object']['key']),
+                'error': str(e)
+            }
+            if message_id:
+                failure['messageId'] = message_id
+            return None, failure
+
+    def safe_process_task(item):
+        message_id, task = item
+        try:
+            return process_task(s3_client, task), None
+        except Exception as e:
+            return None, {
+                'bucket': task['bucket'],
+                'file': task['file'],
+                'part': task['part'],
+                'messageId': message_id,
+                'error': str(e)
+            }
+
+    # Processar arquivos e tarefas em paralelo
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(records) + len(tasks)))) as executor:
+        for result, failure in executor.map(safe_process, records):
+            if failure:
+                print(f"Erro ao processar arquivo {failure['file']}: {failure['error']}")
+                failed.append(failure)
+            elif 'job' in result:
+                dispatched.append(result)
+            else:
+                processed.append(result)
+
+        for result, failure in executor.map(safe_process_task, tasks):
+            if failure:
+                print(f"Erro ao processar parte {failure['part']} de {failure['file']}: {failure['error']}")
+                failed.append(failure)
+            else:
+                completed_parts.append(result)
+
+    # Somar os resultados parciais do fan-out; a última parte de cada
+    # job fecha a contagem do arquivo
+    finished_jobs = []
+    if completed_parts:
+        merge_part = redis_client.register_script(MERGE_PART_SCRIPT)
+        pipe = redis_client.pipeline(transaction=False)
+        for part in completed_parts:
+            merge_part(
+                keys=[f"job:{part['job_id']}", f"job:{part['job_id']}:done"],
+                args=[part['part'], part['lines'], JOB_TTL],
+                client=pipe
+            )
+        for part, (remaining, lines) in zip(completed_parts, pipe.execute()):
+            if remaining == 0:
+                finished_jobs.append(part['job_id'])
+                processed.append({**part, 'lines': lines})
+
+    # Salvar metadados no Redis em uma única ida e volta
+    if processed:
+        pipe = redis_client.pipeline(transaction=False)
+
+        # Linhas, tamanho, estatísticas agregadas e índices secundários; o
+        # tamanho fica como estava quando não é conhecido
+        update_stats = redis_client.register_script(UPDATE_STATS_SCRIPT)
+        stats_args = []
+        for result in processed:
+            stats_args += [result['file'], result['lines'], result['size'] if result.get('size') is not None else '']
+        update_stats(
+            keys=['file_stats', 'file_stats:histogram', 'file_index:name', 'file_index:lines'] + [f"file:{result['file']}" for result in processed],
+            args=stats_args,
+            client=pipe
+        )
+
+        for result in processed:
+            pipe.hset(f"file:{result['file']}", 'processed_at', result['processed_at'])
+
+            # Incluir no índice por data de criação (arquivos gerados já
+            # foram indexados pela lambda de geração)
+            pipe.zadd('file_index', {result['file']: result['modified_at']}, nx=True)
+
+        # Marcar os objetos como contados. O ponteiro dedupe:<nome> guarda
+        # as marcações do arquivo para que a exclusão as remova; sem isso,
+        # um evento reentregue depois da exclusão recriaria o arquivo.
+        for result in processed:
+            if result.get('identity') and DEDUPE_TTL:
+                value = json.dumps({
+                    'lines': result['lines'],
+                    'processed_at': result['processed_at']
+                })
+                keys = dedupe_keys(result['identity'])
+                for key in keys:
+                    pipe.setex(key, DEDUPE_TTL, value)
+                pipe.sadd(f"dedupe:{result['file']}", *keys)
+                pipe.expire(f"dedupe:{result['file']}", DEDUPE_TTL)
+
+        # Atualizar a listagem em cache
+        update_listing = redis_client.register_script(UPDATE_LISTING_SCRIPT)
+        entries = []
+        for result in processed:
+            entries += [result['file'], json.dumps({
+                'name': result['file'],
+                'lines': result['lines'],
+                'size': result.get('size')
+            })]
+        update_listing(keys=LISTING_KEYS, args=entries, client=pipe)
+        pipe.execute()
+
+    # Os jobs só são removidos depois de gravados os metadados: se a
+    # gravação falhar, a mensagem da última parte volta para a fila e a
+    # reentrega refaz a finalização
+    if finished_jobs:
+        redis_client.delete(*(
+            key for job_id in finished_jobs
+            for key in (f"job:{job_id}", f"job:{job_id}:done")
+        ))
+
+    # Notificar a conclusão das contagens distribuídas junto com as
+    # notificações recebidas pela fila (outbox das outras lambdas)
+    for result in processed:
+        if result.get('job_id') in finished_jobs:
+            notifications.append((None, {
+                'subject': 'Arquivo Processado',
+                'message': f"Arquivo {result['file']} processado com {result['lines']} linhas"
+            }))
+    if notifications:
+        for failure in publish_notifications(get_client('sns'), notifications):
+            print(f"Erro ao publicar notificação {failure['notification']}: {failure['error']}")
+            if failure['messageId']:
+                failed.append(failure)
+
+    head_only = sum(1 for result in processed if result.get('head_only'))
+    if deduplicated or head_only:
+        print(f"GETs evitados: {len(deduplicated)} por deduplicação, {head_only} por metadados")
+
+    return {
+        'processed': processed,
+        'dispatched': dispatched,
+        'completed_parts': completed_parts,
+        'deduplicated': len(deduplicated),
+        'head_only': head_only,
+        'notified': len(notifications),
+        'failed': failed
+    }
+
+def sqs_handler(event, context):
+    """
+    Ponto de entrada para lotes do SQS (event source mapping com
+    ReportBatchItemFailures). Apenas as mensagens com falha voltam para a
+    fila; um erro geral levanta exceção e devolve o lote inteiro.
+    """
+    summary = process_event(event)
+
+    failed_messages = []
+    for failure in summary['failed']:
+        if failure['messageId'] not in failed_messages:
+            failed_messages.append(failure['messageId'])
+
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': message_id}
+            for message_id in failed_messages
+        ]
+    }
+
+def handler(event, context):
+    # Lotes do SQS usam o retorno de falhas parciais
+    records = event.get('Records', [])
+    if records and all(record.get('eventSource') == 'aws:sqs' for record in records):
+        return sqs_handler(event, context)
+    
+    try:
+        summary = process_event(event)
+        processed = summary['processed']
+        dispatched = summary['dispatched']
+        failed = summary['failed']
         
-        # Invalidar cache da listagem
-        redis_client.delete('file_metadata')
+        if failed and not (processed or dispatched or summary['completed_parts']):
+            status_code = 500
+        elif failed:
+            status_code = 207
+        else:
+            status_code = 200
         
         return {
-            'statusCode': 200,
+            'statusCode': status_code,
             'body': json.dumps({
-                'file': file_name,
-                'lines': num_lines
+                'processed': [
+                    {'file': result['file'], 'lines': result['lines']}
+                    for result in processed
+                ],
+                'dispatched': [
+                    {'file': result['file'], **result['job']}
+                    for result in dispatched
+                ],
+                'skipped_gets': summary['deduplicated'] + summary['head_only'],
+                'failed': failed
             })
         }
         
@@ -52,4 +750,7 @@ def handler(event, context):
         return {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+# Fim da inicialização do container
+startup.report('lambda_file_process')
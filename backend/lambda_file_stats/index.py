@@ -0,0 +1,131 @@
+# Primeiro import: com STARTUP_PROFILE=1 mede a importação dos demais
+from shared import startup
+import json
+import os
+import time
+from datetime import datetime
+from shared import get_redis
+
+# Arquivos lidos do índice por ida ao Redis durante o recálculo
+RECOMPUTE_BATCH_SIZE = int(os.environ.get('RECOMPUTE_BATCH_SIZE', 1000))
+
+def histogram_bucket(lines):
+    """
+    Faixa do histograma de um arquivo: limite inferior da potência de 10
+    que contém a quantidade de linhas ('0' para menos de 10 linhas). Deve
+    corresponder à função bucket do UPDATE_STATS_SCRIPT das lambdas de
+    escrita.
+    """
+    if lines < 10:
+        return '0'
+    return '1' + '0' * (len(str(lines)) - 1)
+
+def read_stats(redis_client):
+    """
+    Lê os contadores mantidos pelas escritas; custo constante, independente
+    da quantidade de arquivos
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hgetall('file_stats')
+    pipe.hgetall('file_stats:histogram')
+    pipe.get('file_stats:recomputed_at')
+    counters, histogram, recomputed_at = pipe.execute()
+
+    files = int(counters.get(b'files', 0))
+    lines = int(counters.get(b'lines', 0))
+    buckets = []
+    for lower, count in sorted(histogram.items(), key=lambda item: int(item[0])):
+        lower = int(lower)
+        if int(count) > 0:
+            buckets.append({
+                'min': lower,
+                'max': max(lower * 10, 10) - 1,
+                'files': int(count)
+            })
+
+    return {
+        'files': files,
+        'lines': lines,
+        'bytes': int(counters.get(b'bytes', 0)),
+        'average_lines': lines / files if files else 0,
+        'histogram': buckets,
+        'recomputed_at': recomputed_at.decode('utf-8') if recomputed_at else None
+    }
+
+def recompute_stats(redis_client):
+    """
+    Reconstrói os contadores a partir do índice (file_index) e dos
+    metadados de cada arquivo, para corrigir desvios. Escritas feitas
+    durante o recálculo podem ser sobrescritas; o job deve rodar em
+    horários de pouca escrita.
+    """
+    totals = {'files': 0, 'lines': 0, 'bytes': 0}
+    histogram = {}
+
+    def add_batch(names):
+        pipe = redis_client.pipeline(transaction=False)
+        for name in names:
+            pipe.hmget(f"file:{name.decode('utf-8')}", 'lines', 'size')
+        for lines, size in pipe.execute():
+            # Arquivos ainda não processados não entram nas estatísticas
+            if lines is None:
+                continue
+            lines = int(lines)
+            totals['files'] += 1
+            totals['lines'] += lines
+            totals['bytes'] += int(size or 0)
+            bucket = histogram_bucket(lines)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    batch = []
+    for name, _ in redis_client.zscan_iter('file_index', count=RECOMPUTE_BATCH_SIZE):
+        batch.append(name)
+        if len(batch) >= RECOMPUTE_BATCH_SIZE:
+            add_batch(batch)
+            batch = []
+    if batch:
+        add_batch(batch)
+
+    # Substituir os contadores de uma vez
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete('file_stats', 'file_stats:histogram')
+    pipe.hset('file_stats', mapping=totals)
+    if histogram:
+        pipe.hset('file_stats:histogram', mapping=histogram)
+    pipe.set('file_stats:recomputed_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    pipe.execute()
+    return totals
+
+def handler(event, context):
+    try:
+        redis_client = get_redis()
+        
+        # Job de recálculo, invocado com {"action": "recompute"} pela regra
+        # agendada do EventBridge (ver 4-deploy.py) ou manualmente
+        if (event or {}).get('action') == 'recompute':
+            started = time.monotonic()
+            totals = recompute_stats(redis_client)
+            print(f"Estatísticas recalculadas em {time.monotonic() - started:.2f}s: {totals}")
+            return totals
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Credentials': True
+            },
+            'body': json.dumps(read_stats(redis_client))
+        }
+    
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Credentials': True
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+
+# Fim da inicialização do container
+startup.report('lambda_file_stats')
@@ -0,0 +1,5 @@
+# startup primeiro: com STARTUP_PROFILE=1 mede a importação de todo o resto
+from . import startup
+from .clients import get_client, get_redis
+from .scripts import LISTING_KEYS, UPDATE_LISTING_SCRIPT, UPDATE_STATS_SCRIPT, CLEAR_DEDUPE_SCRIPT
+from .signing import sign_line_count, verify_line_count
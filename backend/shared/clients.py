@@ -0,0 +1,77 @@
+import os
+import threading
+
+# O redis é usado em todos os caminhos de todas as lambdas e é importado na
+# inicialização; o boto3 (a importação mais cara) só é carregado quando um
+# cliente AWS é pedido, então caminhos que não chamam a AWS (ex.: listagem
+# servida do cache) não pagam por ele
+import redis
+
+# Conexões HTTP mantidas vivas, pool para as chamadas simultâneas das
+# lambdas, retentativas adaptativas (com controle de taxa) e timeouts curtos
+# para falhar rápido dentro do tempo da lambda
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 64))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', 2))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', 30))
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 5))
+
+# Pool de conexões com o Redis: timeouts de socket e verificação das
+# conexões ociosas antes do reuso (o container pode ficar congelado entre
+# invocações)
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 64))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 2))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 1))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
+
+# Clientes criados uma única vez por container e reutilizados entre
+# invocações, mantendo as conexões abertas
+_clients = {}
+_redis_client = None
+_lock = threading.Lock()
+
+def get_client(service_name):
+    """
+    Cliente boto3 do serviço, criado na primeira chamada do container
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        # A criação de clientes boto3 não é segura entre threads
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                import boto3
+                from botocore.config import Config
+                client = boto3.client(service_name, config=Config(
+                    tcp_keepalive=True,
+                    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+                    connect_timeout=AWS_CONNECT_TIMEOUT,
+                    read_timeout=AWS_READ_TIMEOUT,
+                    retries={
+                        'mode': 'adaptive',
+                        'max_attempts': AWS_MAX_ATTEMPTS
+                    }
+                ))
+                _clients[service_name] = client
+    return client
+
+def get_redis():
+    """
+    Cliente Redis sobre um pool de conexões compartilhado pelo container
+    """
+    global _redis_client
+    if _redis_client is None:
+        with _lock:
+            if _redis_client is None:
+                pool = redis.ConnectionPool(
+                    host=os.environ['REDIS_HOST'],
+                    port=REDIS_PORT,
+                    max_connections=REDIS_MAX_CONNECTIONS,
+                    socket_timeout=REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                    socket_keepalive=True,
+                    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                    retry_on_timeout=True
+                )
+                _redis_client = redis.Redis(connection_pool=pool)
+    return _redis_client
@@ -0,0 +1,120 @@
+# Chaves da listagem em cache: o hash file_metadata:entries (uma entrada
+# JSON por arquivo e a versão no campo vazio), a versão atual e o registro
+# das alterações recentes (última entrada de cada arquivo alterado, a versão
+# em que foi alterado e a versão até a qual o registro foi descartado). O
+# hash não usa a chave file_metadata, que nas versões anteriores era uma
+# string (SETEX): durante a atualização as duas convivem sem erro de tipo, e
+# a antiga expira sozinha.
+LISTING_KEYS = [
+    'file_metadata:entries',
+    'file_metadata:version',
+    'file_metadata:changes',
+    'file_metadata:changelog',
+    'file_metadata:changelog_floor'
+]
+
+# Atualiza a listagem em cache em uma única ida ao Redis. Cada escrita
+# incrementa a versão da listagem e registra suas alterações, que a
+# reconstrução reaplica sobre a listagem lida (ver STORE_LISTING_SCRIPT na
+# lambda de listagem); o registro guarda as últimas 10000 versões. O cache
+# só é alterado se estiver exatamente na versão anterior, senão perdeu
+# alguma escrita e é descartado para ser reconstruído. ARGV traz pares
+# (nome, entrada JSON), com entrada vazia para arquivo removido.
+UPDATE_LISTING_SCRIPT = """
+local CHANGELOG_SIZE = 10000
+local version = redis.call('INCR', KEYS[2])
+for i = 1, #ARGV, 2 do
+    redis.call('HSET', KEYS[3], ARGV[i], ARGV[i + 1])
+    redis.call('ZADD', KEYS[4], version, ARGV[i])
+end
+local floor = version - CHANGELOG_SIZE
+if floor > 0 then
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', floor)
+    if #expired > 0 then
+        for _, name in ipairs(expired) do
+            redis.call('HDEL', KEYS[3], name)
+        end
+        redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', floor)
+        redis.call('SET', KEYS[5], floor)
+    end
+end
+
+if redis.call('HGET', KEYS[1], '') ~= tostring(version - 1) then
+    redis.call('DEL', KEYS[1])
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    if ARGV[i + 1] == '' then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    else
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+redis.call('HSET', KEYS[1], '', version)
+return 1
+"""
+
+# Mantém as estatísticas agregadas (hash file_stats com files, lines e bytes,
+# e hash file_stats:histogram com a quantidade de arquivos por faixa de
+# linhas) e os índices secundários por nome (file_index:name, ordenado
+# lexicograficamente) e por linhas (file_index:lines, pontuação = linhas), a
+# partir da diferença entre os valores antigos e novos de cada arquivo. O
+# script grava 'lines' e 'size' em file:<nome> no mesmo passo, para que
+# escritas concorrentes no mesmo arquivo não sejam contadas duas vezes.
+# KEYS[5..] são as chaves file:<nome>; ARGV traz trios (nome, linhas,
+# tamanho), com linhas vazias para arquivo removido e tamanho vazio para
+# manter o anterior.
+UPDATE_STATS_SCRIPT = """
+local function bucket(lines)
+    if lines < 10 then
+        return '0'
+    end
+    return '1' .. string.rep('0', string.len(string.format('%d', lines)) - 1)
+end
+for i = 5, #KEYS do
+    local old = redis.call('HMGET', KEYS[i], 'lines', 'size')
+    local old_lines = tonumber(old[1])
+    local old_size = tonumber(old[2]) or 0
+    local name = ARGV[(i - 5) * 3 + 1]
+    local lines = ARGV[(i - 5) * 3 + 2]
+    local size = ARGV[(i - 5) * 3 + 3]
+    if old_lines then
+        redis.call('HINCRBY', KEYS[1], 'files', -1)
+        redis.call('HINCRBY', KEYS[1], 'lines', -old_lines)
+        redis.call('HINCRBY', KEYS[1], 'bytes', -old_size)
+        redis.call('HINCRBY', KEYS[2], bucket(old_lines), -1)
+    end
+    if lines ~= '' then
+        local new_lines = tonumber(lines)
+        local new_size = tonumber(size) or old_size
+        redis.call('HINCRBY', KEYS[1], 'files', 1)
+        redis.call('HINCRBY', KEYS[1], 'lines', new_lines)
+        redis.call('HINCRBY', KEYS[1], 'bytes', new_size)
+        redis.call('HINCRBY', KEYS[2], bucket(new_lines), 1)
+        redis.call('HSET', KEYS[i], 'lines', new_lines)
+        if size ~= '' then
+            redis.call('HSET', KEYS[i], 'size', new_size)
+        end
+        redis.call('ZADD', KEYS[3], 0, name)
+        redis.call('ZADD', KEYS[4], new_lines, name)
+    else
+        redis.call('ZREM', KEYS[3], name)
+        redis.call('ZREM', KEYS[4], name)
+    end
+end
+return 1
+"""
+
+# Remove as marcações de deduplicação (processed:* e etag:*) gravadas pela
+# lambda de processamento para os arquivos. KEYS são os ponteiros
+# dedupe:<nome>, conjuntos com as marcações de cada arquivo.
+CLEAR_DEDUPE_SCRIPT = """
+for i = 1, #KEYS do
+    local marks = redis.call('SMEMBERS', KEYS[i])
+    if #marks > 0 then
+        redis.call('DEL', unpack(marks))
+    end
+    redis.call('DEL', KEYS[i])
+end
+return 1
+"""
@@ -0,0 +1,31 @@
+import os
+import hmac
+import hashlib
+
+# Chave (gerada no provisionamento) com que a lambda de geração assina a
+# contagem de linhas gravada nos metadados do objeto. Qualquer um com
+# permissão de escrita no bucket pode gravar x-amz-meta-line-count; só a
+# assinatura prova que a contagem veio da geração. A assinatura cobre
+# também o tamanho e o ETag do objeto (calculados pelo S3 e devolvidos pelo
+# HEAD) e o SHA-256 do conteúdo, de modo que regravar o objeto com outro
+# conteúdo e os metadados antigos invalida a contagem. Sem a chave, nada é
+# assinado e a contagem dos metadados nunca é usada sem ler o objeto.
+METADATA_SIGNING_KEY = os.environ.get('METADATA_SIGNING_KEY', '')
+
+def sign_line_count(file_name, line_count, size, etag, content_sha256):
+    """
+    Assinatura HMAC-SHA256 do nome do objeto, da contagem de linhas, do
+    tamanho, do ETag e do SHA-256 do conteúdo, ou None sem chave configurada
+    """
+    if not METADATA_SIGNING_KEY:
+        return None
+    message = f"{file_name}\n{line_count}\n{size}\n{etag}\n{content_sha256}".encode('utf-8')
+    return hmac.new(METADATA_SIGNING_KEY.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+def verify_line_count(file_name, line_count, size, etag, content_sha256, signature):
+    """
+    Se a assinatura corresponde ao nome, à contagem e ao conteúdo descrito
+    pelo HEAD do objeto
+    """
+    expected = sign_line_count(file_name, line_count, size, etag, content_sha256)
+    return expected is not None and bool(signature) and hmac.compare_digest(expected, signature)
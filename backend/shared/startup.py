@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+
+# Com STARTUP_PROFILE=1 o tempo de importação de cada módulo carregado
+# durante a inicialização do container é medido (como python -X importtime)
+# e impresso no log ao fim da inicialização do handler
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE', '').lower() in ('1', 'true', 'yes')
+STARTUP_PROFILE_TOP = int(os.environ.get('STARTUP_PROFILE_TOP', 25))
+
+class _TimedLoader:
+    """
+    Envolve o loader de um módulo para medir create_module + exec_module
+    """
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        self._profiler.enter(spec.name)
+        try:
+            create_module = getattr(self._loader, 'create_module', None)
+            return create_module(spec) if create_module else None
+        except BaseException:
+            self._profiler.leave(spec.name)
+            raise
+
+    def exec_module(self, module):
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.leave(module.__name__)
+            # Devolver o loader original ao módulo importado
+            module.__loader__ = self._loader
+            if getattr(module, '__spec__', None) is not None:
+                module.__spec__.loader = self._loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+class ImportProfiler:
+    """
+    Finder instalado no início de sys.meta_path que registra, para cada
+    módulo importado, o tempo próprio e o acumulado (incluindo os módulos
+    que ele importa), em microssegundos
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = []
+        self._stack = []
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def leave(self, name):
+        if not self._stack or self._stack[-1][0] != name:
+            return
+        _, started, children = self._stack.pop()
+        cumulative = time.perf_counter() - started
+        if self._stack:
+            self._stack[-1][2] += cumulative
+        self.timings.append({
+            'module': name,
+            'self_us': int((cumulative - children) * 1e6),
+            'cumulative_us': int(cumulative * 1e6),
+            'depth': len(self._stack)
+        })
+
+    def report(self, function_name, top=STARTUP_PROFILE_TOP):
+        """
+        Imprime a duração da inicialização e os módulos mais lentos
+        """
+        init_ms = (time.perf_counter() - self.started) * 1000
+        print(f"[startup] {function_name}: init {init_ms:.1f} ms, {len(self.timings)} módulo(s) importado(s)")
+        print(f"[startup] {'self (us)':>10} | {'cumulative':>10} | module")
+        for timing in sorted(self.timings, key=lambda item: item['cumulative_us'], reverse=True)[:top]:
+            print(f"[startup] {timing['self_us']:>10} | {timing['cumulative_us']:>10} | {'  ' * timing['depth']}{timing['module']}")
+        return init_ms
+
+profiler = ImportProfiler() if STARTUP_PROFILE else None
+if profiler:
+    profiler.install()
+
+def report(function_name):
+    """
+    Chamado ao fim do módulo do handler: encerra a medição e imprime o
+    relatório (sem efeito se STARTUP_PROFILE não estiver ativo)
+    """
+    global profiler
+    if profiler:
+        profiler.uninstall()
+        profiler.report(function_name)
+        profiler = None
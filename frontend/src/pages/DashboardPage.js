@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import fileService from '../services/fileService';
 
 function DashboardPage({ onLogout }) {
   const [files, setFiles] = useState([]);
@@ -12,16 +13,10 @@ function DashboardPage({ onLogout }) {
 
   const fetchFiles = async () => {
     try {
-      const token = localStorage.getItem('token');
-      const response = await axios.get(
-        `${process.env.REACT_APP_API_GATEWAY_URL}/files`,
-        {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        }
-      );
-      setFiles(response.data);
+      // Revalida a listagem com If-None-Match; sem mudanças o servidor
+      // responde 304 e a cópia local é reaproveitada
+      const data = await fileService.listFiles();
+      setFiles(data);
       setLoading(false);
     } catch (err) {
       setError('Erro ao carregar arquivos');
@@ -124,7 +119,7 @@ function DashboardPage({ onLogout }) {
                 {files.map((file) => (
                   <tr key={file.name}>
                     <td>{file.name}</td>
-                    <td>{file.lines}</td>
+                    <td>{file.lines !== null ? file.lines : 'Processando...'}</td>
                     <td>
                       <button
                         className="btn btn-danger btn-sm"
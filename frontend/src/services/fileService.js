@@ -3,17 +3,64 @@ import axios from 'axios';
 const API_URL = process.env.REACT_APP_API_GATEWAY_URL;
 
 class FileService {
-  async listFiles() {
+  constructor() {
+    // Última resposta de cada consulta da listagem, revalidada pelo ETag
+    this.listCache = {};
+  }
+
+  // Com cursor/limit, retorna { files, next_cursor } paginado pelo índice
+  async listFiles({ cursor, limit } = {}) {
     const token = localStorage.getItem('token');
+    const params = {};
+    if (cursor) params.cursor = cursor;
+    if (limit) params.limit = limit;
+
+    const cacheKey = JSON.stringify(params);
+    const cached = this.listCache[cacheKey];
+    const headers = { 'Authorization': `Bearer ${token}` };
+    if (cached) headers['If-None-Match'] = cached.etag;
+
     const response = await axios.get(`${API_URL}/files`, {
+      headers,
+      params,
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304
+    });
+
+    // 304: a listagem não mudou desde a última consulta
+    if (response.status === 304 && cached) {
+      return cached.data;
+    }
+
+    const etag = response.headers.etag;
+    if (etag) {
+      this.listCache[cacheKey] = { etag, data: response.data };
+    }
+    return response.data;
+  }
+
+  // Totais e histograma de linhas, mantidos incrementalmente no servidor
+  async getStats() {
+    const token = localStorage.getItem('token');
+    const response = await axios.get(`${API_URL}/files/stats`, {
+      headers: { 'Authorization': `Bearer ${token}` }
+    });
+    return response.data;
+  }
+
+  async generateFile(count) {
+    const token = localStorage.getItem('token');
+    const body = count ? { count } : {};
+    const response = await axios.post(`${API_URL}/files/generate`, body, {
       headers: { 'Authorization': `Bearer ${token}` }
     });
     return response.data;
   }
 
-  async generateFile() {
+  // Exclusão em massa por lista de nomes ou por prefixo
+  async deleteFiles({ names, prefix }) {
     const token = localStorage.getItem('token');
-    const response = await axios.post(`${API_URL}/files/generate`, {}, {
+    const body = names ? { names } : { prefix };
+    const response = await axios.post(`${API_URL}/files/delete`, body, {
       headers: { 'Authorization': `Bearer ${token}` }
     });
     return response.data;
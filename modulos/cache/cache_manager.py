@@ -6,6 +6,7 @@ class ElastiCacheManager:
     def __init__(self, project_name):
         self.project_name = project_name
         self.elasticache_client = boto3.client('elasticache')
+        self.ec2_client = boto3.client('ec2')
         self.logger = logging.getLogger(__name__)
 
     def create_redis_cluster(self, vpc_id, subnet_ids):
@@ -81,7 +82,7 @@ class ElastiCacheManager:
         """
         Cria grupo de segurança para o Redis
         """
-        ec2_client = boto3.client('ec2')
+        ec2_client = self.ec2_client
         
         try:
             response = ec2_client.create_security_group(
@@ -2,6 +2,9 @@ import boto3
 import logging
 import time
 
+# Caminhos por invalidação antes de recorrer a '/*'
+INVALIDATION_PATH_LIMIT = 100
+
 class CloudFrontManager:
     def __init__(self, project_name):
         self.project_name = project_name
@@ -97,6 +100,38 @@ class CloudFrontManager:
             self.logger.error(f"Erro ao criar distribuição CloudFront: {str(e)}")
             raise
 
+    def invalidate_paths(self, distribution_id, paths):
+        """
+        Invalida no cache da distribuição apenas os caminhos informados.
+        Acima de INVALIDATION_PATH_LIMIT caminhos, invalida tudo ('/*'),
+        que conta como um único caminho na cobrança.
+        """
+        try:
+            paths = sorted({path if path.startswith('/') else f"/{path}" for path in paths})
+            if not paths:
+                return None
+            if len(paths) > INVALIDATION_PATH_LIMIT:
+                paths = ['/*']
+            
+            response = self.cloudfront_client.create_invalidation(
+                DistributionId=distribution_id,
+                InvalidationBatch={
+                    'Paths': {
+                        'Quantity': len(paths),
+                        'Items': paths
+                    },
+                    'CallerReference': f"{self.project_name}-{time.time()}"
+                }
+            )
+            
+            invalidation_id = response['Invalidation']['Id']
+            self.logger.info(f"Invalidação {invalidation_id} criada para {len(paths)} caminho(s)")
+            return invalidation_id
+
+        except Exception as e:
+            self.logger.error(f"Erro ao invalidar cache do CloudFront: {str(e)}")
+            raise
+
     def delete_distribution(self, distribution_id):
         """
         Remove uma distribuição CloudFront
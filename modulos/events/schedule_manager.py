@@ -0,0 +1,78 @@
+import boto3
+import logging
+import json
+
+class ScheduleManager:
+    def __init__(self, project_name):
+        self.project_name = project_name
+        self.events_client = boto3.client('events')
+        self.lambda_client = boto3.client('lambda')
+        self.logger = logging.getLogger(__name__)
+
+    def create_schedule(self, rule_name, schedule_expression, function_name, payload):
+        """
+        Cria (ou atualiza) uma regra agendada do EventBridge que invoca uma
+        função Lambda com o payload informado
+        """
+        try:
+            rule_arn = self.events_client.put_rule(
+                Name=f"{self.project_name}-{rule_name}",
+                ScheduleExpression=schedule_expression,
+                State='ENABLED'
+            )['RuleArn']
+
+            function_arn = self.lambda_client.get_function_configuration(
+                FunctionName=f"{self.project_name}-{function_name}"
+            )['FunctionArn']
+
+            # Permitir que a regra invoque a função
+            try:
+                self.lambda_client.add_permission(
+                    FunctionName=function_arn,
+                    StatementId=f"{self.project_name}-{rule_name}",
+                    Action='lambda:InvokeFunction',
+                    Principal='events.amazonaws.com',
+                    SourceArn=rule_arn
+                )
+            except self.lambda_client.exceptions.ResourceConflictException:
+                # Permissão já concedida em um deploy anterior
+                pass
+
+            self.events_client.put_targets(
+                Rule=f"{self.project_name}-{rule_name}",
+                Targets=[
+                    {
+                        'Id': function_name,
+                        'Arn': function_arn,
+                        'Input': json.dumps(payload)
+                    }
+                ]
+            )
+
+            self.logger.info(f"Regra {rule_name} agendada ({schedule_expression}) para {function_name}")
+            return rule_arn
+
+        except Exception as e:
+            self.logger.error(f"Erro ao criar regra agendada: {str(e)}")
+            raise
+
+    def delete_schedule(self, rule_name):
+        """
+        Remove uma regra agendada e seus alvos
+        """
+        try:
+            name = f"{self.project_name}-{rule_name}"
+            targets = self.events_client.list_targets_by_rule(Rule=name)['Targets']
+            if targets:
+                self.events_client.remove_targets(
+                    Rule=name,
+                    Ids=[target['Id'] for target in targets]
+                )
+            self.events_client.delete_rule(Name=name)
+            self.logger.info(f"Regra {rule_name} removida com sucesso")
+
+        except self.events_client.exceptions.ResourceNotFoundException:
+            self.logger.info(f"Regra {rule_name} não existe")
+        except Exception as e:
+            self.logger.error(f"Erro ao remover regra agendada: {str(e)}")
+            raise
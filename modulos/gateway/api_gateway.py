@@ -6,6 +6,8 @@ class APIGatewayManager:
     def __init__(self, project_name):
         self.project_name = project_name
         self.api_client = boto3.client('apigateway')
+        self.sts_client = boto3.client('sts')
+        self.account_id = None
         self.logger = logging.getLogger(__name__)
 
     def create_api(self, cognito_user_pool_arn):
@@ -104,6 +106,54 @@ class APIGatewayManager:
             uri=f"arn:aws:apigateway:{self.api_client.meta.region_name}:lambda:path/2015-03-31/functions/arn:aws:lambda:{self.api_client.meta.region_name}:{self._get_account_id()}:function:{self.project_name}-file-generate/invocations"
         )
         
+        # GET /files/stats - Estatísticas agregadas dos arquivos
+        stats_resource = self.api_client.create_resource(
+            restApiId=api_id,
+            parentId=files_resource['id'],
+            pathPart='stats'
+        )
+        
+        self.api_client.put_method(
+            restApiId=api_id,
+            resourceId=stats_resource['id'],
+            httpMethod='GET',
+            authorizationType='COGNITO_USER_POOLS',
+            authorizerId=authorizer_id
+        )
+        
+        self.api_client.put_integration(
+            restApiId=api_id,
+            resourceId=stats_resource['id'],
+            httpMethod='GET',
+            type='AWS_PROXY',
+            integrationHttpMethod='POST',
+            uri=f"arn:aws:apigateway:{self.api_client.meta.region_name}:lambda:path/2015-03-31/functions/arn:aws:lambda:{self.api_client.meta.region_name}:{self._get_account_id()}:function:{self.project_name}-file-stats/invocations"
+        )
+        
+        # POST /files/delete - Excluir vários arquivos (lista de nomes ou prefixo)
+        bulk_delete_resource = self.api_client.create_resource(
+            restApiId=api_id,
+            parentId=files_resource['id'],
+            pathPart='delete'
+        )
+        
+        self.api_client.put_method(
+            restApiId=api_id,
+            resourceId=bulk_delete_resource['id'],
+            httpMethod='POST',
+            authorizationType='COGNITO_USER_POOLS',
+            authorizerId=authorizer_id
+        )
+        
+        self.api_client.put_integration(
+            restApiId=api_id,
+            resourceId=bulk_delete_resource['id'],
+            httpMethod='POST',
+            type='AWS_PROXY',
+            integrationHttpMethod='POST',
+            uri=f"arn:aws:apigateway:{self.api_client.meta.region_name}:lambda:path/2015-03-31/functions/arn:aws:lambda:{self.api_client.meta.region_name}:{self._get_account_id()}:function:{self.project_name}-file-delete/invocations"
+        )
+        
         # DELETE /files/{filename} - Excluir arquivo
         file_resource = self.api_client.create_resource(
             restApiId=api_id,
@@ -133,9 +183,11 @@ class APIGatewayManager:
 
     def _get_account_id(self):
         """
-        Obtém ID da conta AWS atual
+        Obtém ID da conta AWS atual (consultado uma vez por instância)
         """
-        return boto3.client('sts').get_caller_identity()['Account']
+        if self.account_id is None:
+            self.account_id = self.sts_client.get_caller_identity()['Account']
+        return self.account_id
 
     def delete_api(self, api_id):
         """
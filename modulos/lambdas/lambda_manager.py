@@ -113,6 +113,117 @@ class LambdaManager:
             self.logger.error(f"Erro ao atualizar função Lambda: {str(e)}")
             raise
 
+    def create_event_source_mapping(self, function_name, queue_arn, batch_size=10, batching_window=0):
+        """
+        Conecta uma fila SQS a uma função Lambda com retorno de falhas
+        parciais do lote (batchItemFailures)
+        """
+        try:
+            params = {
+                'FunctionName': f"{self.project_name}-{function_name}",
+                'BatchSize': batch_size,
+                'MaximumBatchingWindowInSeconds': batching_window,
+                'FunctionResponseTypes': ['ReportBatchItemFailures']
+            }
+            
+            try:
+                response = self.lambda_client.create_event_source_mapping(
+                    EventSourceArn=queue_arn,
+                    Enabled=True,
+                    **params
+                )
+                return response['UUID']
+            except self.lambda_client.exceptions.ResourceConflictException:
+                # Mapeamento já existe: atualizar tamanho do lote e janela
+                mappings = self.lambda_client.list_event_source_mappings(
+                    EventSourceArn=queue_arn,
+                    FunctionName=params['FunctionName']
+                )
+                mapping_uuid = mappings['EventSourceMappings'][0]['UUID']
+                self.lambda_client.update_event_source_mapping(
+                    UUID=mapping_uuid,
+                    **params
+                )
+                self.logger.info(f"Mapeamento {mapping_uuid} atualizado")
+                return mapping_uuid
+
+        except Exception as e:
+            self.logger.error(f"Erro ao criar mapeamento de origem de eventos: {str(e)}")
+            raise
+
+    def get_latest_layer_version(self, layer_name):
+        """
+        Retorna o ARN e o CodeSha256 da versão mais recente de uma layer,
+        ou None se a layer ainda não foi publicada
+        """
+        try:
+            versions = self.lambda_client.list_layer_versions(
+                LayerName=f"{self.project_name}-{layer_name}",
+                MaxItems=1
+            )['LayerVersions']
+            if not versions:
+                return None
+            
+            response = self.lambda_client.get_layer_version(
+                LayerName=f"{self.project_name}-{layer_name}",
+                VersionNumber=versions[0]['Version']
+            )
+            return {
+                'arn': response['LayerVersionArn'],
+                'code_sha256': response['Content']['CodeSha256']
+            }
+
+        except self.lambda_client.exceptions.ResourceNotFoundException:
+            return None
+        except Exception as e:
+            self.logger.error(f"Erro ao consultar layer: {str(e)}")
+            raise
+
+    def publish_layer(self, layer_name, zip_path, runtime='python3.9', s3_location=None):
+        """
+        Publica uma nova versão de uma layer e retorna o ARN da versão.
+        Pacotes grandes são enviados antes para o S3 e referenciados por
+        s3_location (bucket, key).
+        """
+        try:
+            if s3_location:
+                content = {'S3Bucket': s3_location[0], 'S3Key': s3_location[1]}
+            else:
+                with open(zip_path, 'rb') as zip_content:
+                    content = {'ZipFile': zip_content.read()}
+            
+            response = self.lambda_client.publish_layer_version(
+                LayerName=f"{self.project_name}-{layer_name}",
+                Content=content,
+                CompatibleRuntimes=[runtime]
+            )
+            
+            self.logger.info(f"Layer {layer_name} publicada: versão {response['Version']}")
+            return response['LayerVersionArn']
+
+        except Exception as e:
+            self.logger.error(f"Erro ao publicar layer: {str(e)}")
+            raise
+
+    def delete_layer(self, layer_name):
+        """
+        Remove todas as versões de uma layer
+        """
+        try:
+            paginator = self.lambda_client.get_paginator('list_layer_versions')
+            for page in paginator.paginate(LayerName=f"{self.project_name}-{layer_name}"):
+                for version in page['LayerVersions']:
+                    self.lambda_client.delete_layer_version(
+                        LayerName=f"{self.project_name}-{layer_name}",
+                        VersionNumber=version['Version']
+                    )
+            
+            self.logger.info(f"Layer {layer_name} removida com sucesso")
+
+        except Exception as e:
+            self.logger.error(f"Erro ao remover layer: {str(e)}")
+            raise
+
     def delete_function(self, function_name):
         """
         Remove uma função Lambda
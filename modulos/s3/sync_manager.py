@@ -0,0 +1,147 @@
+import re
+import gzip
+import boto3
+import hashlib
+import logging
+import zipfile
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+
+# Uploads simultâneos
+SYNC_WORKERS = 16
+
+# Remoção em lote (limite do delete_objects)
+DELETE_BATCH_SIZE = 1000
+
+# Arquivos de texto a partir deste tamanho são enviados comprimidos
+COMPRESSION_THRESHOLD = 1024
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/javascript',
+    'application/json',
+    'application/manifest+json',
+    'application/xml',
+    'image/svg+xml'
+)
+
+# Nomes com hash do conteúdo gerados pelo build (ex.: main.3f2a9c1b.js)
+# podem ser guardados em cache indefinidamente; os demais (index.html,
+# manifest.json...) são revalidados a cada acesso
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.(chunk\.)?[a-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+class SyncManager:
+    def __init__(self, project_name):
+        self.project_name = project_name
+        self.s3_client = boto3.client('s3')
+        self.logger = logging.getLogger(__name__)
+
+    def prepare_object(self, key, data):
+        """
+        Corpo e cabeçalhos de um arquivo como será gravado no bucket
+        """
+        content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        params = {
+            'ContentType': content_type,
+            'CacheControl': IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(key) else REVALIDATE_CACHE_CONTROL
+        }
+
+        if len(data) >= COMPRESSION_THRESHOLD and content_type.startswith(COMPRESSIBLE_TYPES):
+            # mtime fixo: o mesmo conteúdo gera sempre os mesmos bytes (e o
+            # mesmo ETag)
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                data = compressed
+                params['ContentEncoding'] = 'gzip'
+
+        return data, params
+
+    def list_remote(self, bucket):
+        """
+        ETag (MD5 do conteúdo, para objetos enviados com put_object) de cada
+        objeto do bucket
+        """
+        try:
+            remote = {}
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket):
+                for obj in page.get('Contents', []):
+                    remote[obj['Key']] = obj['ETag'].strip('"')
+            return remote
+
+        except Exception as e:
+            self.logger.error(f"Erro ao listar objetos do bucket: {str(e)}")
+            raise
+
+    def delete_keys(self, bucket, keys):
+        """
+        Remove objetos em lotes de DELETE_BATCH_SIZE
+        """
+        try:
+            for i in range(0, len(keys), DELETE_BATCH_SIZE):
+                response = self.s3_client.delete_objects(
+                    Bucket=bucket,
+                    Delete={
+                        'Objects': [{'Key': key} for key in keys[i:i + DELETE_BATCH_SIZE]],
+                        'Quiet': True
+                    }
+                )
+                errors = response.get('Errors', [])
+                if errors:
+                    raise Exception(f"{len(errors)} objeto(s) não removido(s): {errors[0].get('Message')}")
+
+        except Exception as e:
+            self.logger.error(f"Erro ao remover objetos: {str(e)}")
+            raise
+
+    def sync_zip(self, zip_path, bucket, delete=True):
+        """
+        Sincroniza o conteúdo de um zip com o bucket: envia apenas os
+        arquivos cujo conteúdo difere do objeto remoto e remove os objetos
+        que não existem mais no zip. Retorna as chaves enviadas, removidas
+        e as que já existiam e foram alteradas ou removidas (as únicas que
+        podem estar em cache no CloudFront).
+        """
+        try:
+            remote = self.list_remote(bucket)
+
+            uploads = []
+            local_keys = set()
+            with zipfile.ZipFile(zip_path) as zf:
+                for info in zf.infolist():
+                    if info.is_dir():
+                        continue
+                    key = info.filename[2:] if info.filename.startswith('./') else info.filename
+                    local_keys.add(key)
+                    data, params = self.prepare_object(key, zf.read(info))
+                    if remote.get(key) != hashlib.md5(data).hexdigest():
+                        uploads.append((key, data, params))
+
+            def upload(item):
+                key, data, params = item
+                self.s3_client.put_object(Bucket=bucket, Key=key, Body=data, **params)
+                return key
+
+            with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as executor:
+                uploaded = list(executor.map(upload, uploads))
+
+            deleted = sorted(set(remote) - local_keys) if delete else []
+            if deleted:
+                self.delete_keys(bucket, deleted)
+
+            result = {
+                'uploaded': sorted(uploaded),
+                'deleted': deleted,
+                'unchanged': len(local_keys) - len(uploaded),
+                'replaced': sorted(key for key in uploaded + deleted if key in remote)
+            }
+            self.logger.info(
+                f"Bucket {bucket} sincronizado: {len(uploaded)} enviado(s), "
+                f"{len(deleted)} removido(s), {result['unchanged']} inalterado(s)"
+            )
+            return result
+
+        except Exception as e:
+            self.logger.error(f"Erro ao sincronizar bucket: {str(e)}")
+            raise
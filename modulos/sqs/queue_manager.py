@@ -6,15 +6,16 @@ class SQSManager:
     def __init__(self, project_name):
         self.project_name = project_name
         self.sqs_client = boto3.client('sqs')
+        self.sns_client = boto3.client('sns')
         self.logger = logging.getLogger(__name__)
 
-    def create_queue(self, sns_topic_arn=None):
+    def create_queue(self, sns_topic_arn=None, name='notifications'):
         """
         Cria uma fila SQS e opcionalmente a inscreve em um tópico SNS
         """
         try:
             # Criar fila
-            queue_name = f"{self.project_name}-notifications-queue"
+            queue_name = f"{self.project_name}-{name}-queue"
             
             response = self.sqs_client.create_queue(
                 QueueName=queue_name,
@@ -65,8 +66,7 @@ class SQSManager:
                 )
                 
                 # Inscrever a fila no tópico SNS
-                sns_client = boto3.client('sns')
-                sns_client.subscribe(
+                self.sns_client.subscribe(
                     TopicArn=sns_topic_arn,
                     Protocol='sqs',
                     Endpoint=queue_arn
@@ -81,6 +81,27 @@ class SQSManager:
             self.logger.error(f"Erro ao criar fila SQS: {str(e)}")
             raise
 
+    def configure_lambda_consumer(self, queue_url, function_timeout, batching_window=0):
+        """
+        Ajusta a fila para ser consumida por uma função Lambda: o visibility
+        timeout deve cobrir várias tentativas da função mais a janela de lote
+        """
+        try:
+            visibility_timeout = function_timeout * 6 + batching_window
+            
+            self.sqs_client.set_queue_attributes(
+                QueueUrl=queue_url,
+                Attributes={
+                    'VisibilityTimeout': str(visibility_timeout)
+                }
+            )
+            self.logger.info(f"Fila SQS {queue_url} configurada com visibility timeout de {visibility_timeout}s")
+            return visibility_timeout
+
+        except Exception as e:
+            self.logger.error(f"Erro ao configurar fila para consumo pela Lambda: {str(e)}")
+            raise
+
     def delete_queue(self, queue_url):
         """
         Remove uma fila SQS
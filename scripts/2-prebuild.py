@@ -1,8 +1,12 @@
 import os
 import sys
 import json
+import time
+import secrets
 import logging
+import threading
 from importlib import import_module
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # Adicionar diretório raiz ao path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -12,11 +16,29 @@ sys.path.append(project_root)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Etapas executadas simultaneamente
+PROVISION_WORKERS = int(os.environ.get('PROVISION_WORKERS', 8))
+
+class ProvisioningStep:
+    """
+    Etapa do provisionamento: lê do estado as chaves em inputs e devolve
+    um dicionário com as chaves em outputs. Depende das etapas que
+    produzem os seus inputs.
+    """
+    def __init__(self, name, run, inputs=(), outputs=()):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
 class InfrastructureBuilder:
     def __init__(self, project_name):
         self.project_name = project_name
         self.state = {}
         self.load_state()
+        self.lock = threading.Lock()
+        self.managers = {}
+        self.timings = {}
 
     def load_state(self):
         """Carrega estado existente se houver"""
@@ -27,71 +49,241 @@ class InfrastructureBuilder:
             self.state = {}
 
     def save_state(self):
-        """Salva estado atual"""
-        with open('infra.state', 'w') as f:
+        """Salva estado atual (escrita atômica: uma interrupção não corrompe o arquivo)"""
+        with open('infra.state.tmp', 'w') as f:
             json.dump(self.state, f, indent=2)
+        os.replace('infra.state.tmp', 'infra.state')
 
-    def build_infrastructure(self):
-        try:
-            # 1. Criar VPC e sub-redes (necessário para ElastiCache)
-            vpc_manager = import_module('modulos.vpc.vpc_manager').VPCManager(self.project_name)
-            vpc_info = vpc_manager.create_vpc()
-            self.state['vpc'] = vpc_info
-
-            # 2. Criar buckets S3
-            s3_manager = import_module('modulos.s3.s3_manager').S3Manager(self.project_name)
-            self.state['frontend_bucket'] = s3_manager.create_bucket('frontend')
-            self.state['data_bucket'] = s3_manager.create_bucket('data')
-
-            # 3. Criar cluster ElastiCache
-            cache_manager = import_module('modulos.cache.cache_manager').ElastiCacheManager(self.project_name)
-            cache_info = cache_manager.create_redis_cluster(
-                vpc_info['vpc_id'], 
-                [vpc_info['private_subnet_id']]
-            )
-            self.state['elasticache'] = cache_info
-
-            # 4. Criar tópico SNS e assinaturas
-            sns_manager = import_module('modulos.sns.notification_manager').SNSManager(self.project_name)
-            topic_arn = sns_manager.create_topic()
-            self.state['sns_topic_arn'] = topic_arn
-
-            # 5. Criar fila SQS e vincular ao SNS
-            sqs_manager = import_module('modulos.sqs.queue_manager').SQSManager(self.project_name)
-            queue_info = sqs_manager.create_queue(topic_arn)
-            self.state['sqs'] = queue_info
-
-            # 6. Criar User Pool Cognito
-            cognito_manager = import_module('modulos.cognito.auth_manager').CognitoManager(self.project_name)
-            cognito_info = cognito_manager.create_user_pool(
-                admin_email='admin@meusite.com',
-                admin_password='teste123'
-            )
-            self.state['cognito'] = cognito_info
+    def manager(self, module_name, class_name):
+        """
+        Instância única de cada manager. A criação de clientes boto3 na
+        sessão padrão não é segura entre threads: os managers criam todos os
+        seus clientes no construtor, chamado aqui sob o lock, e as etapas só
+        usam clientes já criados (que podem ser usados simultaneamente).
+        """
+        with self.lock:
+            key = (module_name, class_name)
+            if key not in self.managers:
+                self.managers[key] = getattr(import_module(module_name), class_name)(self.project_name)
+            return self.managers[key]
+
+    def create_vpc(self, state):
+        # VPC e sub-redes (necessário para ElastiCache)
+        vpc_manager = self.manager('modulos.vpc.vpc_manager', 'VPCManager')
+        return {'vpc': vpc_manager.create_vpc()}
+
+    def create_frontend_bucket(self, state):
+        s3_manager = self.manager('modulos.s3.s3_manager', 'S3Manager')
+        return {'frontend_bucket': s3_manager.create_bucket('frontend')}
+
+    def create_data_bucket(self, state):
+        s3_manager = self.manager('modulos.s3.s3_manager', 'S3Manager')
+        return {'data_bucket': s3_manager.create_bucket('data')}
 
-            # 7. Criar funções Lambda
-            lambda_manager = import_module('modulos.lambdas.lambda_manager').LambdaManager(self.project_name)
-            lambda_role = lambda_manager.create_lambda_role()
-            self.state['lambda_role_arn'] = lambda_role
+    def create_elasticache(self, state):
+        cache_manager = self.manager('modulos.cache.cache_manager', 'ElastiCacheManager')
+        cache_info = cache_manager.create_redis_cluster(
+            state['vpc']['vpc_id'],
+            [state['vpc']['private_subnet_id']]
+        )
+        return {'elasticache': cache_info}
 
-            # 8. Criar API Gateway
-            gateway_manager = import_module('modulos.gateway.api_gateway').APIGatewayManager(self.project_name)
-            api_id = gateway_manager.create_api(cognito_info['user_pool_arn'])
-            self.state['api_gateway'] = {
+    def create_sns(self, state):
+        # Tópico SNS e assinaturas
+        sns_manager = self.manager('modulos.sns.notification_manager', 'SNSManager')
+        return {'sns_topic_arn': sns_manager.create_topic()}
+
+    def create_sqs(self, state):
+        # Fila SQS vinculada ao SNS
+        sqs_manager = self.manager('modulos.sqs.queue_manager', 'SQSManager')
+        return {'sqs': sqs_manager.create_queue(state['sns_topic_arn'])}
+
+    def create_fanout_queue(self, state):
+        # Fila das tarefas de intervalo do fan-out, consumida uma mensagem
+        # por invocação (ver FANOUT_PART_SIZE em lambda_file_process)
+        sqs_manager = self.manager('modulos.sqs.queue_manager', 'SQSManager')
+        return {'fanout_sqs': sqs_manager.create_queue(name='fanout')}
+
+    def create_cognito(self, state):
+        cognito_manager = self.manager('modulos.cognito.cognito_manager', 'CognitoManager')
+        cognito_info = cognito_manager.create_user_pool(
+            admin_email='admin@meusite.com',
+            admin_password='teste123'
+        )
+        return {'cognito': cognito_info}
+
+    def create_lambda_role(self, state):
+        # Role das funções Lambda (as funções são criadas no deploy)
+        lambda_manager = self.manager('modulos.lambdas.lambda_manager', 'LambdaManager')
+        return {'lambda_role_arn': lambda_manager.create_lambda_role()}
+
+    def create_signing_key(self, state):
+        # Chave com que a geração assina a contagem de linhas nos metadados
+        # dos objetos (ver backend/shared/signing.py)
+        return {'metadata_signing_key': secrets.token_hex(32)}
+
+    def create_api_gateway(self, state):
+        gateway_manager = self.manager('modulos.gateway.api_gateway', 'APIGatewayManager')
+        api_id = gateway_manager.create_api(state['cognito']['user_pool_arn'])
+        return {
+            'api_gateway': {
                 'id': api_id,
                 'url': gateway_manager.get_api_url(api_id)
             }
+        }
+
+    def create_cloudfront(self, state):
+        cloudfront_manager = self.manager('modulos.cloudfront.distribution_manager', 'CloudFrontManager')
+        distribution_id = cloudfront_manager.create_distribution(
+            f"{state['frontend_bucket']}.s3.amazonaws.com",
+            f"{state['api_gateway']['id']}.execute-api.{os.environ['AWS_REGION']}.amazonaws.com"
+        )
+        return {'cloudfront_distribution_id': distribution_id}
 
-            # 9. Criar distribuição CloudFront
-            cloudfront_manager = import_module('modulos.cloudfront.distribution_manager').CloudFrontManager(self.project_name)
-            distribution_id = cloudfront_manager.create_distribution(
-                f"{self.state['frontend_bucket']}.s3.amazonaws.com",
-                f"{api_id}.execute-api.{os.environ['AWS_REGION']}.amazonaws.com"
+    def steps(self):
+        """Grafo do provisionamento"""
+        return [
+            ProvisioningStep('vpc', self.create_vpc, outputs=['vpc']),
+            ProvisioningStep('frontend_bucket', self.create_frontend_bucket, outputs=['frontend_bucket']),
+            ProvisioningStep('data_bucket', self.create_data_bucket, outputs=['data_bucket']),
+            ProvisioningStep('elasticache', self.create_elasticache, inputs=['vpc'], outputs=['elasticache']),
+            ProvisioningStep('sns', self.create_sns, outputs=['sns_topic_arn']),
+            ProvisioningStep('sqs', self.create_sqs, inputs=['sns_topic_arn'], outputs=['sqs']),
+            ProvisioningStep('fanout_queue', self.create_fanout_queue, outputs=['fanout_sqs']),
+            ProvisioningStep('cognito', self.create_cognito, outputs=['cognito']),
+            ProvisioningStep('lambda_role', self.create_lambda_role, outputs=['lambda_role_arn']),
+            ProvisioningStep('signing_key', self.create_signing_key, outputs=['metadata_signing_key']),
+            ProvisioningStep('api_gateway', self.create_api_gateway, inputs=['cognito'], outputs=['api_gateway']),
+            ProvisioningStep(
+                'cloudfront',
+                self.create_cloudfront,
+                inputs=['frontend_bucket', 'api_gateway'],
+                outputs=['cloudfront_distribution_id']
             )
-            self.state['cloudfront_distribution_id'] = distribution_id
+        ]
+
+    def resolve_dependencies(self, steps):
+        """
+        Dependências de cada etapa: as etapas que produzem os seus inputs
+        """
+        producers = {}
+        for step in steps:
+            for output in step.outputs:
+                producers[output] = step.name
+
+        dependencies = {}
+        for step in steps:
+            missing = [key for key in step.inputs if key not in producers]
+            if missing:
+                raise Exception(f"Etapa {step.name} depende de {missing}, que nenhuma etapa produz")
+            dependencies[step.name] = {producers[key] for key in step.inputs}
+        return dependencies
 
-            # Salvar estado
+    def run_step(self, step, started):
+        """
+        Executa uma etapa e grava o resultado no estado assim que termina
+        """
+        with self.lock:
+            inputs = {key: self.state[key] for key in step.inputs}
+        step_started = time.monotonic()
+        logger.info(f"Etapa {step.name} iniciada")
+
+        outputs = step.run(inputs)
+
+        finished = time.monotonic()
+        with self.lock:
+            self.state.update({key: outputs[key] for key in step.outputs})
+            self.save_state()
+            self.timings[step.name] = (step_started - started, finished - started, 'criado')
+        logger.info(f"Etapa {step.name} concluída em {finished - step_started:.1f}s")
+
+    def run_graph(self, steps):
+        """
+        Executa as etapas assim que as suas dependências terminam. Etapas
+        cujos outputs já estão no estado (execução anterior interrompida)
+        são puladas. Em caso de erro, nenhuma etapa nova é iniciada, as que
+        estão em andamento terminam e o erro é propagado.
+        """
+        dependencies = self.resolve_dependencies(steps)
+        steps_by_name = {step.name: step for step in steps}
+        started = time.monotonic()
+
+        done = set()
+        for step in steps:
+            if all(key in self.state for key in step.outputs):
+                done.add(step.name)
+                self.timings[step.name] = (0.0, 0.0, 'retomado')
+                logger.info(f"Etapa {step.name} já concluída, pulando")
+
+        pending = set(steps_by_name) - done
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=PROVISION_WORKERS) as executor:
+            while pending or running:
+                if error is None:
+                    for name in sorted(pending):
+                        if dependencies[name] <= done:
+                            pending.remove(name)
+                            running[executor.submit(self.run_step, steps_by_name[name], started)] = name
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                        done.add(name)
+                    except Exception as e:
+                        logger.error(f"Erro na etapa {name}: {str(e)}")
+                        error = error or e
+
+        if error is not None:
+            raise error
+
+        return dependencies, time.monotonic() - started
+
+    def critical_path(self, dependencies):
+        """
+        Sequência de etapas que determinou a duração total: a partir da
+        etapa que terminou por último, segue a dependência que terminou
+        por último
+        """
+        if not any(result == 'criado' for _, _, result in self.timings.values()):
+            return []
+        name = max(self.timings, key=lambda step: self.timings[step][1])
+        path = [name]
+        while dependencies[name]:
+            name = max(dependencies[name], key=lambda step: self.timings[step][1])
+            # Etapas retomadas de uma execução anterior não custaram tempo
+            if self.timings[name][2] == 'retomado':
+                break
+            path.append(name)
+        return list(reversed(path))
+
+    def report(self, dependencies, total):
+        """Resumo do tempo de cada etapa e o caminho crítico"""
+        print(f"\n{'etapa':18} {'resultado':>10} {'início (s)':>11} {'duração (s)':>12}")
+        for name, (start, end, result) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            print(f"{name:18} {result:>10} {start:>11.1f} {end - start:>12.1f}")
+        print(f"{'total':18} {'':>10} {'':>11} {total:>12.1f}")
+
+        path = self.critical_path(dependencies)
+        if path:
+            print(f"\nCaminho crítico: {' -> '.join(path)}")
+        else:
+            print("\nNenhuma etapa executada: infraestrutura já provisionada")
+
+    def build_infrastructure(self):
+        try:
+            self.state['project_name'] = self.project_name
             self.save_state()
+
+            steps = self.steps()
+            dependencies, total = self.run_graph(steps)
+
+            self.report(dependencies, total)
             logger.info("Infraestrutura criada com sucesso!")
 
         except Exception as e:
@@ -100,4 +292,4 @@ class InfrastructureBuilder:
 
 if __name__ == '__main__':
     builder = InfrastructureBuilder('file-management')
-    builder.build_infrastructure()
\ No newline at end of file
+    builder.build_infrastructure()
@@ -3,8 +3,8 @@
 # Configurar variáveis
 DEPLOY_DIR="../todeploy"
 FRONTEND_DIR="../frontend"
-BACKEND_DIR="../backend"
 STATE_FILE="infra.state"
+SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
 # Verificar se jq está instalado
 if ! command -v jq &> /dev/null; then
@@ -12,36 +12,6 @@ if ! command -v jq &> /dev/null; then
     sudo apt-get update && sudo apt-get install -y jq
 fi
 
-# Função para empacotar uma lambda
-package_lambda() {
-    LAMBDA_NAME=$1
-    LAMBDA_DIR="$BACKEND_DIR/$LAMBDA_NAME"
-    OUTPUT_FILE="$DEPLOY_DIR/${LAMBDA_NAME}.zip"
-    
-    echo "Empacotando $LAMBDA_NAME..."
-    
-    # Criar diretório temporário
-    TMP_DIR=$(mktemp -d)
-    
-    # Copiar arquivos
-    cp -r $LAMBDA_DIR/* $TMP_DIR/
-    
-    # Instalar dependências
-    if [ -f "$TMP_DIR/requirements.txt" ]; then
-        pip install -r "$TMP_DIR/requirements.txt" -t "$TMP_DIR/"
-    fi
-    
-    # Criar ZIP
-    cd $TMP_DIR
-    zip -r $OUTPUT_FILE ./*
-    cd - > /dev/null
-    
-    # Limpar
-    rm -rf $TMP_DIR
-    
-    echo "$LAMBDA_NAME empacotado com sucesso!"
-}
-
 # Função para gerar arquivo .env do frontend
 generate_frontend_env() {
     if [ ! -f "$STATE_FILE" ]; then
@@ -113,16 +83,18 @@ echo "Frontend processado com sucesso!"
 echo "Iniciando build das lambdas..."
 
 # Array com os nomes das lambdas
-LAMBDAS=("lambda_file_list" "lambda_file_generate" "lambda_file_delete" "lambda_file_process")
+LAMBDAS=("lambda_file_list" "lambda_file_generate" "lambda_file_delete" "lambda_file_process" "lambda_file_stats")
 
-# Processar cada lambda
-for lambda in "${LAMBDAS[@]}"; do
-    package_lambda "$lambda"
-done
+# Empacotar as lambdas em paralelo, reaproveitando os zips em cache cujo
+# conteúdo não mudou, com as dependências em uma layer compartilhada
+if ! python3 "$SCRIPTS_DIR/build_lambdas.py"; then
+    echo "Erro no build das lambdas!"
+    exit 1
+fi
 
 # Verificar se todos os arquivos necessários foram gerados
 echo "Verificando arquivos gerados..."
-FILES_TO_CHECK=("frontend.zip" "${LAMBDAS[@]/%/.zip}")
+FILES_TO_CHECK=("frontend.zip" "dependencies_layer.zip" "${LAMBDAS[@]/%/.zip}")
 for file in "${FILES_TO_CHECK[@]}"; do
     if [ ! -f "$DEPLOY_DIR/$file" ]; then
         echo "Erro: Arquivo $file não foi gerado!"
@@ -1,17 +1,75 @@
 import os
+import sys
 import json
+import time
+import base64
 import boto3
+import hashlib
 import logging
+import threading
+from importlib import import_module
+from concurrent.futures import ThreadPoolExecutor
+
+# Adicionar diretório raiz ao path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Consumo da fila SQS pela lambda de processamento. A fila do fan-out é
+# consumida uma tarefa por invocação, sem janela de lote: cada tarefa já
+# ocupa uma invocação inteira (ver FANOUT_PART_SIZE).
+QUEUE_BATCH_SIZE = int(os.environ.get('QUEUE_BATCH_SIZE', 10))
+QUEUE_BATCHING_WINDOW = int(os.environ.get('QUEUE_BATCHING_WINDOW', 5))
+FANOUT_BATCH_SIZE = 1
+
+# Recálculo periódico das estatísticas (lambda_file_stats com
+# {"action": "recompute"}), em horário de pouca escrita
+STATS_RECOMPUTE_SCHEDULE = os.environ.get('STATS_RECOMPUTE_SCHEDULE', 'cron(0 4 * * ? *)')
+
+# Timeout (s) e memória (MB) de cada função; sem eles a Lambda usa 3 s e
+# 128 MB. A lambda de processamento conta objetos grandes e tarefas de
+# fan-out (o tamanho das partes é derivado do timeout, ver
+# FANOUT_PART_SIZE) e o visibility timeout da fila é calculado a partir
+# do timeout dela.
+FUNCTION_SETTINGS = {
+    'lambda_file_list': {'Timeout': 30, 'MemorySize': 256},
+    'lambda_file_generate': {'Timeout': 120, 'MemorySize': 512},
+    'lambda_file_delete': {'Timeout': 120, 'MemorySize': 256},
+    'lambda_file_process': {'Timeout': 900, 'MemorySize': 1024},
+    'lambda_file_stats': {'Timeout': 300, 'MemorySize': 256}
+}
+
+# Funções que assinam (geração) e verificam (processamento) a contagem de
+# linhas nos metadados dos objetos
+SIGNING_LAMBDAS = ('lambda_file_generate', 'lambda_file_process')
+
+# Layer com as dependências compartilhadas gerada por build_lambdas.py
+LAYER_NAME = 'dependencies_layer'
+
+# Pacotes acima deste tamanho são enviados pelo S3 em vez de inline
+# (ZipFile), que é limitado a 50 MB e trafega em base64
+S3_UPLOAD_THRESHOLD = int(os.environ.get('S3_UPLOAD_THRESHOLD', 10 * 1024 * 1024))
+
+# Lambdas atualizadas simultaneamente
+DEPLOY_WORKERS = int(os.environ.get('DEPLOY_WORKERS', 5))
+
+# Espera pelo fim da atualização da função (LastUpdateStatus)
+WAIT_INITIAL_DELAY = float(os.environ.get('WAIT_INITIAL_DELAY', 0.5))
+WAIT_MAX_DELAY = float(os.environ.get('WAIT_MAX_DELAY', 8))
+WAIT_TIMEOUT = float(os.environ.get('WAIT_TIMEOUT', 300))
+
 class Deployer:
     def __init__(self):
         self.state = self.load_state()
         self.s3_client = boto3.client('s3')
         self.lambda_client = boto3.client('lambda')
+        self.layer_arn = None
+        self.artifacts_bucket = None
+        self.timings = []
+        self.lock = threading.Lock()
 
     def load_state(self):
         """Carrega o arquivo de estado"""
@@ -19,92 +77,325 @@ class Deployer:
             return json.load(f)
 
     def deploy_frontend(self):
-        """Deploy do frontend para S3"""
+        """
+        Sincroniza o frontend com o bucket (apenas arquivos alterados) e
+        invalida no CloudFront os caminhos substituídos ou removidos
+        """
         try:
+            project_name = self.state['project_name']
             frontend_bucket = self.state['frontend_bucket']
-            frontend_zip = '../todeploy/frontend.zip'
-            
-            # Extrair e fazer upload dos arquivos
-            os.system(f'unzip -o {frontend_zip} -d /tmp/frontend')
-            
-            for root, dirs, files in os.walk('/tmp/frontend'):
-                for file in files:
-                    local_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(local_path, '/tmp/frontend')
-                    
-                    # Determinar content type
-                    content_type = 'text/html' if file.endswith('.html') else \
-                                 'application/javascript' if file.endswith('.js') else \
-                                 'text/css' if file.endswith('.css') else \
-                                 'application/octet-stream'
-                    
-                    self.s3_client.upload_file(
-                        local_path, 
-                        frontend_bucket,
-                        relative_path,
-                        ExtraArgs={'ContentType': content_type}
-                    )
+            
+            sync_manager = import_module('modulos.s3.sync_manager').SyncManager(project_name)
+            result = sync_manager.sync_zip('../todeploy/frontend.zip', frontend_bucket)
+            
+            # Arquivos novos (ex.: chunks com outro hash) nunca estiveram em
+            # cache; só os caminhos que já existiam precisam ser invalidados
+            paths = [f"/{key}" for key in result['replaced']]
+            if 'index.html' in result['replaced']:
+                paths.append('/')
+            
+            if paths and self.state.get('cloudfront_distribution_id'):
+                cloudfront_manager = import_module('modulos.cloudfront.distribution_manager').CloudFrontManager(project_name)
+                cloudfront_manager.invalidate_paths(self.state['cloudfront_distribution_id'], paths)
             
             logger.info(f"Frontend deployed to {frontend_bucket}")
+            return result
             
         except Exception as e:
             logger.error(f"Erro no deploy do frontend: {str(e)}")
             raise
 
-    def deploy_lambda(self, lambda_name):
-        """Deploy de uma função Lambda"""
+    def artifact_path(self, name):
+        """Caminho do zip gerado pelo build"""
+        return f'../todeploy/{name}.zip'
+
+    def code_sha256(self, zip_path):
+        """SHA-256 do zip no formato do CodeSha256 da Lambda (base64)"""
+        digest = hashlib.sha256()
+        with open(zip_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return base64.b64encode(digest.digest()).decode('ascii')
+
+    def get_artifacts_bucket(self):
+        """Bucket dos pacotes grandes, criado no primeiro uso"""
+        with self.lock:
+            if self.artifacts_bucket is None:
+                s3_manager = import_module('modulos.s3.s3_manager').S3Manager(self.state['project_name'])
+                self.artifacts_bucket = s3_manager.create_bucket('artifacts')
+            return self.artifacts_bucket
+
+    def upload_artifact(self, name, zip_path, code_sha256):
+        """
+        Envia um pacote para o bucket de artefatos (a chave inclui o hash,
+        então um pacote já enviado não é enviado de novo) e retorna
+        (bucket, key)
+        """
+        bucket = self.get_artifacts_bucket()
+        digest = base64.b64decode(code_sha256).hex()
+        key = f"lambdas/{name}-{digest}.zip"
         try:
-            with open(f'../todeploy/{lambda_name}.zip', 'rb') as f:
-                zip_content = f.read()
+            self.s3_client.head_object(Bucket=bucket, Key=key)
+        except self.s3_client.exceptions.ClientError:
+            self.s3_client.upload_file(zip_path, bucket, key)
+        return bucket, key
+
+    def code_location(self, name, zip_path, code_sha256):
+        """
+        Parâmetros do código para create/update: inline até
+        S3_UPLOAD_THRESHOLD, via S3 acima disso
+        """
+        if os.path.getsize(zip_path) > S3_UPLOAD_THRESHOLD:
+            bucket, key = self.upload_artifact(name, zip_path, code_sha256)
+            return {'S3Bucket': bucket, 'S3Key': key}
+        with open(zip_path, 'rb') as f:
+            return {'ZipFile': f.read()}
+
+    def wait_function_ready(self, function_name):
+        """
+        Aguarda a função sair de Pending/InProgress, consultando com
+        intervalo crescente
+        """
+        delay = WAIT_INITIAL_DELAY
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while True:
+            config = self.lambda_client.get_function_configuration(FunctionName=function_name)
+            if config.get('State') == 'Failed' or config.get('LastUpdateStatus') == 'Failed':
+                reason = config.get('LastUpdateStatusReason') or config.get('StateReason')
+                raise Exception(f"Atualização da função {function_name} falhou: {reason}")
+            if config.get('State') != 'Pending' and config.get('LastUpdateStatus') != 'InProgress':
+                return config
+            if time.monotonic() + delay > deadline:
+                raise Exception(f"Tempo esgotado aguardando a função {function_name}")
+            time.sleep(delay)
+            delay = min(delay * 2, WAIT_MAX_DELAY)
+
+    def deploy_layer(self):
+        """Publica a layer de dependências se o conteúdo mudou"""
+        try:
+            started = time.monotonic()
+            lambda_manager = import_module('modulos.lambdas.lambda_manager').LambdaManager(self.state['project_name'])
+            zip_path = self.artifact_path(LAYER_NAME)
+            code_sha256 = self.code_sha256(zip_path)
+            
+            latest = lambda_manager.get_latest_layer_version(LAYER_NAME)
+            if latest and latest['code_sha256'] == code_sha256:
+                self.layer_arn = latest['arn']
+                action = 'inalterada'
+            else:
+                s3_location = None
+                if os.path.getsize(zip_path) > S3_UPLOAD_THRESHOLD:
+                    s3_location = self.upload_artifact(LAYER_NAME, zip_path, code_sha256)
+                self.layer_arn = lambda_manager.publish_layer(LAYER_NAME, zip_path, s3_location=s3_location)
+                action = 'publicada'
             
+            self.timings.append((LAYER_NAME, action, time.monotonic() - started))
+            logger.info(f"Layer {LAYER_NAME} {action}: {self.layer_arn}")
+            
+        except Exception as e:
+            logger.error(f"Erro no deploy da layer: {str(e)}")
+            raise
+
+    def function_environment(self, lambda_name):
+        """
+        Variáveis de ambiente das funções. FUNCTION_TIMEOUT permite à
+        função dimensionar o trabalho por invocação (ex.: partes do
+        fan-out). A chave de assinatura da contagem de linhas vai apenas
+        para a geração e o processamento.
+        """
+        environment = {
+            'REDIS_HOST': self.state['elasticache']['endpoint'],
+            'DATA_BUCKET_NAME': self.state['data_bucket'],
+            'SNS_TOPIC_ARN': self.state['sns_topic_arn'],
+            'SQS_QUEUE_URL': self.state['sqs']['queue_url'],
+            'FUNCTION_TIMEOUT': str(FUNCTION_SETTINGS[lambda_name]['Timeout'])
+        }
+        if self.state.get('fanout_sqs'):
+            environment['FANOUT_QUEUE_URL'] = self.state['fanout_sqs']['queue_url']
+        if lambda_name in SIGNING_LAMBDAS and self.state.get('metadata_signing_key'):
+            environment['METADATA_SIGNING_KEY'] = self.state['metadata_signing_key']
+        return environment
+
+    def deploy_lambda(self, lambda_name):
+        """
+        Deploy de uma função Lambda. O código só é enviado se o hash do zip
+        local diferir do CodeSha256 da função, e a configuração só é
+        alterada se a layer, o timeout, a memória ou as variáveis de
+        ambiente mudaram.
+        """
+        try:
+            started = time.monotonic()
+            zip_path = self.artifact_path(lambda_name)
+            code_sha256 = self.code_sha256(zip_path)
             function_name = f"{self.state['project_name']}-{lambda_name}"
             
             try:
-                # Atualizar código se a função já existe
-                self.lambda_client.update_function_code(
-                    FunctionName=function_name,
-                    ZipFile=zip_content
-                )
+                config = self.lambda_client.get_function_configuration(FunctionName=function_name)
             except self.lambda_client.exceptions.ResourceNotFoundException:
+                config = None
+            
+            if config is None:
                 # Criar função se não existe
                 self.lambda_client.create_function(
                     FunctionName=function_name,
                     Runtime='python3.9',
                     Role=self.state['lambda_role_arn'],
                     Handler='index.handler',
-                    Code={'ZipFile': zip_content},
-                    Environment={
-                        'Variables': {
-                            'REDIS_HOST': self.state['elasticache']['endpoint'],
-                            'DATA_BUCKET_NAME': self.state['data_bucket'],
-                            'SNS_TOPIC_ARN': self.state['sns_topic_arn']
-                        }
-                    }
+                    Code=self.code_location(lambda_name, zip_path, code_sha256),
+                    Layers=[self.layer_arn],
+                    Environment={'Variables': self.function_environment(lambda_name)},
+                    **FUNCTION_SETTINGS[lambda_name]
                 )
+                self.wait_function_ready(function_name)
+                action = 'criada'
+            else:
+                code_changed = config['CodeSha256'] != code_sha256
+                
+                # Layer atual, timeout, memória e variáveis de ambiente
+                # (preservando as que foram definidas fora do deploy)
+                configuration = {}
+                if [layer['Arn'] for layer in config.get('Layers', [])] != [self.layer_arn]:
+                    configuration['Layers'] = [self.layer_arn]
+                for key, value in FUNCTION_SETTINGS[lambda_name].items():
+                    if config.get(key) != value:
+                        configuration[key] = value
+                current_environment = config.get('Environment', {}).get('Variables', {})
+                environment = {**current_environment, **self.function_environment(lambda_name)}
+                if environment != current_environment:
+                    configuration['Environment'] = {'Variables': environment}
+                
+                # Configuração antes do código: o código novo depende da
+                # layer (as dependências saíram do zip) e das variáveis de
+                # ambiente, enquanto o código antigo continua funcionando com
+                # elas. Uma atualização anterior ainda em andamento rejeitaria
+                # a nova, por isso a espera antes de cada uma.
+                if configuration:
+                    self.wait_function_ready(function_name)
+                    self.lambda_client.update_function_configuration(
+                        FunctionName=function_name,
+                        **configuration
+                    )
+                    self.wait_function_ready(function_name)
+                
+                if code_changed:
+                    if not configuration:
+                        self.wait_function_ready(function_name)
+                    self.lambda_client.update_function_code(
+                        FunctionName=function_name,
+                        **self.code_location(lambda_name, zip_path, code_sha256)
+                    )
+                    self.wait_function_ready(function_name)
+                
+                action = 'atualizada' if code_changed or configuration else 'inalterada'
             
-            logger.info(f"Lambda {lambda_name} deployed successfully")
+            elapsed = time.monotonic() - started
+            with self.lock:
+                self.timings.append((lambda_name, action, elapsed))
+            logger.info(f"Lambda {lambda_name} {action} ({elapsed:.1f}s)")
             
         except Exception as e:
             logger.error(f"Erro no deploy da lambda {lambda_name}: {str(e)}")
             raise
 
+    def deploy_lambdas(self, lambda_functions):
+        """Deploy simultâneo das funções"""
+        with ThreadPoolExecutor(max_workers=DEPLOY_WORKERS) as executor:
+            futures = [executor.submit(self.deploy_lambda, name) for name in lambda_functions]
+            for future in futures:
+                future.result()
+
+    def report(self, total):
+        """Resumo do tempo de cada etapa do deploy"""
+        print(f"\n{'etapa':24} {'resultado':>14} {'tempo (s)':>10}")
+        for name, action, elapsed in self.timings:
+            print(f"{name:24} {action:>14} {elapsed:>10.1f}")
+        print(f"{'total':24} {'':>14} {total:>10.1f}")
+
+    def deploy_queue_consumer(self):
+        """Conecta as filas SQS (notificações e fan-out) à lambda de processamento"""
+        try:
+            project_name = self.state['project_name']
+            function_name = f"{project_name}-lambda_file_process"
+            
+            function_timeout = self.lambda_client.get_function_configuration(
+                FunctionName=function_name
+            )['Timeout']
+            
+            sqs_manager = import_module('modulos.sqs.queue_manager').SQSManager(project_name)
+            lambda_manager = import_module('modulos.lambdas.lambda_manager').LambdaManager(project_name)
+            
+            consumers = [(self.state['sqs'], QUEUE_BATCH_SIZE, QUEUE_BATCHING_WINDOW)]
+            if self.state.get('fanout_sqs'):
+                consumers.append((self.state['fanout_sqs'], FANOUT_BATCH_SIZE, 0))
+            
+            for queue, batch_size, batching_window in consumers:
+                sqs_manager.configure_lambda_consumer(
+                    queue['queue_url'],
+                    function_timeout,
+                    batching_window=batching_window
+                )
+                lambda_manager.create_event_source_mapping(
+                    'lambda_file_process',
+                    queue['queue_arn'],
+                    batch_size=batch_size,
+                    batching_window=batching_window
+                )
+            
+            logger.info("Queue consumer configured successfully")
+            
+        except Exception as e:
+            logger.error(f"Erro ao configurar consumo da fila: {str(e)}")
+            raise
+
+    def deploy_stats_schedule(self):
+        """Agenda o recálculo das estatísticas no EventBridge"""
+        try:
+            schedule_manager = import_module('modulos.events.schedule_manager').ScheduleManager(self.state['project_name'])
+            schedule_manager.create_schedule(
+                'stats-recompute',
+                STATS_RECOMPUTE_SCHEDULE,
+                'lambda_file_stats',
+                {'action': 'recompute'}
+            )
+            
+        except Exception as e:
+            logger.error(f"Erro ao agendar recálculo das estatísticas: {str(e)}")
+            raise
+
     def deploy_all(self):
         """Executa todo o processo de deploy"""
         try:
+            started = time.monotonic()
+            
             # Deploy do frontend
-            self.deploy_frontend()
+            step_started = time.monotonic()
+            result = self.deploy_frontend()
+            self.timings.append(('frontend', f"{len(result['uploaded'])} enviado(s)", time.monotonic() - step_started))
+            
+            # Deploy da layer de dependências e das lambdas
+            self.deploy_layer()
             
-            # Deploy das lambdas
             lambda_functions = [
                 'lambda_file_list',
                 'lambda_file_generate',
                 'lambda_file_delete',
-                'lambda_file_process'
+                'lambda_file_process',
+                'lambda_file_stats'
             ]
             
-            for lambda_name in lambda_functions:
-                self.deploy_lambda(lambda_name)
+            self.deploy_lambdas(lambda_functions)
+            
+            # Consumo da fila SQS em lotes
+            step_started = time.monotonic()
+            self.deploy_queue_consumer()
+            self.timings.append(('queue_consumer', 'configurado', time.monotonic() - step_started))
+            
+            # Recálculo agendado das estatísticas
+            step_started = time.monotonic()
+            self.deploy_stats_schedule()
+            self.timings.append(('stats_schedule', 'agendado', time.monotonic() - step_started))
             
+            self.report(time.monotonic() - started)
             logger.info("Deploy completed successfully!")
             
         except Exception as e:
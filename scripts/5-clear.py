@@ -38,18 +38,26 @@ class InfrastructureCleaner:
 
             # 3. Remover Lambdas e Role
             if 'lambda_role_arn' in self.state:
+                logger.info("Removendo recálculo agendado das estatísticas...")
+                schedule_manager = import_module('modulos.events.schedule_manager').ScheduleManager(self.project_name)
+                schedule_manager.delete_schedule('stats-recompute')
+                
                 logger.info("Removendo funções Lambda...")
                 lambda_manager = import_module('modulos.lambdas.lambda_manager').LambdaManager(self.project_name)
                 lambda_functions = [
                     'lambda_file_list',
                     'lambda_file_generate',
                     'lambda_file_delete',
-                    'lambda_file_process'
+                    'lambda_file_process',
+                    'lambda_file_stats'
                 ]
                 
                 for func in lambda_functions:
                     lambda_manager.delete_function(func)
                 
+                # Remover a layer de dependências
+                lambda_manager.delete_layer('dependencies_layer')
+                
                 # Remover role após remover todas as funções
                 lambda_manager.delete_role(f"{self.project_name}-lambda-role")
 
@@ -64,6 +72,10 @@ class InfrastructureCleaner:
                 logger.info("Removendo fila SQS...")
                 sqs_manager = import_module('modulos.sqs.queue_manager').SQSManager(self.project_name)
                 sqs_manager.delete_queue(self.state['sqs']['queue_url'])
+            if 'fanout_sqs' in self.state:
+                logger.info("Removendo fila do fan-out...")
+                sqs_manager = import_module('modulos.sqs.queue_manager').SQSManager(self.project_name)
+                sqs_manager.delete_queue(self.state['fanout_sqs']['queue_url'])
 
             # 6. Remover SNS Topic
             if 'sns_topic_arn' in self.state:
@@ -85,6 +97,11 @@ class InfrastructureCleaner:
             if 'data_bucket' in self.state:
                 logger.info("Removendo bucket de dados...")
                 s3_manager.delete_bucket(self.state['data_bucket'])
+            # Bucket dos pacotes grandes, criado sob demanda pelo deploy
+            artifacts_bucket = s3_manager.get_existing_bucket('artifacts')
+            if artifacts_bucket:
+                logger.info("Removendo bucket de artefatos...")
+                s3_manager.delete_bucket(artifacts_bucket)
 
             # 9. Remover VPC (por último, pois outros serviços dependem dela)
             if 'vpc' in self.state:
@@ -0,0 +1,180 @@
+import json
+import time
+import random
+import argparse
+import logging
+import threading
+from collections import Counter
+
+from local_stubs import load_lambda, local_redis, StubS3
+
+# Mede a taxa de acerto do cache da listagem (file_metadata:entries) sob
+# uma carga mista de leituras (lambda_file_list) e escritas, com o S3 e o
+# Redis locais de local_stubs.py. Cada escrita cria ou remove um arquivo no
+# bucket e nos metadados e então:
+# - 'invalida': descarta a listagem em cache, como as escritas faziam antes
+# - 'incremental': atualiza só a entrada do arquivo com o
+#   UPDATE_LISTING_SCRIPT, como fazem generate, process e delete
+# No cenário sequencial leituras e escritas se alternam. No cenário
+# simultâneo uma thread escreve a intervalos fixos enquanto outra lê,
+# partindo do cache vencido e com um LIST lento, de modo que as escritas
+# acontecem durante as reconstruções.
+# O cache em memória (L1) é desativado para medir apenas o cache no Redis.
+# Ao final, a listagem servida é comparada com uma reconstrução completa.
+#
+# Uso: python bench_cache_hits.py [--operations 2000] [--objects 1000]
+#      [--write-ratios 0.01 0.1 0.3] [--reads 10] [--write-interval-ms 50]
+#      [--read-interval-ms 100] [--list-ms 150]
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUCKET = 'benchmark'
+
+def write(s3_client, redis_client, update_listing, mode, name, delete):
+    """
+    Cria (ou remove) um arquivo e atualiza a listagem conforme o modo
+    """
+    from shared import LISTING_KEYS
+    if delete:
+        s3_client.delete_object(Bucket=BUCKET, Key=name)
+        redis_client.delete(f"file:{name}")
+        entry = ''
+    else:
+        s3_client.put_object(Bucket=BUCKET, Key=name, Body=b'x\n' * 5)
+        redis_client.hset(f"file:{name}", mapping={'lines': 5, 'size': 10})
+        entry = json.dumps({'name': name, 'lines': 5, 'size': 10})
+
+    if mode == 'invalida':
+        redis_client.delete('file_metadata:entries')
+    else:
+        update_listing(keys=LISTING_KEYS, args=[name, entry])
+
+def setup(objects, mode, list_latency=0):
+    """
+    Clientes locais da lambda e o bucket com os arquivos iniciais
+    """
+    from shared import clients, UPDATE_LISTING_SCRIPT
+    s3_client = StubS3(list_latency=list_latency)
+    redis_client = local_redis(rtt=0)
+    clients._clients['s3'] = s3_client
+    clients._redis_client = redis_client
+    update_listing = redis_client.register_script(UPDATE_LISTING_SCRIPT)
+
+    names = [f"file_{i:07d}.txt" for i in range(objects)]
+    for name in names:
+        write(s3_client, redis_client, update_listing, mode, name, delete=False)
+    return s3_client, redis_client, update_listing, names
+
+def is_consistent(listing, s3_client, redis_client):
+    """
+    Se a listagem servida corresponde a uma reconstrução completa
+    """
+    expected = listing.build_listing(s3_client, redis_client, BUCKET)
+    served = listing.handler({}, None)['body']
+    return json.loads(served) == expected
+
+def run(listing, mode, objects, operations, write_ratio, seed):
+    """
+    Cenário sequencial: retorna leituras, acertos, reconstruções e se a
+    última listagem servida corresponde ao bucket
+    """
+    s3_client, redis_client, update_listing, names = setup(objects, mode)
+
+    rng = random.Random(seed)
+    reads = hits = rebuilds = 0
+    next_id = objects
+    for _ in range(operations):
+        if rng.random() < write_ratio:
+            if names and rng.random() < 0.3:
+                name = names.pop(rng.randrange(len(names)))
+                write(s3_client, redis_client, update_listing, mode, name, delete=True)
+            else:
+                name = f"file_{next_id:07d}.txt"
+                next_id += 1
+                names.append(name)
+                write(s3_client, redis_client, update_listing, mode, name, delete=False)
+        else:
+            response = listing.handler({}, None)
+            reads += 1
+            cache_status = response['headers'].get('X-Cache')
+            hits += cache_status == 'HIT'
+            rebuilds += cache_status == 'MISS'
+
+    return reads, hits, rebuilds, is_consistent(listing, s3_client, redis_client)
+
+def run_concurrent(listing, objects, reads, write_interval, read_interval, list_latency):
+    """
+    Cenário simultâneo: escritas a cada write_interval durante leituras a
+    cada read_interval, a partir do cache vencido. Retorna a contagem de
+    X-Cache das leituras, as páginas LIST e se a listagem final corresponde
+    ao bucket.
+    """
+    s3_client, redis_client, update_listing, _ = setup(objects, 'incremental', list_latency)
+    redis_client.delete('file_metadata:entries', 'file_metadata:stale')
+    s3_client.calls['list_objects_v2'] = 0
+
+    stop = threading.Event()
+
+    def writer():
+        next_id = objects
+        while not stop.is_set():
+            write(s3_client, redis_client, update_listing, 'incremental', f"file_{next_id:07d}.txt", delete=False)
+            next_id += 1
+            stop.wait(write_interval)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    statuses = Counter()
+    try:
+        for _ in range(reads):
+            statuses[listing.handler({}, None)['headers'].get('X-Cache')] += 1
+            time.sleep(read_interval)
+    finally:
+        stop.set()
+        thread.join()
+
+    pages = s3_client.calls['list_objects_v2']
+    return statuses, pages, is_consistent(listing, s3_client, redis_client)
+
+def main():
+    parser = argparse.ArgumentParser(description='Taxa de acerto do cache da listagem sob leituras e escritas')
+    parser.add_argument('--operations', type=int, default=2000)
+    parser.add_argument('--objects', type=int, default=1000)
+    parser.add_argument('--write-ratios', nargs='*', type=float, default=[0.01, 0.1, 0.3])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reads', type=int, default=10, help='leituras do cenário simultâneo')
+    parser.add_argument('--write-interval-ms', type=float, default=50)
+    parser.add_argument('--read-interval-ms', type=float, default=100)
+    parser.add_argument('--list-ms', type=float, default=150, help='latência por página do LIST no cenário simultâneo')
+    args = parser.parse_args()
+
+    listing = load_lambda('lambda_file_list')
+    listing.local_cache = listing.LocalCache(0)
+
+    print("Sequencial")
+    print(f"{'escritas':>9} {'modo':>12} {'leituras':>9} {'acertos':>8} {'taxa':>7} {'reconstruções':>14} {'consistente':>12}")
+    for write_ratio in args.write_ratios:
+        for mode in ('invalida', 'incremental'):
+            reads, hits, rebuilds, consistent = run(listing, mode, args.objects, args.operations, write_ratio, args.seed)
+            if not consistent:
+                logger.error(f"{mode}: listagem em cache diferente da reconstrução")
+            print(
+                f"{write_ratio:>9.0%} {mode:>12} {reads:>9} {hits:>8} {hits / max(reads, 1):>7.1%} "
+                f"{rebuilds:>14} {'sim' if consistent else 'não':>12}"
+            )
+
+    statuses, pages, consistent = run_concurrent(
+        listing, args.objects, args.reads,
+        args.write_interval_ms / 1000, args.read_interval_ms / 1000, args.list_ms / 1000
+    )
+    if not consistent:
+        logger.error("simultâneo: listagem em cache diferente da reconstrução")
+    summary = ', '.join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str))
+    print(
+        f"\nSimultâneo: uma escrita a cada {args.write_interval_ms:g} ms, LIST de {args.list_ms:g} ms\n"
+        f"{args.reads} leituras [{summary}], {pages} página(s) LIST, consistente: {'sim' if consistent else 'não'}"
+    )
+
+if __name__ == '__main__':
+    main()
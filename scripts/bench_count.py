@@ -0,0 +1,83 @@
+import io
+import time
+import hashlib
+import argparse
+import logging
+
+from local_stubs import load_lambda
+
+# Mede a vazão da contagem de linhas da lambda_file_process (count_lines,
+# sobre count_newlines) em um corpo em memória, sem rede, para isolar o
+# custo de CPU: com readinto (um buffer reaproveitado, como o
+# StreamingBody do boto3) e só com read (um bloco novo por leitura), para
+# alguns tamanhos de bloco, e com o SHA-256 calculado junto (verificação
+# dos metadados). Para comparação, mede também a contagem anterior, que
+# decodificava o objeto inteiro e o dividia em linhas. A meta é de ao menos
+# 500 MB/s por invocação.
+#
+# Uso: python bench_count.py [--size-mb 256] [--chunk-kb 64 1024 8192]
+#      [--no-baseline]
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TARGET = 500
+LINE = b'Linha 1234567: ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEFGHIJKLMNOPQRSTUVWXYZABCDEFGHIJKLMNOPQRSTUVWXYZABCDEFGHIJ\n'
+
+class ReadOnlyBody:
+    """
+    Corpo sem readinto: cada read devolve um bloco novo
+    """
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+def count_lines_decoded(body):
+    """
+    Contagem anterior: o objeto inteiro decodificado e dividido em linhas
+    """
+    return len(body.read().decode('utf-8').split('\n'))
+
+def measure(count, data):
+    """
+    Linhas contadas e vazão em MB/s
+    """
+    started = time.perf_counter()
+    lines = count()
+    return lines, len(data) / 1e6 / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão da contagem de linhas')
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--chunk-kb', nargs='*', type=int, default=[64, 1024, 8192])
+    parser.add_argument('--no-baseline', action='store_true', help='não medir a contagem anterior')
+    args = parser.parse_args()
+
+    process = load_lambda('lambda_file_process')
+    size = args.size_mb * 1024 * 1024
+    data = LINE * (size // len(LINE)) + b'sem quebra final'
+    expected = data.count(b'\n') + 1
+
+    print(f"{'contagem':>22} {'bloco (KiB)':>12} {'MB/s':>8} {'meta':>6}")
+    rows = []
+    for chunk_kb in args.chunk_kb:
+        chunk_size = chunk_kb * 1024
+        rows.append(('readinto', chunk_kb, lambda chunk_size=chunk_size: process.count_lines(io.BytesIO(data), chunk_size)))
+        rows.append(('read', chunk_kb, lambda chunk_size=chunk_size: process.count_lines(ReadOnlyBody(data), chunk_size)))
+    rows.append((
+        'readinto + SHA-256', process.READ_CHUNK_SIZE // 1024,
+        lambda: process.count_lines(io.BytesIO(data), hasher=hashlib.sha256())
+    ))
+    if not args.no_baseline:
+        rows.append(('anterior (decode)', '-', lambda: count_lines_decoded(io.BytesIO(data))))
+
+    for label, chunk_kb, count in rows:
+        lines, throughput = measure(count, data)
+        if lines != expected:
+            logger.error(f"{label}: {lines} linhas, esperado {expected}")
+        print(f"{label:>22} {chunk_kb:>12} {throughput:>8.0f} {'ok' if throughput >= TARGET else 'abaixo':>6}")
+
+if __name__ == '__main__':
+    main()
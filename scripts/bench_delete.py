@@ -0,0 +1,101 @@
+import os
+import time
+import argparse
+import logging
+
+from local_stubs import load_lambda, local_redis, StubS3, StubSQS, REDIS_RTT, S3_LIST_LATENCY, S3_DELETE_LATENCY, SQS_SEND_LATENCY
+
+# Mede a latência (p50, p90, p99) do DELETE /files/{filename} da
+# lambda_file_delete com o S3, o SQS e o Redis locais de local_stubs.py:
+# cada requisição lista as versões do arquivo, exclui-as, remove os
+# metadados do Redis e enfileira a notificação. Ao final, uma exclusão
+# com falha no S3 verifica que os metadados do arquivo são preservados.
+#
+# Uso: python bench_delete.py [--files 500] [--list-ms 30] [--delete-ms 20]
+#      [--sqs-ms 10] [--redis-rtt-ms 0.3]
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUCKET = 'benchmark'
+
+def percentile(values, fraction):
+    """
+    Percentil (por posição) de uma lista ordenada
+    """
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def create_files(s3_client, redis_client, names):
+    """
+    Arquivos no bucket com os metadados e índices gravados pelas lambdas
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for index, name in enumerate(names):
+        s3_client.put_object(Bucket=BUCKET, Key=name, Body=b'x\n' * 5)
+        pipe.hset(f"file:{name}", mapping={'lines': 5, 'size': 10})
+        pipe.zadd('file_index', {name: index})
+    pipe.execute()
+
+def check_failed_delete(delete, s3_client, redis_client):
+    """
+    Se uma falha no S3 devolve 500 sem remover os metadados do arquivo
+    """
+    name = 'falha.txt'
+    create_files(s3_client, redis_client, [name])
+    delete_objects = s3_client.delete_objects
+
+    def failing_delete(**kwargs):
+        raise Exception('S3 indisponível')
+
+    s3_client.delete_objects = failing_delete
+    try:
+        response = delete.handler({'pathParameters': {'filename': name}}, None)
+    finally:
+        s3_client.delete_objects = delete_objects
+    return response['statusCode'] == 500 and redis_client.exists(f"file:{name}") == 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência do DELETE de um arquivo')
+    parser.add_argument('--files', type=int, default=500)
+    parser.add_argument('--list-ms', type=float, default=S3_LIST_LATENCY * 1000)
+    parser.add_argument('--delete-ms', type=float, default=S3_DELETE_LATENCY * 1000)
+    parser.add_argument('--sqs-ms', type=float, default=SQS_SEND_LATENCY * 1000)
+    parser.add_argument('--redis-rtt-ms', type=float, default=REDIS_RTT * 1000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SQS_QUEUE_URL', 'benchmark-queue')
+    delete = load_lambda('lambda_file_delete')
+
+    # Clientes usados pela lambda (criados uma vez por container)
+    from shared import clients
+    s3_client = StubS3(list_latency=args.list_ms / 1000, delete_latency=args.delete_ms / 1000)
+    sqs_client = StubSQS(send_latency=args.sqs_ms / 1000)
+    redis_client = local_redis(rtt=args.redis_rtt_ms / 1000)
+    clients._clients['s3'] = s3_client
+    clients._clients['sqs'] = sqs_client
+    clients._redis_client = redis_client
+
+    names = [f"file_{i:07d}.txt" for i in range(args.files)]
+    create_files(s3_client, redis_client, names)
+
+    latencies = []
+    for name in names:
+        started = time.perf_counter()
+        response = delete.handler({'pathParameters': {'filename': name}}, None)
+        latencies.append(time.perf_counter() - started)
+        if response['statusCode'] != 200:
+            logger.error(f"{name}: {response['statusCode']} {response['body']}")
+
+    latencies.sort()
+    remaining = sum(1 for name in names if redis_client.exists(f"file:{name}"))
+    print(f"{'exclusões':>10} {'p50 (ms)':>9} {'p90 (ms)':>9} {'p99 (ms)':>9} {'máx (ms)':>9} {'restantes':>10}")
+    print(
+        f"{len(latencies):>10} {percentile(latencies, 0.50) * 1000:>9.1f} {percentile(latencies, 0.90) * 1000:>9.1f} "
+        f"{percentile(latencies, 0.99) * 1000:>9.1f} {latencies[-1] * 1000:>9.1f} {remaining:>10}"
+    )
+
+    preserved = check_failed_delete(delete, s3_client, redis_client)
+    print(f"falha no S3: 500 com metadados preservados: {'sim' if preserved else 'não'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import os
+import time
+import argparse
+from collections import Counter
+
+from local_stubs import load_lambda
+
+# Mede a geração de conteúdo da lambda_file_generate (generate_block) e a
+# distribuição das letras sorteadas. Compara a conversão direta de cada
+# byte aleatório com LETTERS[byte % 26] (as 22 primeiras letras recebem 10
+# dos 256 valores e as 4 últimas, 9) com a amostragem por rejeição usada
+# pela lambda, que descarta os bytes a partir de 234.
+#
+# Uso: python bench_generate.py [--lines 1000000] [--line-length 20]
+#      [--sample-mb 64]
+
+MB = 1024 * 1024
+
+def modulo_letters(generate, size):
+    """
+    Letras pela conversão direta, sem descartar bytes
+    """
+    table = bytes(generate.LETTERS[i % len(generate.LETTERS)] for i in range(256))
+    return os.urandom(size).translate(table)
+
+def distribution(letters, alphabet):
+    """
+    Frequência mínima e máxima das letras em relação à esperada (1/26) e o
+    qui-quadrado da amostra (25 graus de liberdade; acima de ~52,6 a
+    distribuição é rejeitada como uniforme com p < 0,001)
+    """
+    counts = Counter(letters)
+    expected = len(letters) / len(alphabet)
+    ratios = [counts[letter] / expected for letter in alphabet]
+    chi_square = sum((counts[letter] - expected) ** 2 / expected for letter in alphabet)
+    return min(ratios), max(ratios), chi_square
+
+def generation_throughput(generate, lines, line_length):
+    """
+    MiB/s de iter_content_blocks para um arquivo de lines linhas
+    """
+    started = time.perf_counter()
+    size = sum(len(block) for block in generate.iter_content_blocks(lines, line_length))
+    return size / MB / (time.perf_counter() - started), size
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão da geração de conteúdo e distribuição das letras')
+    parser.add_argument('--lines', type=int, default=1_000_000)
+    parser.add_argument('--line-length', type=int, default=20)
+    parser.add_argument('--sample-mb', type=int, default=64, help='letras sorteadas para a distribuição')
+    args = parser.parse_args()
+
+    generate = load_lambda('lambda_file_generate')
+    alphabet = list(generate.LETTERS)
+    size = args.sample_mb * MB
+
+    print(f"{'sorteio':>10} {'MiB/s':>8} {'mín/esperada':>13} {'máx/esperada':>13} {'qui-quadrado':>13}")
+    for label, draw in (
+        ('módulo', lambda: modulo_letters(generate, size)),
+        ('rejeição', lambda: generate.random_letters(size))
+    ):
+        started = time.perf_counter()
+        letters = draw()
+        elapsed = time.perf_counter() - started
+        low, high, chi_square = distribution(letters, alphabet)
+        print(f"{label:>10} {args.sample_mb / elapsed:>8.0f} {low:>13.4f} {high:>13.4f} {chi_square:>13.1f}")
+
+    throughput, file_size = generation_throughput(generate, args.lines, args.line_length)
+    print(f"\ngeração de {args.lines} linhas ({file_size / MB:.1f} MiB): {throughput:.0f} MiB/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import time
+import argparse
+import logging
+
+from local_stubs import load_lambda, local_redis, StubS3, S3_LIST_LATENCY, REDIS_RTT
+
+# Mede a reconstrução da listagem (build_listing da lambda_file_list) com
+# um S3 e um Redis locais: o bucket é percorrido com o paginador e os
+# metadados buscados em pipelines de METADATA_BATCH_SIZE. Para comparação,
+# mede também a busca anterior, com um HGETALL (uma ida e volta) por
+# objeto. Cerca de 1% dos objetos fica sem metadados (ainda não processado).
+# O fakeredis executa cada comando em Python (ordem de 0,1 ms), então os
+# tempos absolutos são maiores que com o ElastiCache; a diferença entre as
+# duas buscas vem das idas e voltas.
+#
+# Uso: python bench_listing.py [--sizes 1000 10000 100000] [--rtt-ms 0.3]
+#      [--list-ms 30] [--no-baseline]
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUCKET = 'benchmark'
+
+def populate(s3_client, redis_client, count):
+    """
+    Cria count objetos no bucket e os metadados de 99% deles no Redis
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for i in range(count):
+        name = f"file_{i:07d}.txt"
+        s3_client.put_object(Bucket=BUCKET, Key=name, Body=b'x' * 64)
+        if i % 100:
+            pipe.hset(f"file:{name}", mapping={'lines': 10, 'size': 64})
+    pipe.execute()
+
+def build_listing_per_object(s3_client, redis_client, bucket_name):
+    """
+    Busca anterior: um HGETALL por objeto
+    """
+    files = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        for item in page.get('Contents', []):
+            metadata = redis_client.hgetall(f"file:{item['Key']}")
+            files.append({
+                'name': item['Key'],
+                'lines': int(metadata[b'lines']) if b'lines' in metadata else None,
+                'size': item['Size']
+            })
+    return files
+
+def measure(build, s3_client, redis_client):
+    """
+    Tempo da reconstrução, idas e voltas ao Redis e páginas do S3
+    """
+    redis_class = type(redis_client)
+    redis_class.round_trips = 0
+    s3_client.calls['list_objects_v2'] = 0
+    started = time.perf_counter()
+    files = build(s3_client, redis_client, BUCKET)
+    elapsed = time.perf_counter() - started
+    return elapsed, redis_class.round_trips, s3_client.calls['list_objects_v2'], files
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da reconstrução da listagem')
+    parser.add_argument('--sizes', nargs='*', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--rtt-ms', type=float, default=REDIS_RTT * 1000, help='ida e volta ao Redis')
+    parser.add_argument('--list-ms', type=float, default=S3_LIST_LATENCY * 1000, help='latência por página do LIST')
+    parser.add_argument('--no-baseline', action='store_true', help='não mede a busca com um HGETALL por objeto')
+    args = parser.parse_args()
+
+    listing = load_lambda('lambda_file_list')
+
+    print(f"{'objetos':>8} {'busca':>12} {'tempo (s)':>10} {'Redis':>8} {'LIST':>6} {'sem metadados':>14}")
+    for count in args.sizes:
+        s3_client = StubS3(list_latency=args.list_ms / 1000)
+        redis_client = local_redis(rtt=args.rtt_ms / 1000)
+        populate(s3_client, redis_client, count)
+
+        builds = [('pipeline', listing.build_listing)]
+        if not args.no_baseline:
+            builds.append(('por objeto', build_listing_per_object))
+
+        for label, build in builds:
+            elapsed, round_trips, pages, files = measure(build, s3_client, redis_client)
+            if len(files) != count:
+                logger.error(f"{label}: {len(files)} de {count} objetos na listagem")
+            missing = sum(1 for file in files if file['lines'] is None)
+            print(f"{count:>8} {label:>12} {elapsed:>10.2f} {round_trips:>8} {pages:>6} {missing:>14}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import time
+import random
+import argparse
+import logging
+
+from local_stubs import load_lambda, local_redis, REDIS_RTT
+
+# Mede a consulta filtrada da listagem (query_page da lambda_file_list,
+# com a interseção calculada pelo QUERY_SCRIPT) à medida que o número de
+# arquivos indexados cresce até 1 milhão. Os índices (file_index por data
+# de criação, file_index:name e file_index:lines) e os metadados file:<nome>
+# são gravados no Redis local de local_stubs.py como as lambdas de escrita
+# os gravam; cada arquivo tem de 10 a 99 linhas e um arquivo é criado a
+# cada 2,6 s ao longo de 30 dias por milhão de arquivos. O trabalho por
+# página deve depender do tamanho da página e de QUERY_SCAN_BUDGET, não do
+# total de arquivos. O cache em memória (L1) é desativado. O fakeredis
+# executa cada comando do script em Python, então os tempos absolutos são
+# maiores que com o ElastiCache.
+#
+# Uso: python bench_query.py [--sizes 10000 100000 1000000] [--limit 100]
+#      [--repeats 20] [--rtt-ms 0.3]
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+START = time.time() - 30 * 86400
+INTERVAL = 2.6
+
+def populate(redis_client, first, last, rng):
+    """
+    Indexa os arquivos first..last-1 em lotes
+    """
+    for batch_start in range(first, last, 50000):
+        batch = range(batch_start, min(last, batch_start + 50000))
+        names = [f"file_{i:08d}.txt" for i in batch]
+        lines = [rng.randint(10, 99) for _ in batch]
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zadd('file_index', {name: START + i * INTERVAL for i, name in zip(batch, names)})
+        pipe.zadd('file_index:name', {name: 0 for name in names})
+        pipe.zadd('file_index:lines', dict(zip(names, lines)))
+        for name, count in zip(names, lines):
+            pipe.hset(f"file:{name}", mapping={'lines': count, 'size': count * 30})
+        pipe.execute()
+
+def scenarios(total):
+    """
+    Filtros medidos: (rótulo, parâmetros da requisição, verificação)
+    """
+    middle = START + total / 2 * INTERVAL
+    return [
+        (
+            'data+linhas',
+            {'created_from': repr(middle), 'min_lines': '50'},
+            lambda name, lines: int(name[5:13]) * INTERVAL + START >= middle and lines >= 50
+        ),
+        (
+            'prefixo+linhas',
+            {'prefix': 'file_0000', 'min_lines': '90'},
+            lambda name, lines: name.startswith('file_0000') and lines >= 90
+        ),
+        (
+            'linhas',
+            {'min_lines': '99'},
+            lambda name, lines: lines >= 99
+        )
+    ]
+
+def measure(listing, redis_client, params, matches, limit, repeats):
+    """
+    p50 e p99 (ms) da primeira página, tamanho da página e se todas as
+    entradas atendem aos filtros
+    """
+    filters = listing.parse_filters(params)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        files, _ = listing.query_page(redis_client, filters, None, limit)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(0.99 * len(timings)))]
+    correct = all(matches(file['name'], file['lines']) for file in files)
+    return timings[len(timings) // 2] * 1000, p99 * 1000, len(files), correct
+
+def main():
+    parser = argparse.ArgumentParser(description='Consulta filtrada da listagem com até 1 milhão de arquivos indexados')
+    parser.add_argument('--sizes', nargs='*', type=int, default=[10000, 100000, 1000000])
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--rtt-ms', type=float, default=REDIS_RTT * 1000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    listing = load_lambda('lambda_file_list')
+    listing.local_cache = listing.LocalCache(0)
+    redis_client = local_redis(rtt=args.rtt_ms / 1000)
+    rng = random.Random(args.seed)
+
+    print(f"{'arquivos':>9} {'filtro':>15} {'p50 (ms)':>9} {'p99 (ms)':>9} {'página':>7} {'correta':>8}")
+    indexed = 0
+    for size in sorted(args.sizes):
+        populate(redis_client, indexed, size, rng)
+        indexed = size
+        for label, params, matches in scenarios(size):
+            p50, p99, count, correct = measure(listing, redis_client, params, matches, args.limit, args.repeats)
+            if not correct:
+                logger.error(f"{label}: entradas fora do filtro com {size} arquivos")
+            print(f"{size:>9} {label:>15} {p50:>9.1f} {p99:>9.1f} {count:>7} {'sim' if correct else 'não':>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import time
+import argparse
+import logging
+
+from local_stubs import load_lambda, StubS3, S3_FIRST_BYTE_LATENCY, S3_CONNECTION_THROUGHPUT, S3_TOTAL_THROUGHPUT
+
+# Mede a contagem de linhas de um objeto grande (count_lines_ranged da
+# lambda_file_process) com um S3 local em que cada GET tem latência até o
+# primeiro byte e vazão por conexão limitadas, e a vazão total é dividida
+# entre as conexões abertas. Compara um único GET em stream com GETs de
+# intervalos de bytes para cada nível de paralelismo.
+#
+# Uso: python bench_ranged.py [--size-mb 256] [--part-mb 16]
+#      [--concurrency 1 2 4 8 16] [--connection-mbps 80] [--total-mbps 600]
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUCKET = 'benchmark'
+KEY = 'large.txt'
+LINE = b'x' * 99 + b'\n'
+MB = 1024 * 1024
+
+def make_object(size):
+    """
+    Objeto de size bytes com linhas de 100 bytes e a última sem quebra
+    """
+    data = LINE * (size // len(LINE)) + b'y' * (size % len(LINE))
+    expected = data.count(b'\n') + (1 if not data.endswith(b'\n') else 0)
+    return data, expected
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da leitura de objetos grandes por intervalos')
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--part-mb', type=int, default=16)
+    parser.add_argument('--concurrency', nargs='*', type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument('--first-byte-ms', type=float, default=S3_FIRST_BYTE_LATENCY * 1000)
+    parser.add_argument('--connection-mbps', type=float, default=S3_CONNECTION_THROUGHPUT / MB, help='MiB/s por conexão')
+    parser.add_argument('--total-mbps', type=float, default=S3_TOTAL_THROUGHPUT / MB, help='MiB/s da lambda')
+    args = parser.parse_args()
+
+    process = load_lambda('lambda_file_process')
+    s3_client = StubS3(
+        first_byte_latency=args.first_byte_ms / 1000,
+        connection_throughput=args.connection_mbps * MB,
+        total_throughput=args.total_mbps * MB
+    )
+    data, expected = make_object(args.size_mb * MB)
+    s3_client.put_object(Bucket=BUCKET, Key=KEY, Body=data)
+
+    print(f"{'leitura':>10} {'paralelo':>9} {'GETs':>6} {'tempo (s)':>10} {'MiB/s':>8}")
+
+    started = time.perf_counter()
+    body = s3_client.get_object(Bucket=BUCKET, Key=KEY)['Body']
+    try:
+        lines = process.count_lines(body)
+    finally:
+        body.close()
+    elapsed = time.perf_counter() - started
+    if lines != expected:
+        logger.error(f"stream: {lines} linhas, esperado {expected}")
+    print(f"{'stream':>10} {1:>9} {1:>6} {elapsed:>10.2f} {args.size_mb / elapsed:>8.0f}")
+
+    for concurrency in args.concurrency:
+        s3_client.calls['get_object'] = 0
+        started = time.perf_counter()
+        lines, _ = process.count_lines_ranged(
+            s3_client, BUCKET, KEY, len(data),
+            part_size=args.part_mb * MB, concurrency=concurrency
+        )
+        elapsed = time.perf_counter() - started
+        if lines != expected:
+            logger.error(f"{concurrency} intervalos: {lines} linhas, esperado {expected}")
+        print(f"{'intervalos':>10} {concurrency:>9} {s3_client.calls['get_object']:>6} {elapsed:>10.2f} {args.size_mb / elapsed:>8.0f}")
+
+if __name__ == '__main__':
+    main()
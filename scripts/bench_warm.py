@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import argparse
+import logging
+
+from local_stubs import (
+    load_lambda, local_redis, StubS3, StubSQS,
+    AWS_CONNECT_LATENCY, REDIS_CONNECT_LATENCY, REDIS_RTT
+)
+
+# Mede invocações quentes (container já inicializado) das lambdas com os
+# clientes de backend/shared/clients.py, com o S3, o SQS e o Redis locais
+# de local_stubs.py. Compara dois modos:
+# - 'compartilhado': os clientes são criados uma vez por container e as
+#   conexões ficam abertas entre invocações, como get_client e get_redis
+#   fazem hoje
+# - 'por invocação': a cada invocação get_client e get_redis criam clientes
+#   novos (o boto3 e o pool do Redis são de fato construídos) e a primeira
+#   requisição de cada cliente abre uma conexão nova, como quando os
+#   handlers criavam os clientes a cada chamada
+# Os clientes reais construídos no segundo modo não fazem requisições: são
+# trocados pelos locais, que compartilham os mesmos dados.
+#
+# Uso: python bench_warm.py [--invocations 200] [--aws-connect-ms 15]
+#      [--redis-connect-ms 2] [--redis-rtt-ms 0.3]
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUCKET = 'benchmark'
+
+class Container:
+    """
+    Clientes de um container: os locais e, no modo 'por invocação', a
+    recriação antes de cada chamada
+    """
+    def __init__(self, clients, args):
+        self.clients = clients
+        self.args = args
+        self.s3 = StubS3()
+        self.redis = local_redis(rtt=args.redis_rtt_ms / 1000)
+        self.install()
+
+    def install(self):
+        """
+        Clientes locais novos sobre os mesmos dados; cada um paga a abertura
+        da conexão na primeira requisição
+        """
+        aws_connect = self.args.aws_connect_ms / 1000
+        self.clients._clients['s3'] = StubS3(connect_latency=aws_connect, buckets=self.s3.buckets)
+        self.clients._clients['sqs'] = StubSQS(connect_latency=aws_connect)
+        self.clients._redis_client = local_redis(
+            rtt=self.args.redis_rtt_ms / 1000,
+            connect_latency=self.args.redis_connect_ms / 1000,
+            server=self.redis.connection_pool.connection_kwargs['server']
+        )
+
+    def recreate(self):
+        """
+        O que um handler que cria os clientes a cada chamada executa
+        """
+        self.clients._clients.clear()
+        self.clients._redis_client = None
+        for service in ('s3', 'sqs'):
+            self.clients.get_client(service)
+        self.clients.get_redis()
+        self.install()
+
+def measure(invoke, prepare, invocations):
+    """
+    p50 e p99 (ms) das invocações, descontada a preparação de cada uma
+    """
+    invoke(0)
+    timings = []
+    for i in range(1, invocations + 1):
+        prepare(i)
+        started = time.perf_counter()
+        invoke(i)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(0.99 * len(timings)))] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência de invocações quentes com clientes compartilhados')
+    parser.add_argument('--invocations', type=int, default=200)
+    parser.add_argument('--aws-connect-ms', type=float, default=AWS_CONNECT_LATENCY * 1000)
+    parser.add_argument('--redis-connect-ms', type=float, default=REDIS_CONNECT_LATENCY * 1000)
+    parser.add_argument('--redis-rtt-ms', type=float, default=REDIS_RTT * 1000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SQS_QUEUE_URL', 'benchmark-queue')
+    handlers = {
+        name: load_lambda(f"lambda_file_{name}")
+        for name in ('generate', 'delete', 'list', 'stats')
+    }
+    from shared import clients
+    container = Container(clients, args)
+
+    def create_object(i):
+        container.s3.put_object(Bucket=BUCKET, Key=f"delete_{i:06d}.txt", Body=b'x\n')
+
+    invocations = [
+        ('generate', lambda i: handlers['generate'].handler({'body': json.dumps({'lines': 10})}, None), lambda i: None),
+        ('delete', lambda i: handlers['delete'].handler({'pathParameters': {'filename': f"delete_{i:06d}.txt"}}, None), create_object),
+        ('list', lambda i: handlers['list'].handler({'queryStringParameters': {'limit': '20'}}, None), lambda i: None),
+        ('stats', lambda i: handlers['stats'].handler({}, None), lambda i: None)
+    ]
+    create_object(0)
+
+    print(f"{'lambda':>9} {'clientes':>15} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for label, invoke, prepare in invocations:
+        for mode in ('por invocação', 'compartilhado'):
+            # A recriação dos clientes faz parte da invocação medida
+            def timed(i, recreate=mode == 'por invocação'):
+                if recreate:
+                    container.recreate()
+                response = invoke(i)
+                if response['statusCode'] >= 400:
+                    logger.error(f"{label}: {response['statusCode']} {response['body']}")
+
+            p50, p99 = measure(timed, prepare, args.invocations)
+            print(f"{label:>9} {mode:>15} {p50:>9.2f} {p99:>9.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import zipfile
+import py_compile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Build das lambdas: cada função vira um zip com o próprio código e o pacote
+# compartilhado (backend/shared); as dependências de backend/requirements.txt
+# vão para uma única layer. Os artefatos são guardados em cache pelo hash do
+# conteúdo de entrada e só são refeitos quando algo muda.
+#
+# Uso: python build_lambdas.py [--force]
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+backend_dir = os.path.join(project_root, 'backend')
+deploy_dir = os.path.join(project_root, 'todeploy')
+cache_dir = os.path.join(project_root, '.build_cache')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Versão da lógica de build; mudar invalida todo o cache
+BUILD_VERSION = '1'
+
+# Runtime das funções (ver deploy_lambda em 4-deploy.py)
+LAMBDA_PYTHON_VERSION = '3.9'
+LAMBDA_PLATFORM = 'manylinux2014_x86_64'
+
+LAYER_NAME = 'dependencies_layer'
+SHARED_PACKAGE = 'shared'
+
+# Pacotes já presentes no runtime Python da Lambda, não incluídos na layer
+RUNTIME_PROVIDED = ('boto3', 'botocore', 's3transfer', 'jmespath')
+
+# Conteúdo removido dos artefatos
+EXCLUDED_DIRS = ('__pycache__', 'tests', 'test')
+EXCLUDED_SUFFIXES = ('.dist-info', '.egg-info', '.pyc', '.pyo')
+
+# Limites da Lambda: zip enviado diretamente e tamanho descompactado da
+# função somado ao das layers
+ZIP_BUDGET = 50 * 1024 * 1024
+UNZIPPED_BUDGET = 250 * 1024 * 1024
+
+# Builds simultâneos
+BUILD_WORKERS = int(os.environ.get('BUILD_WORKERS', 4))
+
+def discover_lambdas():
+    return sorted(
+        name for name in os.listdir(backend_dir)
+        if name.startswith('lambda_') and os.path.isfile(os.path.join(backend_dir, name, 'index.py'))
+    )
+
+def is_excluded(name):
+    return name in EXCLUDED_DIRS or name.endswith(EXCLUDED_SUFFIXES)
+
+def iter_files(root):
+    """
+    Arquivos de um diretório em ordem determinística, sem os excluídos
+    """
+    for current, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not is_excluded(d))
+        for name in sorted(files):
+            if not is_excluded(name):
+                yield os.path.join(current, name)
+
+def hash_inputs(*parts):
+    """
+    Hash de strings e diretórios (caminhos relativos e conteúdo)
+    """
+    digest = hashlib.sha256(f"{BUILD_VERSION}:{LAMBDA_PYTHON_VERSION}:{LAMBDA_PLATFORM}".encode('utf-8'))
+    for part in parts:
+        if os.path.isdir(part):
+            for path in iter_files(part):
+                digest.update(os.path.relpath(path, part).encode('utf-8'))
+                with open(path, 'rb') as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+        else:
+            digest.update(part.encode('utf-8'))
+    return digest.hexdigest()
+
+def read_requirements(path, exclude=()):
+    """
+    Linhas de requisitos, ignorando comentários e os pacotes excluídos
+    """
+    if not os.path.isfile(path):
+        return []
+    requirements = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            name = line.split('==')[0].split('>=')[0].split('<')[0].strip().lower()
+            if line and name not in exclude:
+                requirements.append(line)
+    return sorted(requirements)
+
+def pip_install(requirements, target):
+    """
+    Instala as dependências com wheels da plataforma e versão do runtime
+    da Lambda, independente da máquina do build
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write('\n'.join(requirements) + '\n')
+        requirements_file = f.name
+    try:
+        subprocess.run(
+            [
+                sys.executable, '-m', 'pip', 'install',
+                '--quiet', '--no-compile', '--disable-pip-version-check',
+                '--platform', LAMBDA_PLATFORM,
+                '--python-version', LAMBDA_PYTHON_VERSION,
+                '--implementation', 'cp',
+                '--only-binary=:all:',
+                '-r', requirements_file,
+                '-t', target
+            ],
+            check=True
+        )
+    finally:
+        os.remove(requirements_file)
+
+def strip_tree(root):
+    """
+    Remove testes, metadados de distribuição e bytecode antigo
+    """
+    for current, dirs, files in os.walk(root, topdown=True):
+        for name in list(dirs):
+            if is_excluded(name):
+                shutil.rmtree(os.path.join(current, name))
+                dirs.remove(name)
+        for name in files:
+            if is_excluded(name):
+                os.remove(os.path.join(current, name))
+
+def compile_tree(root):
+    """
+    Pré-compila o bytecode (o sistema de arquivos da Lambda é somente
+    leitura, então sem isso cada cold start compila os módulos de novo).
+    O bytecode só é válido para a mesma versão do Python do runtime.
+    """
+    if f"{sys.version_info[0]}.{sys.version_info[1]}" != LAMBDA_PYTHON_VERSION:
+        logger.warning(
+            f"Python {sys.version_info[0]}.{sys.version_info[1]} difere do runtime "
+            f"{LAMBDA_PYTHON_VERSION}: bytecode não pré-compilado"
+        )
+        return
+    for path in iter_files(root):
+        if path.endswith('.py'):
+            try:
+                # Hash do fonte em vez de data de modificação: bytecode
+                # determinístico
+                py_compile.compile(
+                    path,
+                    doraise=True,
+                    invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH
+                )
+            except py_compile.PyCompileError as e:
+                logger.warning(f"Bytecode não gerado para {path}: {e.msg}")
+
+def write_zip(root, output):
+    """
+    Zip determinístico: entradas ordenadas, datas e permissões fixas.
+    Retorna o tamanho descompactado.
+    """
+    unzipped = 0
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for current, dirs, files in os.walk(root):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(current, name)
+                info = zipfile.ZipInfo(os.path.relpath(path, root), date_time=(1980, 1, 1, 0, 0, 0))
+                info.external_attr = 0o644 << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with open(path, 'rb') as f:
+                    data = f.read()
+                zf.writestr(info, data, compresslevel=9)
+                unzipped += len(data)
+    return unzipped
+
+def build_artifact(name, content_hash, populate, force=False):
+    """
+    Gera (ou reaproveita do cache) o zip de um artefato e o copia para
+    todeploy. populate(staging_dir) preenche o conteúdo.
+    """
+    cached_zip = os.path.join(cache_dir, f"{name}-{content_hash}.zip")
+    cached_meta = os.path.join(cache_dir, f"{name}-{content_hash}.json")
+
+    if not force and os.path.isfile(cached_zip) and os.path.isfile(cached_meta):
+        with open(cached_meta) as f:
+            meta = json.load(f)
+        meta['cached'] = True
+    else:
+        staging = tempfile.mkdtemp(prefix=f"{name}-")
+        try:
+            populate(staging)
+            strip_tree(staging)
+            compile_tree(staging)
+            tmp_zip = f"{cached_zip}.tmp"
+            unzipped = write_zip(staging, tmp_zip)
+            os.replace(tmp_zip, cached_zip)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        meta = {'hash': content_hash, 'zip_size': os.path.getsize(cached_zip), 'unzipped_size': unzipped}
+        with open(cached_meta, 'w') as f:
+            json.dump(meta, f)
+        meta['cached'] = False
+
+    shutil.copyfile(cached_zip, os.path.join(deploy_dir, f"{name}.zip"))
+    return name, meta
+
+def build_layer(force=False):
+    """
+    Layer com as dependências compartilhadas (python/ no zip)
+    """
+    requirements = read_requirements(os.path.join(backend_dir, 'requirements.txt'), RUNTIME_PROVIDED)
+
+    def populate(staging):
+        if requirements:
+            pip_install(requirements, os.path.join(staging, 'python'))
+
+    return build_artifact(LAYER_NAME, hash_inputs(*requirements), populate, force)
+
+def build_function(lambda_name, force=False):
+    """
+    Zip da função com o código, o pacote compartilhado e as dependências
+    próprias (requirements.txt no diretório da função, se houver)
+    """
+    function_dir = os.path.join(backend_dir, lambda_name)
+    shared_dir = os.path.join(backend_dir, SHARED_PACKAGE)
+    requirements = read_requirements(os.path.join(function_dir, 'requirements.txt'))
+
+    def populate(staging):
+        for path in iter_files(function_dir):
+            if os.path.basename(path) == 'requirements.txt':
+                continue
+            target = os.path.join(staging, os.path.relpath(path, function_dir))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+        shutil.copytree(shared_dir, os.path.join(staging, SHARED_PACKAGE), ignore=lambda _, names: [n for n in names if is_excluded(n)])
+        if requirements:
+            pip_install(requirements, staging)
+
+    return build_artifact(lambda_name, hash_inputs(function_dir, shared_dir, *requirements), populate, force)
+
+def report(results, layer_size):
+    """
+    Tamanho de cada artefato em relação aos limites da Lambda
+    """
+    over_budget = False
+    print(f"{'artefato':24} {'cache':>6} {'zip':>10} {'% 50MB':>7} {'descomp.':>10} {'% 250MB':>8}")
+    for name, meta in sorted(results.items()):
+        # O limite descompactado vale para a função somada à layer
+        unzipped = meta['unzipped_size'] + (layer_size if name != LAYER_NAME else 0)
+        zip_pct = meta['zip_size'] * 100 / ZIP_BUDGET
+        unzipped_pct = unzipped * 100 / UNZIPPED_BUDGET
+        over_budget = over_budget or zip_pct > 100 or unzipped_pct > 100
+        print(
+            f"{name:24} {'sim' if meta['cached'] else 'não':>6} "
+            f"{meta['zip_size'] / 1024:>8.1f}KB {zip_pct:>6.1f}% "
+            f"{unzipped / 1024:>8.1f}KB {unzipped_pct:>7.1f}%"
+        )
+    return not over_budget
+
+def main():
+    force = '--force' in sys.argv[1:]
+    os.makedirs(deploy_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    lambdas = discover_lambdas()
+    results = {}
+    with ThreadPoolExecutor(max_workers=BUILD_WORKERS) as executor:
+        futures = [executor.submit(build_layer, force)]
+        futures += [executor.submit(build_function, name, force) for name in lambdas]
+        for future in futures:
+            name, meta = future.result()
+            results[name] = meta
+            logger.info(f"{name} {'reaproveitado do cache' if meta['cached'] else 'gerado'} ({meta['hash'][:12]})")
+
+    # Manifesto com o hash das entradas e os tamanhos de cada artefato, para
+    # consulta e comparação entre builds. O deploy não o lê: ele compara o
+    # SHA-256 do próprio zip com o CodeSha256 da função.
+    with open(os.path.join(deploy_dir, 'build_manifest.json'), 'w') as f:
+        json.dump({
+            name: {key: meta[key] for key in ('hash', 'zip_size', 'unzipped_size')}
+            for name, meta in results.items()
+        }, f, indent=2, sort_keys=True)
+
+    if not report(results, results[LAYER_NAME]['unzipped_size']):
+        logger.error("Artefato acima do limite de tamanho da Lambda")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
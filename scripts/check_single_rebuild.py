@@ -0,0 +1,101 @@
+import sys
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from local_stubs import load_lambda, local_redis, StubS3
+
+# Verifica a proteção contra reconstruções simultâneas da listagem: N
+# invocações da lambda_file_list começam ao mesmo tempo com o cache vazio
+# (sem cópia 'stale') e depois com o cache expirado (com cópia 'stale'), e
+# cada cenário deve causar exatamente uma reconstrução. No último cenário a
+# primeira reconstrução não é publicada (sem cópia 'stale'): uma única
+# invocação em espera deve assumir a trava e reconstruir, totalizando duas
+# reconstruções e nenhuma resposta de erro. Usa o S3 e o Redis
+# locais de local_stubs.py; o cache em memória (L1) é desativado para que
+# cada invocação se comporte como um container diferente.
+#
+# Uso: python check_single_rebuild.py [--invocations 50] [--objects 2000]
+
+BUCKET = 'benchmark'
+
+def run_concurrently(listing, invocations):
+    """
+    Dispara as invocações juntas; retorna as reconstruções e a contagem de
+    respostas por status e X-Cache
+    """
+    rebuilds = []
+    build_listing = listing.build_listing
+
+    def counted_build(*args, **kwargs):
+        rebuilds.append(threading.get_ident())
+        return build_listing(*args, **kwargs)
+
+    listing.build_listing = counted_build
+    barrier = threading.Barrier(invocations)
+
+    def invoke(_):
+        barrier.wait()
+        response = listing.handler({}, None)
+        return response['statusCode'], response['headers'].get('X-Cache')
+
+    try:
+        with ThreadPoolExecutor(max_workers=invocations) as executor:
+            results = Counter(executor.map(invoke, range(invocations)))
+    finally:
+        listing.build_listing = build_listing
+    return len(rebuilds), results
+
+def main():
+    parser = argparse.ArgumentParser(description='Verifica que falhas simultâneas do cache causam uma única reconstrução')
+    parser.add_argument('--invocations', type=int, default=50)
+    parser.add_argument('--objects', type=int, default=2000)
+    args = parser.parse_args()
+
+    listing = load_lambda('lambda_file_list')
+    listing.local_cache = listing.LocalCache(0)
+    listing.EARLY_REFRESH_BETA = 0
+
+    # Clientes usados pela lambda (criados uma vez por container)
+    from shared import clients
+    s3_client = StubS3()
+    redis_client = local_redis()
+    clients._clients['s3'] = s3_client
+    clients._redis_client = redis_client
+
+    for i in range(args.objects):
+        s3_client.put_object(Bucket=BUCKET, Key=f"file_{i:07d}.txt", Body=b'x')
+
+    store_listing = listing.store_listing
+    discarded = []
+
+    def discard_first_store(*args, **kwargs):
+        # A primeira reconstrução termina sem publicar, como quando o
+        # registro de alterações não cobre mais o seu início
+        if not discarded:
+            discarded.append(True)
+            return None, 0
+        return store_listing(*args, **kwargs)
+
+    def discard_next_rebuild():
+        redis_client.delete('file_metadata:entries', 'file_metadata:stale')
+        listing.store_listing = discard_first_store
+
+    ok = True
+    scenarios = [
+        ('cache vazio', lambda: None, 1),
+        ('cache expirado', lambda: redis_client.delete('file_metadata:entries'), 1),
+        ('reconstrução descartada', discard_next_rebuild, 2)
+    ]
+    for label, prepare, expected in scenarios:
+        prepare()
+        rebuilds, results = run_concurrently(listing, args.invocations)
+        summary = ', '.join(f"{status} {cache}: {count}" for (status, cache), count in sorted(results.items(), key=str))
+        print(f"{label}: {args.invocations} invocações, {rebuilds} reconstrução(ões) [{summary}]")
+        ok = ok and rebuilds == expected and all(status == 200 for status, _ in results)
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import logging
+
+# Mede a inicialização (cold start) das lambdas localmente: cada execução
+# sobe um interpretador novo, importa o index.py da função e reporta o
+# tempo de importação. Com --profile, imprime também o relatório de
+# importação por módulo (STARTUP_PROFILE) de uma execução.
+#
+# Uso: python coldstart.py [--runs 10] [--profile] [lambda_file_list ...]
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+backend_dir = os.path.join(project_root, 'backend')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LAMBDAS = [
+    'lambda_file_list',
+    'lambda_file_generate',
+    'lambda_file_delete',
+    'lambda_file_process',
+    'lambda_file_stats'
+]
+
+# Executado no interpretador novo; o pacote compartilhado fica ao lado do
+# index.py, como no zip gerado pelo build
+CHILD_CODE = """
+import sys, time, json
+started = time.perf_counter()
+sys.path[:0] = [sys.argv[1], sys.argv[2]]
+import index
+print(json.dumps({'init_ms': (time.perf_counter() - started) * 1000}))
+"""
+
+def measure(lambda_name, profile=False):
+    """
+    Importa a lambda em um interpretador novo e retorna o tempo de
+    inicialização em milissegundos e a saída do processo
+    """
+    env = dict(os.environ)
+    env.setdefault('REDIS_HOST', 'localhost')
+    env.setdefault('DATA_BUCKET_NAME', 'coldstart')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env['STARTUP_PROFILE'] = '1' if profile else '0'
+    env.pop('PYTHONPROFILEIMPORTTIME', None)
+
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE, os.path.join(backend_dir, lambda_name), backend_dir],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    lines = result.stdout.strip().splitlines()
+    return json.loads(lines[-1])['init_ms'], '\n'.join(lines[:-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de cold start das lambdas')
+    parser.add_argument('lambdas', nargs='*', default=LAMBDAS)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--profile', action='store_true', help='imprime o tempo de importação por módulo')
+    args = parser.parse_args()
+
+    print(f"{'lambda':24} {'p50 (ms)':>10} {'min (ms)':>10} {'max (ms)':>10}")
+    for lambda_name in args.lambdas:
+        try:
+            # Primeira execução descartada: aquece o cache de disco do SO
+            measure(lambda_name)
+            timings = [measure(lambda_name)[0] for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Erro ao inicializar {lambda_name}: {e.stderr}")
+            continue
+
+        print(f"{lambda_name:24} {statistics.median(timings):>10.1f} {min(timings):>10.1f} {max(timings):>10.1f}")
+        if args.profile:
+            print(measure(lambda_name, profile=True)[1])
+
+if __name__ == '__main__':
+    main()
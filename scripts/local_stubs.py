@@ -0,0 +1,252 @@
+import os
+import sys
+import time
+import threading
+import importlib.util
+from datetime import datetime, timezone
+
+# Substitutos locais do S3, do SQS e do Redis usados pelos benchmarks desta
+# pasta. O S3 e o SQS guardam tudo em memória com latência simulada por
+# requisição; o Redis é o fakeredis (pip install "fakeredis[lua]") com uma
+# ida e volta simulada por comando ou pipeline, para que o número de idas
+# e voltas apareça no tempo medido como apareceria com o ElastiCache.
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+backend_dir = os.path.join(project_root, 'backend')
+
+# Latências padrão: LIST do S3 por página, exclusões no S3, envio ao SQS
+# e ida e volta ao Redis na mesma AZ
+S3_LIST_LATENCY = 0.030
+S3_DELETE_LATENCY = 0.020
+SQS_SEND_LATENCY = 0.010
+REDIS_RTT = 0.0003
+
+# Abertura de uma conexão nova (TCP + TLS com o S3 e o SQS, TCP com o
+# Redis), paga na primeira requisição de cada cliente criado com ela
+AWS_CONNECT_LATENCY = 0.015
+REDIS_CONNECT_LATENCY = 0.002
+
+# GET do S3: latência até o primeiro byte, vazão de uma conexão e vazão
+# total da rede da lambda, dividida entre as conexões abertas
+S3_FIRST_BYTE_LATENCY = 0.020
+S3_CONNECTION_THROUGHPUT = 80 * 1024 * 1024
+S3_TOTAL_THROUGHPUT = 600 * 1024 * 1024
+
+def load_lambda(lambda_name):
+    """
+    Importa o index.py de uma lambda com o pacote compartilhado no path,
+    como no zip gerado pelo build
+    """
+    os.environ.setdefault('REDIS_HOST', 'localhost')
+    os.environ.setdefault('DATA_BUCKET_NAME', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+
+    spec = importlib.util.spec_from_file_location(
+        lambda_name, os.path.join(backend_dir, lambda_name, 'index.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def local_redis(rtt=REDIS_RTT, connect_latency=0, server=None):
+    """
+    Cliente fakeredis em que cada comando e cada pipeline custam uma ida e
+    volta de rtt segundos, contadas em round_trips, e o primeiro deles
+    também a abertura da conexão. Clientes criados com o mesmo server
+    compartilham os dados.
+    """
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit('fakeredis não instalado: pip install "fakeredis[lua]"')
+
+    class LatencyRedis(fakeredis.FakeRedis):
+        round_trips = 0
+        connected = False
+
+        def round_trip(self):
+            if not self.connected:
+                self.connected = True
+                time.sleep(connect_latency)
+            time.sleep(rtt)
+            LatencyRedis.round_trips += 1
+
+        def execute_command(self, *args, **options):
+            self.round_trip()
+            return super().execute_command(*args, **options)
+
+        def pipeline(self, transaction=True, shard_hint=None):
+            pipe = super().pipeline(transaction, shard_hint)
+            execute = pipe.execute
+
+            def execute_with_rtt(*args, **kwargs):
+                self.round_trip()
+                return execute(*args, **kwargs)
+
+            pipe.execute = execute_with_rtt
+            return pipe
+
+    return LatencyRedis(server=server or fakeredis.FakeServer())
+
+class StubPaginator:
+    def __init__(self, s3, operation_name):
+        self.s3 = s3
+        self.operation_name = operation_name
+
+    def paginate(self, Bucket, Prefix='', PaginationConfig=None):
+        # Retrato do bucket no início da listagem (pode haver escritas
+        # simultâneas em outras threads)
+        with self.s3.lock:
+            objects = sorted(
+                (key, len(body)) for key, body in self.s3.buckets.get(Bucket, {}).items()
+                if key.startswith(Prefix)
+            )
+        page_size = (PaginationConfig or {}).get('PageSize', 1000)
+        for i in range(0, max(len(objects), 1), page_size):
+            self.s3.connect()
+            time.sleep(self.s3.list_latency)
+            with self.s3.lock:
+                self.s3.calls[self.operation_name] += 1
+            if self.operation_name == 'list_object_versions':
+                # Bucket sem versões anteriores: uma versão 'null' por chave
+                yield {
+                    'Versions': [
+                        {'Key': key, 'VersionId': 'null', 'Size': size, 'IsLatest': True}
+                        for key, size in objects[i:i + page_size]
+                    ],
+                    'DeleteMarkers': []
+                }
+                continue
+            yield {
+                'Contents': [
+                    {
+                        'Key': key,
+                        'Size': size,
+                        'LastModified': self.s3.last_modified
+                    }
+                    for key, size in objects[i:i + page_size]
+                ]
+            }
+
+class StubBody:
+    """
+    Corpo de um GET lido na vazão da conexão, limitada pela vazão total
+    dividida entre as conexões abertas
+    """
+    def __init__(self, s3, data):
+        self.s3 = s3
+        self.data = memoryview(data)
+        self.position = 0
+        self.closed = False
+        with s3.lock:
+            s3.open_connections += 1
+
+    def read(self, size=-1):
+        if size < 0:
+            size = len(self.data) - self.position
+        chunk = self.data[self.position:self.position + size]
+        self.position += len(chunk)
+        if chunk:
+            throughput = min(self.s3.connection_throughput, self.s3.total_throughput / self.s3.open_connections)
+            time.sleep(len(chunk) / throughput)
+        return bytes(chunk)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            with self.s3.lock:
+                self.s3.open_connections -= 1
+
+class StubS3:
+    """
+    Buckets em memória com a parte da API do S3 usada pelas lambdas
+    """
+    def __init__(self, list_latency=S3_LIST_LATENCY, first_byte_latency=S3_FIRST_BYTE_LATENCY,
+                 connection_throughput=S3_CONNECTION_THROUGHPUT, total_throughput=S3_TOTAL_THROUGHPUT,
+                 delete_latency=S3_DELETE_LATENCY, connect_latency=0, buckets=None):
+        self.buckets = {} if buckets is None else buckets
+        self.connect_latency = connect_latency
+        self.connected = False
+        self.list_latency = list_latency
+        self.delete_latency = delete_latency
+        self.first_byte_latency = first_byte_latency
+        self.connection_throughput = connection_throughput
+        self.total_throughput = total_throughput
+        self.last_modified = datetime.now(timezone.utc)
+        self.calls = {'list_objects_v2': 0, 'list_object_versions': 0, 'get_object': 0, 'delete_objects': 0}
+        self.lock = threading.Lock()
+        self.open_connections = 0
+
+    def connect(self):
+        """
+        Abertura da conexão, paga na primeira requisição do cliente
+        """
+        if not self.connected:
+            self.connected = True
+            time.sleep(self.connect_latency)
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        self.connect()
+        with self.lock:
+            self.buckets.setdefault(Bucket, {})[Key] = Body
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        with self.lock:
+            self.buckets.get(Bucket, {}).pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        """
+        Exclui as chaves do lote em uma única requisição
+        """
+        self.connect()
+        time.sleep(self.delete_latency)
+        with self.lock:
+            self.calls['delete_objects'] += 1
+            for item in Delete['Objects']:
+                self.buckets.get(Bucket, {}).pop(item['Key'], None)
+        return {}
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        """
+        GET do objeto inteiro ou de um intervalo 'bytes=início-fim'
+        """
+        data = self.buckets[Bucket][Key]
+        if Range:
+            start, end = Range[len('bytes='):].split('-')
+            data = memoryview(data)[int(start):int(end) + 1]
+        with self.lock:
+            self.calls['get_object'] += 1
+        self.connect()
+        time.sleep(self.first_byte_latency)
+        return {
+            'Body': StubBody(self, data),
+            'ContentLength': len(data),
+            'LastModified': self.last_modified
+        }
+
+    def get_paginator(self, operation_name):
+        if operation_name not in ('list_objects_v2', 'list_object_versions'):
+            raise NotImplementedError(operation_name)
+        return StubPaginator(self, operation_name)
+
+class StubSQS:
+    """
+    Fila em memória com o envio de mensagens usado pelas lambdas
+    """
+    def __init__(self, send_latency=SQS_SEND_LATENCY, connect_latency=0):
+        self.send_latency = send_latency
+        self.connect_latency = connect_latency
+        self.connected = False
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        if not self.connected:
+            self.connected = True
+            time.sleep(self.connect_latency)
+        time.sleep(self.send_latency)
+        with self.lock:
+            self.messages.append((QueueUrl, MessageBody))
+        return {'MessageId': str(len(self.messages))}